@@ -0,0 +1,325 @@
+import asyncio
+import logging
+import math
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict, deque
+
+from fastapi.responses import JSONResponse
+
+import metrics
+from partitions import VERTICAL_BASENAMES
+
+logger = logging.getLogger(__name__)
+
+
+def _env_flag(name, default=True):
+    return os.getenv(name, str(default)).lower() in ("1", "true", "yes", "on")
+
+
+class Policy:
+    """
+    Limits for one group of routes. Each client gets a token bucket of
+    `burst` requests refilled at `rate` per second and may have at most
+    `client_concurrency` requests in flight. The route as a whole runs at most
+    `concurrency` requests at once; up to `max_queue` more wait for a slot
+    (at most `queue_timeout` seconds) and anything beyond that is shed.
+    """
+    __slots__ = ("name", "prefix", "rate", "burst", "client_concurrency",
+                 "concurrency", "max_queue", "queue_timeout")
+
+    def __init__(self, name, prefix, rate, burst, client_concurrency, concurrency, max_queue, queue_timeout=5.0):
+        self.name = name
+        self.prefix = prefix
+        self.rate = rate
+        self.burst = burst
+        self.client_concurrency = client_concurrency
+        self.concurrency = concurrency
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+
+
+# Expensive routes only: each call may parse partitions, run inference or a
+# full backtest. Everything else (status, catalog, static files) is unlimited.
+# A dashboard load requests the preview and prediction of every vertical at
+# once (one ProductSection each), so those routes allow that many per client.
+ADMISSION_POLICIES = {
+    "predict": Policy("predict", "/api/predict/", rate=2.0, burst=10, client_concurrency=len(VERTICAL_BASENAMES),
+                      concurrency=4, max_queue=16),
+    "preview": Policy("preview", "/api/preview/", rate=5.0, burst=20, client_concurrency=len(VERTICAL_BASENAMES),
+                      concurrency=8, max_queue=32),
+    "backtest": Policy("backtest", "/api/backtest/", rate=0.2, burst=3, client_concurrency=1,
+                       concurrency=2, max_queue=4, queue_timeout=30.0),
+    "panel": Policy("panel", "/api/panel", rate=2.0, burst=10, client_concurrency=2,
+                    concurrency=4, max_queue=16)
+}
+
+
+# --- Token bucket stores ---
+
+class MemoryBucketStore:
+    """Token buckets in this process, least recently used keys evicted past `max_keys`."""
+
+    # take() only holds an in-process lock, so it is called on the event loop
+    blocking = False
+
+    def __init__(self, max_keys=100000):
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def take(self, key, rate, burst, cost=1.0):
+        """Spend `cost` tokens. Returns (allowed, tokens left, seconds until `cost` tokens are available)."""
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.pop(key, (burst, now))
+            tokens = min(burst, tokens + (now - updated) * rate)
+            allowed = tokens >= cost
+            if allowed:
+                tokens -= cost
+            self._buckets[key] = (tokens, now)
+            while len(self._buckets) > self.max_keys:
+                # An evicted bucket comes back full, so prefer dropping idle clients
+                self._buckets.popitem(last=False)
+        return allowed, tokens, 0.0 if allowed else (cost - tokens) / rate
+
+
+class SQLiteBucketStore:
+    """
+    Token buckets in a local SQLite file, shared by every worker process on
+    the host (a stand-in for a shared store such as Redis). Each take() is
+    one short IMMEDIATE transaction; idle buckets are pruned now and then.
+    """
+
+    # take() can wait on the file lock (up to the connect timeout), so it runs in a thread
+    blocking = True
+
+    def __init__(self, path, idle_seconds=3600, prune_every=1000):
+        self.path = path
+        self.idle_seconds = idle_seconds
+        self.prune_every = prune_every
+        self._takes = 0
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, timeout=5.0, isolation_level=None, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS buckets (key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL)"
+        )
+
+    def take(self, key, rate, burst, cost=1.0):
+        now = time.time()
+        with self._lock:
+            conn = self._conn
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = conn.execute("SELECT tokens, updated FROM buckets WHERE key = ?", (key,)).fetchone()
+                tokens, updated = row if row else (burst, now)
+                tokens = min(burst, tokens + max(0.0, now - updated) * rate)
+                allowed = tokens >= cost
+                if allowed:
+                    tokens -= cost
+                conn.execute("INSERT OR REPLACE INTO buckets (key, tokens, updated) VALUES (?, ?, ?)",
+                             (key, tokens, now))
+                self._takes += 1
+                if self._takes % self.prune_every == 0:
+                    conn.execute("DELETE FROM buckets WHERE updated < ?", (now - self.idle_seconds,))
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        return allowed, tokens, 0.0 if allowed else (cost - tokens) / rate
+
+
+def _default_store():
+    kind = os.getenv("RATE_LIMIT_STORE", "memory")
+    if kind == "sqlite":
+        path = os.getenv("RATE_LIMIT_DB") or os.path.join(os.getenv("DATA_DIR", "data"), "rate_limits.sqlite")
+        return SQLiteBucketStore(path)
+    if kind != "memory":
+        logger.warning(f"Unknown RATE_LIMIT_STORE {kind!r}, using memory")
+    return MemoryBucketStore()
+
+
+def _default_client_header():
+    """
+    RATE_LIMIT_CLIENT_HEADER when set (set it empty to ignore forwarded
+    headers). On Hugging Face Spaces (SPACE_ID is set) every request reaches
+    the app from the Space's proxy, so the peer address is the same for
+    everyone; there the default is the X-Forwarded-For the proxy adds.
+    """
+    header = os.getenv("RATE_LIMIT_CLIENT_HEADER")
+    if header is not None:
+        return header or None
+    return "X-Forwarded-For" if os.getenv("SPACE_ID") else None
+
+
+# --- Concurrency ---
+
+class ConcurrencyGovernor:
+    """
+    At most `limit` holders at once, with a bounded FIFO queue of waiters.
+    Used from the event loop only. Keeps a moving average of how long a slot
+    is held to estimate Retry-After for shed requests.
+    """
+
+    def __init__(self, limit, max_queue):
+        self.limit = limit
+        self.max_queue = max_queue
+        self.active = 0
+        self.waiters = deque()
+        self.avg_hold = 0.1
+
+    async def acquire(self, timeout):
+        """True once a slot is held, "shed" if the queue is full, "timeout" if no slot freed up in time."""
+        if self.active < self.limit and not self.waiters:
+            self.active += 1
+            return True
+        if len(self.waiters) >= self.max_queue:
+            return "shed"
+        waiter = asyncio.get_running_loop().create_future()
+        self.waiters.append(waiter)
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), timeout)
+            return True
+        except asyncio.TimeoutError:
+            if waiter.done():
+                return True  # handed a slot just as the wait expired
+            waiter.cancel()
+            self.waiters.remove(waiter)
+            return "timeout"
+        except asyncio.CancelledError:
+            # Client went away while queued
+            if waiter.done() and not waiter.cancelled():
+                self.release()
+            else:
+                waiter.cancel()
+                if waiter in self.waiters:
+                    self.waiters.remove(waiter)
+            raise
+
+    def release(self, held=None):
+        if held is not None:
+            self.avg_hold = 0.9 * self.avg_hold + 0.1 * held
+        while self.waiters:
+            waiter = self.waiters.popleft()
+            if not waiter.done():
+                # Hand the slot straight to the next waiter
+                waiter.set_result(True)
+                return
+        self.active -= 1
+
+    def retry_after(self):
+        """Seconds until the queue ahead of a new request should have drained."""
+        return (len(self.waiters) + 1) * self.avg_hold / max(1, self.limit)
+
+
+# --- Admission controller ---
+
+class AdmissionController:
+    """
+    Rate limiting and load shedding for the routes in `policies`, applied as
+    HTTP middleware. Requests are checked in order against the client's
+    in-flight count (429), the client's token bucket (429) and the route's
+    concurrency governor, which queues the request or sheds it (503) when the
+    queue is full or the wait times out. Rejections carry Retry-After.
+
+    Behind proxies, clients are told apart by `client_header`. Each of the
+    `trusted_proxies` proxies in front of the app appends the address it saw,
+    so the client is that many entries from the right; entries further left
+    come from the client and are ignored.
+    """
+
+    def __init__(self, policies=None, store=None, client_header=None, trusted_proxies=1, enabled=True):
+        self.policies = policies if policies is not None else ADMISSION_POLICIES
+        self.store = store or MemoryBucketStore()
+        self.client_header = client_header.lower() if client_header else None
+        self.trusted_proxies = max(1, int(trusted_proxies))
+        self.enabled = enabled
+        self.governors = {name: ConcurrencyGovernor(p.concurrency, p.max_queue) for name, p in self.policies.items()}
+        self._client_in_flight = {}
+
+    def policy_for(self, path):
+        for policy in self.policies.values():
+            if path.startswith(policy.prefix):
+                return policy
+        return None
+
+    def client_id(self, request):
+        """Client address, from `client_header` (e.g. X-Forwarded-For behind a proxy) when configured."""
+        if self.client_header:
+            hops = [hop.strip() for value in request.headers.getlist(self.client_header)
+                    for hop in value.split(",") if hop.strip()]
+            if hops:
+                return hops[-min(self.trusted_proxies, len(hops))]
+        return request.client.host if request.client else "unknown"
+
+    async def _take(self, key, policy):
+        if getattr(self.store, "blocking", False):
+            return await asyncio.to_thread(self.store.take, key, policy.rate, policy.burst)
+        return self.store.take(key, policy.rate, policy.burst)
+
+    def _reject(self, policy, result, status_code, message, retry_after):
+        metrics.ADMISSION_DECISIONS.inc(policy=policy.name, result=result)
+        seconds = max(1, math.ceil(retry_after))
+        return JSONResponse(
+            {"error": message, "retry_after": seconds},
+            status_code=status_code,
+            headers={"Retry-After": str(seconds), "Cache-Control": "no-store"}
+        )
+
+    async def __call__(self, request, call_next):
+        policy = self.policy_for(request.url.path) if self.enabled else None
+        if policy is None:
+            return await call_next(request)
+
+        client = self.client_id(request)
+        flight_key = (policy.name, client)
+        if self._client_in_flight.get(flight_key, 0) >= policy.client_concurrency:
+            return self._reject(policy, "client_limited", 429, "Too many concurrent requests", 1)
+
+        # Counted before the bucket is checked, which may yield to other requests of this client
+        self._client_in_flight[flight_key] = self._client_in_flight.get(flight_key, 0) + 1
+        try:
+            allowed, _, wait = await self._take(f"{policy.name}:{client}", policy)
+            if not allowed:
+                return self._reject(policy, "rate_limited", 429, "Rate limit exceeded", wait)
+
+            governor = self.governors[policy.name]
+            queued_at = time.perf_counter()
+            acquired = await governor.acquire(policy.queue_timeout)
+            if acquired is not True:
+                return self._reject(policy, acquired, 503, "Server busy, retry later", governor.retry_after())
+            started = time.perf_counter()
+            metrics.ADMISSION_WAIT_SECONDS.observe(started - queued_at, policy=policy.name)
+            metrics.ADMISSION_DECISIONS.inc(policy=policy.name, result="admitted")
+            try:
+                return await call_next(request)
+            finally:
+                governor.release(time.perf_counter() - started)
+        finally:
+            remaining = self._client_in_flight[flight_key] - 1
+            if remaining:
+                self._client_in_flight[flight_key] = remaining
+            else:
+                del self._client_in_flight[flight_key]
+
+    def in_flight(self):
+        return {(name,): g.active for name, g in self.governors.items()}
+
+    def queue_depth(self):
+        return {(name,): len(g.waiters) for name, g in self.governors.items()}
+
+
+ADMISSION = AdmissionController(
+    store=_default_store(),
+    client_header=_default_client_header(),
+    trusted_proxies=int(os.getenv("RATE_LIMIT_TRUSTED_PROXIES", "1")),
+    enabled=_env_flag("ADMISSION_ENABLED")
+)
+
+metrics.ADMISSION_IN_FLIGHT.set_function(ADMISSION.in_flight)
+metrics.ADMISSION_QUEUE_DEPTH.set_function(ADMISSION.queue_depth)
@@ -1,13 +1,33 @@
 from fastapi import FastAPI, HTTPException, Request
-from fastapi.responses import HTMLResponse, FileResponse, JSONResponse
+from fastapi.responses import HTMLResponse, FileResponse, JSONResponse, PlainTextResponse, StreamingResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.middleware.cors import CORSMiddleware
+from starlette.background import BackgroundTask
 import os
+import asyncio
 import logging
 import json
-from datetime import datetime
-from update_data import update_dataset
+import hmac
+import threading
+import time
+import traceback
+from datetime import datetime, timedelta
+from typing import Optional
 from product_manager import DataProductManager
+from partitions import PartitionStore, VERTICAL_BASENAMES
+from panel import PanelStore, panel_columns, to_panel_records
+from schemas import to_records
+import metrics
+import streaming
+import http_cache
+from http_cache import CACHE_POLICIES
+import profiling
+from profiling import PROFILER
+from admission import ADMISSION
+from export_jobs import ExportJobManager, ExportQueueFull
+from drift import DriftMonitor
+from data_access import DataAccess
+from event_log import EVENT_LOG, log_event
 
 # Logging Configuration
 logging.basicConfig(
@@ -19,6 +39,11 @@ print("--- STARTING HHEURISTICS BACKEND v2.1 (Status Enabled) ---")
 
 app = FastAPI()
 
+# Rate limiting and load shedding for expensive routes (admission.py).
+# Registered before the other middleware so it runs innermost: rejections
+# still get CORS headers and show up in the request metrics.
+app.middleware("http")(ADMISSION)
+
 # Configure CORS
 app.add_middleware(
     CORSMiddleware,
@@ -28,26 +53,52 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    """Per-route latency histogram, labelled by route template to keep cardinality bounded"""
+    start = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        route = request.scope.get("route")
+        metrics.HTTP_REQUEST_SECONDS.observe(
+            time.perf_counter() - start,
+            method=request.method,
+            route=getattr(route, "path", "unmatched"),
+            status=status
+        )
+
 # Initialize Managers
-data_manager = DataProductManager()
+partition_store = PartitionStore()
+data_access = DataAccess(partition_store)
+data_manager = DataProductManager(store=partition_store)
+export_jobs = ExportJobManager(store=partition_store)
+panel_store = PanelStore()
+drift_monitor = DriftMonitor()
+response_cache = http_cache.ResponseCache()
+# Identical concurrent requests (same route, params and data generation) share one computation
+request_flights = http_cache.SingleFlight()
 
 # Global ML State
-import threading
-import time
-
 ml_status = {
     "ready": False,
     "step": "Booting v2.1 Kernel",
-    "logs": [
-        f"[{datetime.now().strftime('%H:%M:%S')}] System power-on self-test initiated...",
-        f"[{datetime.now().strftime('%H:%M:%S')}] HHeuristics Engine v2.1-stable detected.",
-        f"[{datetime.now().strftime('%H:%M:%S')}] Verifying hardware acceleration (CUDA/MPS)...",
-        f"[{datetime.now().strftime('%H:%M:%S')}] Mounting data volumes...",
-        f"[{datetime.now().strftime('%H:%M:%S')}] Kernel loaded. Starting background services..."
-    ],
     "progress": 5
 }
 
+# Start-up messages go to the shared event log (a bounded ring), not ml_status
+for line in [
+    "System power-on self-test initiated...",
+    "HHeuristics Engine v2.1-stable detected.",
+    "Verifying hardware acceleration (CUDA/MPS)...",
+    "Mounting data volumes...",
+    "Kernel loaded. Starting background services..."
+]:
+    log_event("system", line)
+
 predictors = {}
 pnl_tracker = None
 
@@ -56,7 +107,7 @@ def initialize_ml_engine():
     
     try:
         ml_status["step"] = "Importing ML Libraries"
-        ml_status["logs"].append("Loading NumPy, Pandas, and Scikit-Learn...")
+        log_event("ml", "Loading NumPy, Pandas, and Scikit-Learn...")
         ml_status["progress"] = 10
         
         # Lazy import to prevent startup timeout
@@ -67,7 +118,7 @@ def initialize_ml_engine():
         )
         
         ml_status["progress"] = 30
-        ml_status["logs"].append("ML Core Libraries loaded successfully.")
+        log_event("ml", "ML Core Libraries loaded successfully.")
         
         ml_status["step"] = "Initializing PnL Tracker"
         pnl_tracker = PnLTracker()
@@ -85,24 +136,28 @@ def initialize_ml_engine():
         total_verts = len(verticals)
         for i, (slug, cls) in enumerate(verticals):
             ml_status["step"] = f"Training {slug.replace('_', ' ').title()} Model"
-            ml_status["logs"].append(f"Initializing {slug} predictor...")
+            log_event("ml", f"Initializing {slug} predictor...", vertical=slug)
             
             # Simulate "heavy" loading/training time for UX visibility
             # In production, this would be actual model loading time
             time.sleep(1.5) 
             
-            predictors[slug] = cls(slug, pnl_tracker)
-            ml_status["logs"].append(f"✓ {slug} model ready.")
+            predictor = cls(slug, pnl_tracker)
+            # Reference stats and global importances from the stored history
+            predictor.fit_reference(data_access.load(slug))
+            predictor.drift_monitor = drift_monitor
+            predictors[slug] = predictor
+            log_event("ml", f"✓ {slug} model ready.", vertical=slug)
             ml_status["progress"] = 40 + int(((i + 1) / total_verts) * 50)
             
         ml_status["step"] = "Finalizing"
-        ml_status["logs"].append("All ML models active. Engine online.")
+        log_event("ml", "All ML models active. Engine online.")
         ml_status["progress"] = 100
         ml_status["ready"] = True
         
     except Exception as e:
         ml_status["step"] = "Error"
-        ml_status["logs"].append(f"CRITICAL ERROR: {str(e)}")
+        log_event("ml", f"CRITICAL ERROR: {str(e)}", level="error")
         logger.error(f"ML Init Failed: {e}")
 
 # Mount Static Files (React Build)
@@ -112,105 +167,111 @@ if os.path.exists("frontend/dist/assets"):
 
 @app.on_event("startup")
 async def startup_event():
-    """Run data pipeline and ML init on startup"""
-    logger.info("Triggering startup data pipeline...")
+    """
+    Start data pipeline and ML init in the background. Nothing here may block:
+    the server only binds once startup returns, and pandas, NumPy and the
+    data engine are imported by these tasks rather than by app.py.
+    """
+    global live_feed_task, pipeline_task
+    
+    # Shared producer for /api/stream subscribers
+    live_feed_task = asyncio.create_task(live_feed_producer())
     
     # Start ML Init in Background
     thread = threading.Thread(target=initialize_ml_engine)
     thread.daemon = True
     thread.start()
     
+    pipeline_task = asyncio.create_task(run_startup_pipeline())
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    export_jobs.shutdown()
+    data_access.shutdown()
+
+pipeline_task = None
+
+def _update_dataset():
+    # Lazy import: update_data pulls in pandas, NumPy, Faker and the Play Store scraper
+    from update_data import update_dataset
+    return update_dataset()
+
+async def run_startup_pipeline():
+    """Run the Premium Data Engine off the event loop once the server is up"""
+    logger.info("Triggering startup data pipeline...")
     try:
-        # Run the Premium Data Engine
-        added_bytes = update_dataset()
+        added_bytes = await asyncio.to_thread(_update_dataset)
         logger.info(f"Startup pipeline completed. Added {added_bytes} bytes.")
     except Exception as e:
         logger.error(f"Startup pipeline failed: {e}")
 
 @app.get("/api/catalog")
-async def get_catalog():
+async def get_catalog(request: Request):
     """API Endpoint for React Frontend"""
     try:
-        # 1. Get System Status
         data_dir = os.getenv("DATA_DIR", "data")
         status_path = os.path.join(data_dir, "status.json")
-        if os.path.exists(status_path):
-            with open(status_path, 'r') as f:
-                system_status = json.load(f)
+        
+        # Validated against status.json and every vertical's partition index
+        signature, last_modified = http_cache.file_signature(paths=[status_path])
+        validator = (signature, tuple(partition_store.version(v) for v in VERTICAL_BASENAMES))
+        cached = response_cache.get(request.url.path, validator)
+        if cached is not None:
+            return http_cache.respond(request, cached, CACHE_POLICIES["catalog"])
+        
+        async def compute():
+            # 1. Get System Status
+            system_status = await data_access.aread_json(status_path)
+            if system_status is not None:
+                system_status = dict(system_status)  # shared with concurrent readers
                 # Format data added
                 added = system_status.get('total_added_bytes', 0)
                 if added > 1024 * 1024:
                     system_status['data_added'] = f"{added / (1024*1024):.2f} MB"
                 else:
                     system_status['data_added'] = f"{added / 1024:.2f} KB"
-        else:
-            system_status = {"last_update": "Never", "data_added": "0 KB"}
-
-        # 2. Generate Product Catalog
-        verticals = {
-            "Fintech Growth Intelligence": [],
-            "AI Talent & Capital Prediction": [],
-            "ESG Impact & Greenwashing Detector": [],
-            "Regulatory Compliance Prediction": [],
-            "Supply Chain Resilience Intelligence": []
-        }
-        
-        # Map filenames to verticals
-        product_map = {
-            "fintech": "Fintech Growth Intelligence",
-            "ai_talent": "AI Talent & Capital Prediction",
-            "esg": "ESG Impact & Greenwashing Detector",
-            "regulatory": "Regulatory Compliance Prediction",
-            "supply_chain": "Supply Chain Resilience Intelligence"
-        }
-
-        # Scan for files
-        for key, v_name in product_map.items():
-            # Find bundle/yearly files
-            # Note: We disabled monthly, so we look for what exists
-            # We use the smart_split_csv logic to find generated files
-            # Actually, simpler to just scan the directories
-            
-            # Check bundles
-            for f in os.listdir(data_manager.dirs['bundles']):
-                if f.startswith(key):
-                    path = os.path.join(data_manager.dirs['bundles'], f)
-                    verticals[v_name].append({
-                        'description': 'Complete Historical Bundle',
-                        'type': 'BUNDLE',
-                        'size_mb': f"{os.path.getsize(path)/(1024*1024):.2f}",
-                        'rows': 'All Time', # simplified
-                        'download_url': f"/download/{f}"
-                    })
-            
-            # Check yearly
-            for f in os.listdir(data_manager.dirs['yearly']):
-                if f.startswith(key):
-                    path = os.path.join(data_manager.dirs['yearly'], f)
-                    verticals[v_name].append({
-                        'description': f"{f.split('_')[-1].replace('.csv','')} Full Year",
-                        'type': 'YEARLY',
-                        'size_mb': f"{os.path.getsize(path)/(1024*1024):.2f}",
-                        'rows': '365 Days',
-                        'download_url': f"/download/{f}"
-                    })
-            
-            # Check quarterly
-            for f in os.listdir(data_manager.dirs['quarterly']):
-                if f.startswith(key):
-                    path = os.path.join(data_manager.dirs['quarterly'], f)
+            else:
+                system_status = {"last_update": "Never", "data_added": "0 KB"}
+
+            # 2. Generate Product Catalog
+            verticals = {
+                "Fintech Growth Intelligence": [],
+                "AI Talent & Capital Prediction": [],
+                "ESG Impact & Greenwashing Detector": [],
+                "Regulatory Compliance Prediction": [],
+                "Supply Chain Resilience Intelligence": []
+            }
+
+            # Map filenames to verticals
+            product_map = {
+                "fintech": "Fintech Growth Intelligence",
+                "ai_talent": "AI Talent & Capital Prediction",
+                "esg": "ESG Impact & Greenwashing Detector",
+                "regulatory": "Regulatory Compliance Prediction",
+                "supply_chain": "Supply Chain Resilience Intelligence"
+            }
+
+            # Products are virtual: listed from the partition index and only
+            # rendered when first downloaded
+            for key, v_name in product_map.items():
+                for product in data_manager.list_products(key):
+                    info = data_manager.describe(product)
                     verticals[v_name].append({
-                        'description': f"{f.split('_')[-2]} {f.split('_')[-1].replace('.csv','')}",
-                        'type': 'QUARTERLY',
-                        'size_mb': f"{os.path.getsize(path)/(1024*1024):.2f}",
-                        'rows': '90 Days',
-                        'download_url': f"/download/{f}"
+                        'description': info['description'],
+                        'type': product.tier.upper(),
+                        'size_mb': f"{info['size_mb']:.2f}",
+                        'rows': info['rows'],
+                        'price': info['price'],
+                        'download_url': f"/download/{product.filename}"
                     })
 
-        return JSONResponse({
-            "system_status": system_status,
-            "verticals": verticals
-        })
+            return response_cache.put(request.url.path, validator, {
+                "system_status": system_status,
+                "verticals": verticals
+            }, last_modified)
+
+        entry = await request_flights.do("catalog", (request.url.path, validator), compute)
+        return http_cache.respond(request, entry, CACHE_POLICIES["catalog"])
     except Exception as e:
         logger.error(f"Error rendering marketplace: {e}")
         logger.error(traceback.format_exc())
@@ -221,111 +282,100 @@ from json_utils import convert_numpy_types, log_object_types
 # ... (imports remain the same)
 
 @app.get("/api/preview/{vertical}")
-async def get_preview(vertical: str):
+async def get_preview(vertical: str, request: Request):
     """Get preview data for a specific vertical"""
     try:
-        data_dir = os.getenv("DATA_DIR", "data")
-        
-        # Map vertical slug to filename
-        files = {
-            "fintech": "fintech_growth_digest.csv",
-            "ai_talent": "ai_talent_heatmap.csv",
-            "esg": "esg_sentiment_tracker.csv",
-            "regulatory": "regulatory_risk_index.csv",
-            "supply_chain": "supply_chain_risk.csv"
-        }
-        
-        if vertical not in files:
+        if vertical not in VERTICAL_BASENAMES:
             raise HTTPException(404, "Vertical not found")
-            
-        fpath = os.path.join(data_dir, files[vertical])
-        if not os.path.exists(fpath):
-            # Fallback to local data dir if env var path is empty (e.g. local dev)
-            fpath = os.path.join("data", files[vertical])
-            if not os.path.exists(fpath):
-                 return JSONResponse({"error": "Data not generated yet"}, status_code=404)
-        
-        # Read CSV with pandas
-        import pandas as pd
-        df = pd.read_csv(fpath)
         
-        # Get last 30 days for charts
-        history = df.tail(30).to_dict(orient='records')
+        # Reuse the encoded body until the vertical's partitions change
+        version = partition_store.version(vertical)
+        cached = response_cache.get(request.url.path, version)
+        if cached is not None:
+            return http_cache.respond(request, cached, CACHE_POLICIES["preview"])
         
-        # Get latest row for "Live Signals"
-        latest = df.iloc[-1].to_dict()
-        
-        response_data = {
-            "vertical": vertical,
-            "latest": latest,
-            "history": history,
-            "total_rows": len(df)
-        }
-        
-        # Ensure all types are JSON serializable
-        response_data = convert_numpy_types(response_data)
-        
-        return JSONResponse(response_data)
+        async def compute():
+            # Only the newest partition(s) are read, regardless of history length
+            df = await data_access.atail(vertical, 30)
+            if df.empty:
+                return None
+
+            # Get last 30 rows for charts (raw numbers; display formatting is
+            # only applied to CSV exports)
+            history = to_records(df)
+
+            # Get latest row for "Live Signals"
+            latest = history[-1]
+
+            response_data = {
+                "vertical": vertical,
+                "latest": latest,
+                "history": history,
+                "total_rows": partition_store.total_rows(vertical)
+            }
+
+            # Ensure all types are JSON serializable
+            with metrics.SERIALIZATION_SECONDS.time(route="/api/preview/{vertical}"):
+                response_data = convert_numpy_types(response_data)
+                return response_cache.put(request.url.path, version, response_data, version / 1e9)
+
+        entry = await request_flights.do("preview", (request.url.path, version), compute)
+        if entry is None:
+            return JSONResponse({"error": "Data not generated yet"}, status_code=404)
+        return http_cache.respond(request, entry, CACHE_POLICIES["preview"])
     except Exception as e:
         logger.error(f"Error fetching preview: {e}")
         return JSONResponse({"error": str(e)}, status_code=500)
 
+def _format_size(size_bytes):
+    if size_bytes > 1024*1024:
+        return f"{size_bytes / (1024*1024):.2f} MB"
+    return f"{size_bytes / 1024:.2f} KB"
+
 @app.get("/api/files/{vertical}")
-async def get_vertical_files(vertical: str):
+async def get_vertical_files(vertical: str, request: Request):
     """Get list of downloadable files for a vertical"""
     try:
-        data_dir = os.getenv("DATA_DIR", "data")
-        
-        # Map vertical to base filename
-        base_map = {
-            "fintech": "fintech_growth_digest",
-            "ai_talent": "ai_talent_heatmap",
-            "esg": "esg_sentiment_tracker",
-            "regulatory": "regulatory_risk_index",
-            "supply_chain": "supply_chain_risk"
-        }
-        
-        if vertical not in base_map:
+        if vertical not in VERTICAL_BASENAMES:
             raise HTTPException(404, "Vertical not found")
-            
-        base_name = base_map[vertical]
-        files_list = []
         
-        # Check for Yearly and Quarterly files
-        # Pattern: {base_name}_2025_yearly.csv, {base_name}_2025_q1.csv, etc.
+        # Products are listed from the partition index, so it alone validates the list
+        validator = partition_store.version(vertical)
+        cached = response_cache.get(request.url.path, validator)
+        if cached is not None:
+            return http_cache.respond(request, cached, CACHE_POLICIES["files"])
         
-        # 1. Yearly
-        yearly_name = f"{base_name}_2025_yearly.csv"
-        y_path = os.path.join(data_dir, yearly_name)
-        if os.path.exists(y_path):
-            size_bytes = os.path.getsize(y_path)
-            size_str = f"{size_bytes / (1024*1024):.2f} MB" if size_bytes > 1024*1024 else f"{size_bytes / 1024:.2f} KB"
+        # Yearly and Quarterly products for every year in the store, newest first.
+        # Sizes are estimated from the partitions; files are rendered on download.
+        files_list = []
+        for product in data_manager.list_products(vertical):
+            if product.tier == 'bundle':
+                continue
             files_list.append({
-                "name": "2025 Full Year",
-                "filename": yearly_name,
-                "size": size_str,
-                "type": "YEARLY"
+                "name": f"{product.year} Full Year" if product.tier == 'yearly' else product.period,
+                "filename": product.filename,
+                "size": _format_size(product.estimated_bytes),
+                "type": product.tier.upper()
             })
-            
-        # 2. Quarterly
-        for q in [1, 2, 3, 4]:
-            q_name = f"{base_name}_2025_q{q}.csv"
-            q_path = os.path.join(data_dir, q_name)
-            if os.path.exists(q_path):
-                size_bytes = os.path.getsize(q_path)
-                size_str = f"{size_bytes / (1024*1024):.2f} MB" if size_bytes > 1024*1024 else f"{size_bytes / 1024:.2f} KB"
-                files_list.append({
-                    "name": f"2025 Q{q}",
-                    "filename": q_name,
-                    "size": size_str,
-                    "type": "QUARTERLY"
-                })
+        last_modified = validator / 1e9
                 
-        return JSONResponse({"files": files_list})
+        entry = response_cache.put(request.url.path, validator, {"files": files_list}, last_modified)
+        return http_cache.respond(request, entry, CACHE_POLICIES["files"])
     except Exception as e:
         logger.error(f"Error listing files: {e}")
         return JSONResponse({"error": str(e)}, status_code=500)
 
+async def _serve_product(product):
+    """Render any missing chunks of a product, then stream them back to back; they stay pinned until sent"""
+    manifest = await asyncio.to_thread(data_manager.materialize, product)
+    return StreamingResponse(
+        manifest,
+        media_type='text/csv',
+        headers={"Content-Disposition": f"attachment; filename={product.filename}",
+                 "Content-Length": str(manifest.size)},
+        background=BackgroundTask(manifest.close)
+    )
+
 @app.get("/api/download/{filename}")
 async def download_dataset(filename: str):
     """Download a specific CSV file"""
@@ -337,10 +387,14 @@ async def download_dataset(filename: str):
         if ".." in filename or "/" in filename:
              raise HTTPException(400, "Invalid filename")
 
-        if not os.path.exists(fpath):
+        product = data_manager.resolve(filename)
+        if product is not None:
+            return await _serve_product(product)
+
+        if not await data_access.aexists(fpath):
             # Fallback for local dev
             fpath = os.path.join("data", filename)
-            if not os.path.exists(fpath):
+            if not await data_access.aexists(fpath):
                  raise HTTPException(404, "File not found")
         
         return FileResponse(
@@ -349,61 +403,144 @@ async def download_dataset(filename: str):
             media_type='text/csv', 
             headers={"Content-Disposition": f"attachment; filename={filename}"}
         )
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error downloading file: {e}")
         raise HTTPException(500, str(e))
 
+@app.post("/api/exports")
+async def submit_export(request: Request):
+    """
+    Start a custom slice export, e.g. {"verticals": ["esg"], "companies": [...],
+    "start": "2025-01-01", "end": "2025-06-30", "columns": [...], "format": "csv"}.
+    Identical requests on unchanged data return the same job.
+    """
+    try:
+        body = await request.json()
+    except ValueError:
+        return JSONResponse({"error": "Request body must be JSON"}, status_code=400)
+    try:
+        job, created = await asyncio.to_thread(export_jobs.submit, body)
+    except ValueError as e:
+        return JSONResponse({"error": str(e)}, status_code=400)
+    except ExportQueueFull as e:
+        seconds = max(1, int(e.retry_after + 0.999))
+        return JSONResponse(
+            {"error": str(e), "retry_after": seconds},
+            status_code=503,
+            headers={"Retry-After": str(seconds)}
+        )
+    return JSONResponse(
+        job.to_dict(),
+        status_code=200 if job.status == "done" else 202,
+        headers={"Location": f"/api/exports/{job.id}", "Cache-Control": "no-store"}
+    )
+
+@app.get("/api/exports/{job_id}")
+async def get_export(job_id: str):
+    """Export job status and progress; live updates are on /api/stream?topics=export"""
+    job = export_jobs.get(job_id)
+    if job is None:
+        return JSONResponse({"error": "Export job not found"}, status_code=404)
+    return JSONResponse(job.to_dict(), headers={"Cache-Control": "no-store"})
+
+@app.get("/api/exports/{job_id}/download")
+async def download_export(job_id: str):
+    """Result file of a finished export job"""
+    job = export_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(404, "Export job not found")
+    if job.status != "done":
+        return JSONResponse({"error": f"Export is {job.status}", "status": job.status}, status_code=409)
+    path = export_jobs.open_result(job)
+    if path is None:
+        raise HTTPException(404, "Export result expired, submit the request again")
+    media_type = {".csv": "text/csv", ".zip": "application/zip", ".ndjson": "application/x-ndjson"}
+    return FileResponse(
+        path=path,
+        filename=job.filename,
+        media_type=media_type[os.path.splitext(job.filename)[1]],
+        headers={"Content-Disposition": f"attachment; filename={job.filename}"}
+    )
+
 @app.get("/api/version")
 async def get_version():
     """Get backend version"""
     return JSONResponse({"version": "v2.1", "status": "online"})
 
 @app.get("/api/status")
-async def get_ml_status():
-    """Get initialization status of ML engine"""
-    return JSONResponse(ml_status)
+async def get_ml_status(since: Optional[int] = None):
+    """
+    Get initialization status of ML engine, with the event log entries
+    after the `since` cursor (the latest ones when omitted). Clients send
+    back the returned `cursor` to fetch only new entries; `missed` counts
+    entries that left the ring before they were fetched.
+    """
+    events, cursor, missed = EVENT_LOG.since(since)
+    return JSONResponse({
+        **ml_status,
+        "logs": [e["message"] for e in events],
+        "events": events,
+        "cursor": cursor,
+        "missed": missed
+    }, headers={"Cache-Control": CACHE_POLICIES["none"]})
+
+async def _prediction_entry(vertical):
+    """
+    Cached prediction response for the vertical's current data generation,
+    shared by /api/predict and the live feed. Inference runs once per
+    generation (concurrent callers join it), and the predictor records one
+    simulated P&L trade per generation however many clients ask. None when
+    the vertical has no data yet.
+    """
+    path = f"/api/predict/{vertical}"
+    version = partition_store.version(vertical)
+    cached = response_cache.get(path, version)
+    if cached is not None:
+        return cached
+
+    async def compute():
+        # Get latest data for this vertical to run inference on
+        # Only the newest partition is read
+        df = await data_access.atail(vertical, 1)
+        if df.empty:
+            return None
+        latest_data = to_records(df)[-1]
+
+        # Run Prediction (off the loop: models may take up to their timeout)
+        predictor = predictors[vertical]
+        if not predictor.reference_fitted:
+            # The engine came up before the first pipeline run stored any history
+            history = await data_access.aload(vertical)
+            await asyncio.to_thread(predictor.fit_reference, history)
+        result = await asyncio.to_thread(predictor.predict, latest_data, version)
+
+        # Convert NumPy types to Python types
+        with metrics.SERIALIZATION_SECONDS.time(route="/api/predict/{vertical}"):
+            result = convert_numpy_types(result)
+            return response_cache.put(path, version, result, version / 1e9)
+
+    return await request_flights.do("predict", (path, version), compute)
 
 @app.get("/api/predict/{vertical}")
-async def get_prediction(vertical: str):
+async def get_prediction(vertical: str, request: Request):
     """Get live ML prediction for a vertical"""
     if not ml_status["ready"]:
         return JSONResponse(
             {"error": "ML Engine Loading", "detail": ml_status["step"]}, 
-            status_code=503
+            status_code=503,
+            headers={"Cache-Control": CACHE_POLICIES["none"]}
         )
 
     try:
         if vertical not in predictors:
             raise HTTPException(404, "Predictor not found")
-            
-        # Get latest data for this vertical to run inference on
-        # We reuse the logic from get_preview to fetch the latest row
-        data_dir = os.getenv("DATA_DIR", "data")
-        files = {
-            "fintech": "fintech_growth_digest.csv",
-            "ai_talent": "ai_talent_heatmap.csv",
-            "esg": "esg_sentiment_tracker.csv",
-            "regulatory": "regulatory_risk_index.csv",
-            "supply_chain": "supply_chain_risk.csv"
-        }
         
-        fpath = os.path.join(data_dir, files[vertical])
-        if not os.path.exists(fpath):
-             # Fallback
-             fpath = os.path.join("data", files[vertical])
-        
-        import pandas as pd
-        df = pd.read_csv(fpath)
-        latest_data = df.iloc[-1].to_dict()
-        
-        # Run Prediction
-        predictor = predictors[vertical]
-        result = predictor.predict(latest_data)
-        
-        # Convert NumPy types to Python types
-        result = convert_numpy_types(result)
-        
-        return JSONResponse(result)
+        entry = await _prediction_entry(vertical)
+        if entry is None:
+            return JSONResponse({"error": "Data not generated yet"}, status_code=404)
+        return http_cache.respond(request, entry, CACHE_POLICIES["predict"])
     except Exception as e:
         logger.error(f"Prediction failed: {e}")
         # Detailed logging for debugging
@@ -420,6 +557,123 @@ async def get_prediction(vertical: str):
             
         return JSONResponse({"error": str(e)}, status_code=500)
 
+@app.get("/api/backtest/{vertical}")
+async def get_backtest(vertical: str, request: Request, horizon_days: int = 30, year: Optional[int] = None):
+    """Replay a vertical's stored history through its predictor and trade it (see ml_engine/backtest.py)"""
+    if not ml_status["ready"]:
+        return JSONResponse(
+            {"error": "ML Engine Loading", "detail": ml_status["step"]},
+            status_code=503,
+            headers={"Cache-Control": CACHE_POLICIES["none"]}
+        )
+    if vertical not in predictors:
+        return JSONResponse({"error": "Predictor not found"}, status_code=404)
+    if not 1 <= horizon_days <= 365:
+        return JSONResponse({"error": "horizon_days must be between 1 and 365"}, status_code=400)
+
+    try:
+        from ml_engine.backtest import run_backtest
+
+        version = partition_store.version(vertical)
+        cached = response_cache.get(str(request.url), version)
+        if cached is not None:
+            return http_cache.respond(request, cached, CACHE_POLICIES["backtest"])
+
+        def replay():
+            predictor = predictors[vertical]
+            history = data_access.load(vertical, year=year)
+            if not predictor.reference_fitted:
+                predictor.fit_reference(history)
+            return run_backtest(predictor, history, horizon_days=horizon_days)
+
+        async def compute():
+            # A multi-year replay is heavier than a request should block the loop for
+            result = await asyncio.to_thread(replay)
+            if not result["predictions"]:
+                return None
+            with metrics.SERIALIZATION_SECONDS.time(route="/api/backtest/{vertical}"):
+                return response_cache.put(str(request.url), version, convert_numpy_types(result), version / 1e9)
+
+        entry = await request_flights.do("backtest", (str(request.url), version), compute)
+        if entry is None:
+            return JSONResponse({"error": "Data not generated yet"}, status_code=404)
+        return http_cache.respond(request, entry, CACHE_POLICIES["backtest"])
+    except Exception as e:
+        logger.error(f"Backtest failed: {e}")
+        return JSONResponse({"error": str(e)}, status_code=500)
+
+PANEL_MAX_ROWS = int(os.getenv("PANEL_MAX_ROWS", "10000"))
+
+@app.get("/api/panel")
+async def get_panel(request: Request, start: str = None, end: str = None, companies: str = None,
+                    verticals: str = None, columns: str = None, limit: int = 1000, offset: int = 0):
+    """
+    Cross-vertical panel: one row per (date, company) with `{vertical}.{column}`
+    values side by side. ?verticals=esg,fintech or ?columns=esg.greenwashing_index,...
+    select columns (and keep only rows with data in them); start/end/companies
+    filter rows; limit/offset page through them.
+    """
+    try:
+        for value, name in ((start, "start"), (end, "end")):
+            if value is not None:
+                datetime.strptime(value, "%Y-%m-%d")
+    except ValueError:
+        return JSONResponse({"error": "start and end must be YYYY-MM-DD dates"}, status_code=400)
+    if not 1 <= limit <= PANEL_MAX_ROWS or offset < 0:
+        return JSONResponse({"error": f"limit must be between 1 and {PANEL_MAX_ROWS}, offset >= 0"}, status_code=400)
+    selected_verticals = [v for v in verticals.split(",") if v] if verticals else None
+    if selected_verticals and set(selected_verticals) - set(VERTICAL_BASENAMES):
+        return JSONResponse({"error": "Unknown verticals"}, status_code=400)
+    selected = [c for c in columns.split(",") if c] if columns else panel_columns(selected_verticals)
+    unknown = set(selected) - set(panel_columns())
+    if unknown:
+        return JSONResponse({"error": f"Unknown columns: {', '.join(sorted(unknown))}"}, status_code=400)
+
+    try:
+        version = panel_store.version()
+        if not version:
+            return JSONResponse({"error": "Panel not built yet"}, status_code=404)
+        cached = response_cache.get(str(request.url), version)
+        if cached is not None:
+            return http_cache.respond(request, cached, CACHE_POLICIES["panel"])
+
+        def query():
+            df = panel_store.load(start=start, end=end,
+                                  companies=[c for c in companies.split(",") if c] if companies else None,
+                                  columns=selected)
+            if verticals or columns:
+                df = df[df[selected].notna().any(axis=1)]
+            return {
+                "columns": ["date", "company"] + selected,
+                "total_rows": int(len(df)),
+                "offset": offset,
+                "limit": limit,
+                "rows": to_panel_records(df.iloc[offset:offset + limit])
+            }
+
+        async def compute():
+            result = await asyncio.to_thread(query)
+            with metrics.SERIALIZATION_SECONDS.time(route="/api/panel"):
+                return response_cache.put(str(request.url), version, convert_numpy_types(result), version / 1e9)
+
+        entry = await request_flights.do("panel", (str(request.url), version), compute)
+        return http_cache.respond(request, entry, CACHE_POLICIES["panel"])
+    except Exception as e:
+        logger.error(f"Panel query failed: {e}")
+        return JSONResponse({"error": str(e)}, status_code=500)
+
+@app.get("/api/drift")
+async def get_drift(vertical: str = None):
+    """Drift and data-quality summary per vertical and column (see drift.py), with open alerts"""
+    if vertical is not None and vertical not in VERTICAL_BASENAMES:
+        return JSONResponse({"error": "Unknown vertical"}, status_code=404)
+    summaries = {v: drift_monitor.summary(v) for v in ([vertical] if vertical else VERTICAL_BASENAMES)}
+    return JSONResponse(
+        {"alerts": {v: s["alerts"] for v, s in summaries.items() if s and s["alerts"]},
+         "verticals": summaries},
+        headers={"Cache-Control": CACHE_POLICIES["none"]}
+    )
+
 @app.get("/api/pnl")
 async def get_pnl_metrics():
     """Get global P&L tracking metrics"""
@@ -436,6 +690,198 @@ async def get_pnl_metrics():
         logger.error(f"PnL fetch failed: {e}")
         return JSONResponse({"error": str(e)}, status_code=500)
 
+# --- Live feed (/api/stream) ---
+# One producer detects changes and publishes each update once; the
+# broadcaster fans it out to every connected dashboard. Nothing is computed
+# while nobody is subscribed.
+
+STREAM_POLL_SECONDS = float(os.getenv("STREAM_POLL_SECONDS", "1"))
+STREAM_PNL_SECONDS = float(os.getenv("STREAM_PNL_SECONDS", "5"))
+STREAM_HEARTBEAT_SECONDS = float(os.getenv("STREAM_HEARTBEAT_SECONDS", "15"))
+
+live_feed_task = None
+_feed_state = {"status": None, "max_dates": {}, "predicted": set(), "pnl": {}, "pnl_at": 0.0}
+
+def _collect_live_updates():
+    """
+    One round of change detection for the live feed (runs in a worker
+    thread). Returns the verticals due a fresh prediction, which the
+    producer takes from the shared predict path.
+    """
+    state = _feed_state
+    due = []
+    
+    # ML engine status (log lines are published by the event log itself)
+    status = {"ready": ml_status["ready"], "step": ml_status["step"], "progress": ml_status["progress"]}
+    if status != state["status"]:
+        streaming.publish("status", status, key="ml")
+        state["status"] = status
+    
+    for vertical in VERTICAL_BASENAMES:
+        # New daily rows, detected from the partition index
+        max_date = partition_store.max_date(vertical)
+        previous = state["max_dates"].get(vertical)
+        if max_date is None:
+            continue
+        if previous is not None and max_date > previous:
+            start = datetime.strptime(previous, "%Y-%m-%d") + timedelta(days=1)
+            rows = to_records(data_access.load(vertical, start=start))
+            streaming.publish("rows", {"vertical": vertical, "rows": rows, "total_rows": partition_store.total_rows(vertical)})
+            state["predicted"].discard(vertical)
+        state["max_dates"][vertical] = max_date
+        
+        # Fresh prediction when the vertical's data changed (or on first readiness)
+        if ml_status["ready"] and vertical in predictors and vertical not in state["predicted"]:
+            due.append(vertical)
+    
+    # P&L metric deltas
+    if pnl_tracker is not None and time.monotonic() - state["pnl_at"] >= STREAM_PNL_SECONDS:
+        current = pnl_tracker.get_performance_metrics()
+        changed = {k: v for k, v in current.items() if state["pnl"].get(k) != v}
+        if changed:
+            streaming.publish("pnl", {"metrics": current, "changed": changed}, key="pnl")
+            state["pnl"] = current
+        state["pnl_at"] = time.monotonic()
+    return due
+
+async def live_feed_producer():
+    """Background task feeding the broadcaster while at least one client is subscribed"""
+    while True:
+        await asyncio.sleep(STREAM_POLL_SECONDS)
+        if not streaming.BROADCASTER.subscriber_count():
+            continue
+        try:
+            due = await asyncio.to_thread(_collect_live_updates)
+            for vertical in due:
+                # The same cached result (and single P&L trade) /api/predict serves
+                entry = await _prediction_entry(vertical)
+                if entry is not None:
+                    streaming.publish("prediction", {"vertical": vertical, **json.loads(entry.body)}, key=vertical)
+                _feed_state["predicted"].add(vertical)
+        except Exception as e:
+            logger.error(f"Live feed update failed: {e}")
+
+@app.get("/api/stream")
+async def stream_live_feed(request: Request, topics: str = None, format: str = "sse"):
+    """
+    Push channel for dashboards: pipeline progress, ML status/logs, new rows,
+    predictions and P&L deltas. Server-Sent Events by default (resumes from
+    Last-Event-ID); ?format=ndjson for line-delimited JSON. ?topics=rows,pnl
+    limits the feed.
+    """
+    if format not in ("sse", "ndjson"):
+        return JSONResponse({"error": "format must be 'sse' or 'ndjson'"}, status_code=400)
+    wanted = {t for t in topics.split(",") if t} if topics else None
+    last_id = request.headers.get("last-event-id") or request.query_params.get("last_event_id")
+    last_id = int(last_id) if last_id and last_id.isdigit() else None
+    
+    sub = streaming.BROADCASTER.subscribe(topics=wanted, last_event_id=last_id)
+    
+    async def body():
+        try:
+            if format == "sse":
+                yield b"retry: 5000\n\n"
+            async for frame in sub.frames(format, heartbeat=STREAM_HEARTBEAT_SECONDS):
+                yield frame
+        finally:
+            streaming.BROADCASTER.unsubscribe(sub)
+    
+    return StreamingResponse(
+        body(),
+        media_type="text/event-stream" if format == "sse" else "application/x-ndjson",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+def _collect_pnl_ledger_sizes():
+    if pnl_tracker is None:
+        return {}
+    return {
+        ("predictions",): len(pnl_tracker.predictions),
+        ("open_positions",): len(pnl_tracker.positions),
+        ("closed_trades",): len(pnl_tracker.closed_trades)
+    }
+
+metrics.PNL_LEDGER_SIZE.set_function(_collect_pnl_ledger_sizes)
+metrics.EXPORT_QUEUE.set_function(export_jobs.queue_state)
+metrics.DATA_READS_IN_FLIGHT.set_function(data_access.inflight)
+metrics.IN_FLIGHT_COMPUTATIONS.set_function(request_flights.inflight)
+metrics.DRIFT_PSI.set_function(drift_monitor.psi_values)
+metrics.DRIFT_ALERTS.set_function(drift_monitor.alert_counts)
+metrics.PRODUCT_CACHE_BYTES.set_function(lambda: data_manager._cache.size() if data_manager._cache else 0)
+
+@app.get("/metrics")
+async def get_metrics():
+    """Prometheus text exposition of API, pipeline and ML metrics"""
+    return PlainTextResponse(metrics.REGISTRY.render(), media_type=metrics.CONTENT_TYPE_LATEST)
+
+_LOOPBACK_HOSTS = {"127.0.0.1", "::1", "localhost"}
+
+def _require_admin(request: Request):
+    """
+    With ADMIN_TOKEN set, X-Admin-Token must match it. Without one, only
+    direct loopback clients are let in: a proxied request (X-Forwarded-For
+    or Forwarded present) is refused even if the proxy itself is local.
+    """
+    token = os.getenv("ADMIN_TOKEN")
+    if token:
+        if not hmac.compare_digest(request.headers.get("x-admin-token", ""), token):
+            raise HTTPException(403, "Admin token required")
+        return
+    host = request.client.host if request.client else None
+    proxied = "x-forwarded-for" in request.headers or "forwarded" in request.headers
+    if host not in _LOOPBACK_HOSTS or proxied:
+        raise HTTPException(403, "Admin endpoints need ADMIN_TOKEN set, or a direct local connection")
+
+@app.get("/api/admin/profile")
+async def get_profile(request: Request, top: int = 10):
+    """Per-stage span timings, with CPU/allocation attribution for sampled spans"""
+    _require_admin(request)
+    return JSONResponse(PROFILER.snapshot(top_n=top))
+
+@app.post("/api/admin/profile/config")
+async def configure_profile(request: Request):
+    """Toggle profiling at runtime, e.g. {"sample_rate": 0.1, "cprofile": true, "tracemalloc": true}"""
+    _require_admin(request)
+    body = await request.json()
+    settings = PROFILER.configure(
+        enabled=body.get("enabled"),
+        sample_rate=body.get("sample_rate"),
+        cprofile=body.get("cprofile"),
+        tracemalloc_on=body.get("tracemalloc")
+    )
+    logger.info(f"Profiler reconfigured: {settings}")
+    return JSONResponse(settings)
+
+@app.post("/api/admin/profile/dump")
+async def dump_profile(request: Request):
+    """Write the current profile to DATA_DIR/profiles"""
+    _require_admin(request)
+    data_dir = os.getenv("DATA_DIR", "data")
+    paths = PROFILER.dump(os.path.join(data_dir, "profiles"))
+    return JSONResponse({"files": paths})
+
+@app.get("/api/admin/imports")
+async def get_import_times(request: Request, module: str = "app", top: int = 25):
+    """`python -X importtime` report for importing `module` in a fresh interpreter"""
+    _require_admin(request)
+    if not all(part.isidentifier() for part in module.split(".")):
+        return JSONResponse({"error": "Invalid module name"}, status_code=400)
+    report = await asyncio.to_thread(profiling.import_times, module, top)
+    return JSONResponse(report)
+
+@app.get("/api/admin/products/cache")
+async def get_product_cache(request: Request):
+    """Product chunk store: disk usage against the budget and per-product hits, chunk renders and bytes served"""
+    _require_admin(request)
+    return JSONResponse(data_manager.cache.snapshot())
+
+@app.post("/api/admin/profile/reset")
+async def reset_profile(request: Request):
+    """Clear accumulated span statistics"""
+    _require_admin(request)
+    PROFILER.reset()
+    return JSONResponse({"status": "reset"})
+
 @app.get("/")
 async def read_root():
     """Serve React App"""
@@ -451,6 +897,9 @@ async def read_root():
 
 @app.get("/download/{filename}")
 async def download_file(filename: str):
+    product = data_manager.resolve(filename)
+    if product is not None:
+        return await _serve_product(product)
     # Search in all dirs
     data_dir = os.getenv("DATA_DIR", "data")
     for dtype in ['bundles', 'yearly', 'quarterly', 'monthly']:
@@ -460,5 +909,6 @@ async def download_file(filename: str):
     raise HTTPException(404, "File not found")
 
 if __name__ == "__main__":
+    import uvicorn
     port = int(os.environ.get("PORT", 7860))
     uvicorn.run(app, host="0.0.0.0", port=port)
@@ -0,0 +1,275 @@
+"""
+Scale-out load test: build a synthetic company universe with the pipeline's
+scale mode, then replay dashboard traffic against the ASGI app in-process.
+
+Usage:
+    python benchmarks/load_test.py                                   # 1000 companies, 1 year, 20 users, 30s
+    python benchmarks/load_test.py --companies 5000 --years 3 --users 100 --duration 120
+    python benchmarks/load_test.py --data-dir /tmp/hh_scale --companies 5000 --years 3   # reuse a generated universe
+
+Each virtual user is a dashboard session: it picks a request by weight
+(TRAFFIC), waits a random think time, and revalidates responses it has seen
+with If-None-Match like a browser would. Reports pipeline throughput, ML
+start-up time, per-route throughput and latency percentiles, and process
+memory (RSS) after each phase and at its peak.
+"""
+import argparse
+import asyncio
+import atexit
+import json
+import os
+import random
+import resource
+import shutil
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SEED = 1337
+
+# Requests a dashboard session makes, by relative weight
+TRAFFIC = {
+    "catalog": 20,
+    "preview": 20,
+    "predict": 15,
+    "pnl": 10,
+    "status": 10,
+    "version": 9,
+    "panel": 8,
+    "files": 5,
+    "drift": 2,
+    "backtest": 1
+}
+
+
+def _rss_mb():
+    """Current resident set size (Linux), else the peak."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except OSError:
+        return _peak_rss_mb()
+
+
+def _peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def _dir_mb(path):
+    total = 0
+    for root, _, files in os.walk(path):
+        total += sum(os.path.getsize(os.path.join(root, f)) for f in files)
+    return total / (1024 * 1024)
+
+
+def _percentile(values, pct):
+    ordered = sorted(values)
+    idx = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[idx]
+
+
+# --- Phases ---
+
+def generate(companies, years, workers):
+    """Run the pipeline in scale mode (only today's rows on a DATA_DIR generated with the same settings)."""
+    from partitions import PartitionStore, VERTICAL_BASENAMES
+    from update_data import update_dataset
+
+    start = time.perf_counter()
+    update_dataset(companies=companies, years=years)
+    elapsed = time.perf_counter() - start
+    store = PartitionStore()
+    rows = sum(store.total_rows(v) for v in VERTICAL_BASENAMES)
+    return {
+        "pipeline.s": elapsed,
+        "pipeline.rows": rows,
+        "pipeline.rows_per_s": rows / elapsed,
+        "pipeline.disk_mb": _dir_mb(os.environ["DATA_DIR"]),
+        "pipeline.rss_mb": _rss_mb()
+    }
+
+
+def prepare_app(admission):
+    """Import the app and bring the ML engine up as initialize_ml_engine does, without its sleeps."""
+    import app as app_module
+    from ml_engine.pnl_tracker import PnLTracker
+    from ml_engine.predictors import (
+        FintechPredictor, AiTalentPredictor, EsgPredictor,
+        RegulatoryPredictor, SupplyChainPredictor
+    )
+
+    start = time.perf_counter()
+    app_module.pnl_tracker = PnLTracker()
+    for slug, cls in [
+        ("fintech", FintechPredictor),
+        ("ai_talent", AiTalentPredictor),
+        ("esg", EsgPredictor),
+        ("regulatory", RegulatoryPredictor),
+        ("supply_chain", SupplyChainPredictor)
+    ]:
+        predictor = cls(slug, app_module.pnl_tracker)
+        predictor.fit_reference(app_module.partition_store.load(slug))
+        predictor.drift_monitor = app_module.drift_monitor
+        app_module.predictors[slug] = predictor
+    app_module.ml_status["ready"] = True
+    app_module.ADMISSION.enabled = admission
+    return app_module, {"ml_init.s": time.perf_counter() - start, "ml_init.rss_mb": _rss_mb()}
+
+
+def _request_builder(app_module, rng):
+    """Returns pick() -> (route, path), drawing paths the way the dashboard builds them."""
+    from partitions import VERTICAL_BASENAMES
+    from panel import panel_columns
+
+    verticals = list(VERTICAL_BASENAMES)
+    months = app_module.panel_store.months()
+    companies = sorted({str(c) for c in app_module.partition_store.tail("fintech", 1)["company"].unique()})
+    routes, weights = zip(*TRAFFIC.items())
+
+    def panel_path():
+        if not months:
+            return "/api/panel"
+        month = rng.choice(months)
+        vertical = rng.choice(verticals)
+        columns = ",".join(rng.sample(panel_columns([vertical]), 2))
+        path = f"/api/panel?start={month['min_date']}&end={month['max_date']}&columns={columns}"
+        if rng.random() < 0.5 and companies:
+            path += "&companies=" + ",".join(rng.sample(companies, min(5, len(companies))))
+        return path
+
+    paths = {
+        "catalog": lambda: "/api/catalog",
+        "preview": lambda: f"/api/preview/{rng.choice(verticals)}",
+        "predict": lambda: f"/api/predict/{rng.choice(verticals)}",
+        "pnl": lambda: "/api/pnl",
+        "status": lambda: "/api/status",
+        "version": lambda: "/api/version",
+        "panel": panel_path,
+        "files": lambda: f"/api/files/{rng.choice(verticals)}",
+        "drift": lambda: f"/api/drift?vertical={rng.choice(verticals)}",
+        "backtest": lambda: f"/api/backtest/{rng.choice(verticals)}?horizon_days=30"
+    }
+
+    def pick():
+        route = rng.choices(routes, weights)[0]
+        return route, paths[route]()
+
+    return pick
+
+
+def replay(app_module, users, duration, think_ms):
+    """Run `users` concurrent dashboard sessions for `duration` seconds."""
+    import httpx
+
+    samples = []  # (route, seconds, status)
+
+    async def session(client, user):
+        rng = random.Random(SEED + user)
+        pick = _request_builder(app_module, rng)
+        etags = {}
+        deadline = time.perf_counter() + duration
+        while time.perf_counter() < deadline:
+            route, path = pick()
+            headers = {"If-None-Match": etags[path]} if path in etags else {}
+            start = time.perf_counter()
+            response = await client.get(path, headers=headers)
+            samples.append((route, time.perf_counter() - start, response.status_code))
+            if response.headers.get("etag"):
+                etags[path] = response.headers["etag"]
+            await asyncio.sleep(rng.expovariate(1000 / think_ms) if think_ms else 0)
+
+    async def sample_memory(stop, readings):
+        while not stop.is_set():
+            readings.append(_rss_mb())
+            try:
+                await asyncio.wait_for(stop.wait(), 0.5)
+            except asyncio.TimeoutError:
+                pass
+
+    async def run():
+        transport = httpx.ASGITransport(app=app_module.app)
+        stop = asyncio.Event()
+        readings = []
+        async with httpx.AsyncClient(transport=transport, base_url="http://load", timeout=None) as client:
+            sampler = asyncio.create_task(sample_memory(stop, readings))
+            wall_start = time.perf_counter()
+            await asyncio.gather(*(session(client, user) for user in range(users)))
+            wall = time.perf_counter() - wall_start
+            stop.set()
+            await sampler
+        return wall, readings
+
+    wall, readings = asyncio.run(run())
+    results = {
+        "load.requests": len(samples),
+        "load.req_per_s": len(samples) / wall,
+        "load.errors": sum(1 for _, _, status in samples if status >= 400),
+        "load.rss_mb.max": max(readings, default=_rss_mb()),
+        "load.rss_mb.end": _rss_mb()
+    }
+    for route in TRAFFIC:
+        latencies = [seconds for name, seconds, _ in samples if name == route]
+        if not latencies:
+            continue
+        statuses = [status for name, _, status in samples if name == route]
+        results[f"load.{route}.requests"] = len(latencies)
+        results[f"load.{route}.req_per_s"] = len(latencies) / wall
+        results[f"load.{route}.p50_ms"] = _percentile(latencies, 50) * 1000
+        results[f"load.{route}.p95_ms"] = _percentile(latencies, 95) * 1000
+        results[f"load.{route}.p99_ms"] = _percentile(latencies, 99) * 1000
+        results[f"load.{route}.not_modified"] = statuses.count(304)
+        results[f"load.{route}.errors"] = sum(1 for status in statuses if status >= 400)
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="HHeuristics scale-out load test")
+    parser.add_argument("--companies", type=int, default=1000, help="Companies per vertical")
+    parser.add_argument("--years", type=int, default=1, help="Years of history to backfill")
+    parser.add_argument("--workers", type=int, help="Backfill processes (PIPELINE_WORKERS)")
+    parser.add_argument("--data-dir", help="Generate into / reuse this directory (default: a temporary one)")
+    parser.add_argument("--users", type=int, default=20, help="Concurrent dashboard sessions")
+    parser.add_argument("--duration", type=float, default=30.0, help="Seconds of traffic")
+    parser.add_argument("--think-ms", type=float, default=250.0, help="Mean pause between a session's requests")
+    parser.add_argument("--admission", action="store_true", help="Keep rate limits and load shedding on")
+    parser.add_argument("--output", help="Also write results JSON to this path")
+    args = parser.parse_args(argv)
+
+    # DATA_DIR and the scale settings are read at import time, so they must be set first.
+    if args.data_dir:
+        os.environ["DATA_DIR"] = args.data_dir
+    else:
+        os.environ["DATA_DIR"] = tempfile.mkdtemp(prefix="hh_load_")
+        atexit.register(shutil.rmtree, os.environ["DATA_DIR"], ignore_errors=True)
+    os.environ["SCALE_COMPANIES"] = str(args.companies)
+    os.environ["SCALE_YEARS"] = str(args.years)
+    if args.workers:
+        os.environ["PIPELINE_WORKERS"] = str(args.workers)
+    sys.path.insert(0, ROOT)
+    os.chdir(ROOT)
+
+    import logging
+    logging.disable(logging.WARNING)
+
+    results = {"baseline.rss_mb": _rss_mb()}
+    results.update(generate(args.companies, args.years, args.workers))
+    app_module, ml = prepare_app(args.admission)
+    results.update(ml)
+    results.update(replay(app_module, args.users, args.duration, args.think_ms))
+    results["peak_rss_mb"] = _peak_rss_mb()
+    app_module.export_jobs.shutdown()
+
+    for metric, value in results.items():
+        print(f"{metric:<35} {value:>14.3f}")
+
+    if args.output:
+        payload = {"seed": SEED, "python": sys.version.split()[0], "config": vars(args), "results": results}
+        with open(args.output, "w") as f:
+            json.dump(payload, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
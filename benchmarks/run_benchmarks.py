@@ -0,0 +1,389 @@
+"""
+Reproducible benchmark harness for the data pipeline, API and inference.
+
+Usage:
+    python benchmarks/run_benchmarks.py                    # run + compare to baseline
+    python benchmarks/run_benchmarks.py --update-baseline  # run + overwrite baseline
+    python benchmarks/run_benchmarks.py --quick            # smaller workloads
+
+Every run uses a throwaway DATA_DIR and seeded RNGs, so the generated inputs
+are identical between runs and only timing varies. Exits with status 1 when
+any metric regresses beyond the tolerance against the stored baseline.
+"""
+import argparse
+import asyncio
+import atexit
+import json
+import os
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BASELINE_PATH = os.path.join(ROOT, "benchmarks", "baseline.json")
+SEED = 1337
+
+# DATA_DIR and DATA_SEED are read at import time, so they must be set first.
+os.environ["DATA_DIR"] = tempfile.mkdtemp(prefix="hh_bench_")
+os.environ["DATA_SEED"] = str(SEED)
+atexit.register(shutil.rmtree, os.environ["DATA_DIR"], ignore_errors=True)
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)
+
+import numpy as np  # noqa: E402
+
+
+def seed_everything(seed=SEED):
+    random.seed(seed)
+    np.random.seed(seed)
+    try:
+        from faker import Faker
+        Faker.seed(seed)
+    except ImportError:
+        pass
+
+
+def _median_time(fn, repeats):
+    timings = []
+    result = None
+    for _ in range(repeats):
+        seed_everything()
+        start = time.perf_counter()
+        result = fn()
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings), result
+
+
+def _percentile(values, pct):
+    ordered = sorted(values)
+    idx = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[idx]
+
+
+# --- Benchmarks ---
+
+def bench_backfill(years_list, repeats):
+    """PremiumDataEngine backfill throughput (rows/s) per vertical."""
+    from update_data import PremiumDataEngine
+
+    results = {}
+    for years in years_list:
+        for key in PremiumDataEngine().verticals:
+            def run():
+                engine = PremiumDataEngine()
+                generator = engine.verticals[key]
+                rows = 0
+                for d in engine.generate_date_range(365 * years):
+                    rows += len(generator(d))
+                return rows
+
+            elapsed, rows = _median_time(run, repeats)
+            results[f"backfill.{key}.{years}y.rows_per_s"] = rows / elapsed
+    return results
+
+
+def bench_split(years, repeats):
+    """DataProductManager.smart_split_csv wall time and peak memory."""
+    import pandas as pd
+    from update_data import PremiumDataEngine
+    from product_manager import DataProductManager
+
+    seed_everything()
+    engine = PremiumDataEngine()
+    rows = []
+    for d in engine.generate_date_range(365 * years):
+        rows.extend(engine.generate_fintech_data(d))
+    master = os.path.join(os.environ["DATA_DIR"], "bench_master.csv")
+    pd.DataFrame(rows).to_csv(master, index=False)
+
+    manager = DataProductManager()
+    elapsed, _ = _median_time(lambda: manager.smart_split_csv(master, "bench_fintech"), repeats)
+
+    tracemalloc.start()
+    manager.smart_split_csv(master, "bench_fintech")
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        f"split.{years}y.wall_s": elapsed,
+        f"split.{years}y.peak_mb": peak / (1024 * 1024)
+    }
+
+
+def _prepare_app():
+    """Import the ASGI app with data generated and predictors loaded, without the startup sleeps."""
+    import app as app_module
+    from update_data import update_dataset
+    from ml_engine.pnl_tracker import PnLTracker
+    from ml_engine.predictors import (
+        FintechPredictor, AiTalentPredictor, EsgPredictor,
+        RegulatoryPredictor, SupplyChainPredictor
+    )
+
+    seed_everything()
+    update_dataset()
+    app_module.pnl_tracker = PnLTracker()
+    for slug, cls in [
+        ("fintech", FintechPredictor),
+        ("ai_talent", AiTalentPredictor),
+        ("esg", EsgPredictor),
+        ("regulatory", RegulatoryPredictor),
+        ("supply_chain", SupplyChainPredictor)
+    ]:
+        app_module.predictors[slug] = cls(slug, app_module.pnl_tracker)
+    app_module.ml_status["ready"] = True
+    # Measure the routes themselves, not the per-client rate limits
+    app_module.ADMISSION.enabled = False
+    return app_module
+
+
+def bench_api(concurrency, rounds):
+    """
+    Latency of hot API routes under concurrent load via an in-process ASGI
+    client. The server-side response cache is disabled so every request
+    runs the route; concurrent identical requests still share one
+    computation, as they do in production.
+    """
+    import httpx
+
+    app_module = _prepare_app()
+    # A zero-entry LRU drops every response as soon as it is stored
+    app_module.response_cache.clear()
+    app_module.response_cache.max_entries = 0
+    routes = {
+        "preview": "/api/preview/fintech",
+        "predict": "/api/predict/fintech",
+        "catalog": "/api/catalog"
+    }
+
+    async def timed_get(client, path):
+        start = time.perf_counter()
+        response = await client.get(path)
+        elapsed = time.perf_counter() - start
+        if response.status_code != 200:
+            raise RuntimeError(f"{path} returned {response.status_code}: {response.text[:200]}")
+        return elapsed
+
+    async def run():
+        results = {}
+        transport = httpx.ASGITransport(app=app_module.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            for name, path in routes.items():
+                await timed_get(client, path)  # warm-up
+                latencies = []
+                wall_start = time.perf_counter()
+                for _ in range(rounds):
+                    latencies.extend(await asyncio.gather(
+                        *(timed_get(client, path) for _ in range(concurrency))
+                    ))
+                wall = time.perf_counter() - wall_start
+                results[f"api.{name}.p50_ms"] = _percentile(latencies, 50) * 1000
+                results[f"api.{name}.p95_ms"] = _percentile(latencies, 95) * 1000
+                results[f"api.{name}.req_per_s"] = len(latencies) / wall
+        return results
+
+    return asyncio.run(run())
+
+
+def bench_predict(calls):
+    """BasePredictor.predict per-call cost for each vertical."""
+    import pandas as pd
+    from ml_engine.pnl_tracker import PnLTracker
+    from ml_engine.predictors import (
+        FintechPredictor, AiTalentPredictor, EsgPredictor,
+        RegulatoryPredictor, SupplyChainPredictor
+    )
+    from update_data import DATA_DIR
+
+    files = {
+        "fintech": ("fintech_growth_digest.csv", FintechPredictor),
+        "ai_talent": ("ai_talent_heatmap.csv", AiTalentPredictor),
+        "esg": ("esg_sentiment_tracker.csv", EsgPredictor),
+        "regulatory": ("regulatory_risk_index.csv", RegulatoryPredictor),
+        "supply_chain": ("supply_chain_risk.csv", SupplyChainPredictor)
+    }
+    results = {}
+    for slug, (filename, cls) in files.items():
+        row = pd.read_csv(os.path.join(DATA_DIR, filename)).iloc[-1].to_dict()
+        predictor = cls(slug, PnLTracker())
+        seed_everything()
+        start = time.perf_counter()
+        for _ in range(calls):
+            predictor.predict(row)
+        results[f"predict.{slug}.us_per_call"] = (time.perf_counter() - start) / calls * 1e6
+    return results
+
+
+def bench_backtest(repeats):
+    """run_backtest wall time over each vertical's full stored history."""
+    from partitions import PartitionStore
+    from ml_engine.backtest import run_backtest
+    from ml_engine.pnl_tracker import PnLTracker
+    from ml_engine.predictors import (
+        FintechPredictor, AiTalentPredictor, EsgPredictor,
+        RegulatoryPredictor, SupplyChainPredictor
+    )
+
+    store = PartitionStore()
+    results = {}
+    for slug, cls in [
+        ("fintech", FintechPredictor),
+        ("ai_talent", AiTalentPredictor),
+        ("esg", EsgPredictor),
+        ("regulatory", RegulatoryPredictor),
+        ("supply_chain", SupplyChainPredictor)
+    ]:
+        history = store.load(slug)
+        predictor = cls(slug, PnLTracker())
+        predictor.fit_reference(history)
+        elapsed, _ = _median_time(lambda: run_backtest(predictor, history), repeats)
+        results[f"backtest.{slug}.ms"] = elapsed * 1000
+    return results
+
+
+def bench_cold_start(repeats):
+    """Fresh-interpreter import time of app.py, and time until uvicorn answers /api/version."""
+    import socket
+    import subprocess
+    import urllib.request
+    from profiling import import_times
+
+    import_ms = statistics.median(import_times("app")["import_ms"] for _ in range(repeats))
+
+    def first_response():
+        with socket.socket() as sock:
+            sock.bind(("127.0.0.1", 0))
+            port = sock.getsockname()[1]
+        # Own DATA_DIR: the server's startup pipeline must not touch the shared one
+        env = dict(os.environ, DATA_DIR=tempfile.mkdtemp(prefix="hh_bench_cold_"))
+        start = time.perf_counter()
+        server = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "app:app", "--host", "127.0.0.1", "--port", str(port)],
+            cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+        )
+        try:
+            while time.perf_counter() - start < 30:
+                try:
+                    with urllib.request.urlopen(f"http://127.0.0.1:{port}/api/version", timeout=1) as response:
+                        if response.status == 200:
+                            return time.perf_counter() - start
+                except OSError:
+                    time.sleep(0.01)
+            raise RuntimeError("uvicorn did not answer /api/version within 30s")
+        finally:
+            server.terminate()
+            server.wait()
+            shutil.rmtree(env["DATA_DIR"], ignore_errors=True)
+
+    return {
+        "coldstart.import_app.ms": import_ms,
+        "coldstart.first_response.ms": statistics.median(first_response() for _ in range(repeats)) * 1000
+    }
+
+
+# --- Baseline comparison ---
+
+def _higher_is_better(metric):
+    return metric.endswith(("rows_per_s", "req_per_s"))
+
+
+def compare(results, baseline, tolerance):
+    """
+    Return (regressions, missing): (metric, baseline, current, change) for
+    regressions beyond tolerance, and the measured metrics the baseline has
+    no value for. A missing metric is a failure too, otherwise a new
+    benchmark would never be checked until someone refreshed the baseline.
+    """
+    regressions = []
+    missing = []
+    for metric, current in sorted(results.items()):
+        base = baseline.get(metric)
+        if not base:
+            missing.append(metric)
+            continue
+        if _higher_is_better(metric):
+            change = (base - current) / base
+        else:
+            change = (current - base) / base
+        if change > tolerance:
+            regressions.append((metric, base, current, change))
+    return regressions, missing
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="HHeuristics benchmark suite")
+    parser.add_argument("--quick", action="store_true",
+                        help="Smaller workloads for a fast sanity run (not compared against the baseline)")
+    parser.add_argument("--update-baseline", action="store_true", help="Overwrite the stored baseline")
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--tolerance", type=float, default=0.30,
+                        help="Allowed relative slowdown before a metric counts as a regression")
+    parser.add_argument("--output", help="Also write results JSON to this path")
+    args = parser.parse_args(argv)
+    if args.quick and args.update_baseline:
+        parser.error("--quick results use smaller workloads and cannot be the baseline")
+
+    import logging
+    logging.disable(logging.INFO)
+
+    years_list = [1] if args.quick else [1, 3, 10]
+    repeats = 1 if args.quick else 3
+
+    results = {}
+    results.update(bench_cold_start(repeats))
+    results.update(bench_backfill(years_list, repeats))
+    results.update(bench_split(1 if args.quick else 10, repeats))
+    results.update(bench_api(concurrency=5 if args.quick else 20, rounds=2 if args.quick else 5))
+    results.update(bench_predict(calls=100 if args.quick else 1000))
+    results.update(bench_backtest(repeats))
+
+    for metric, value in sorted(results.items()):
+        print(f"{metric:<45} {value:>14.3f}")
+
+    payload = {
+        "seed": SEED,
+        "python": sys.version.split()[0],
+        "results": results
+    }
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(payload, f, indent=2, sort_keys=True)
+
+    if args.update_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(payload, f, indent=2, sort_keys=True)
+        print(f"\nBaseline written to {args.baseline}")
+        return 0
+
+    # Quick workloads (1 year, lower API concurrency) measure different things than the baseline
+    if args.quick:
+        print("\nQuick run: not compared against the baseline.")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print(f"\nNo baseline at {args.baseline}; run with --update-baseline to create one.")
+        return 0
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)["results"]
+    regressions, missing = compare(results, baseline, args.tolerance)
+    if missing:
+        print(f"\n{len(missing)} metric(s) missing from the baseline (run with --update-baseline):")
+        for metric in missing:
+            print(f"  {metric}")
+    if regressions:
+        print(f"\n{len(regressions)} regression(s) beyond {args.tolerance:.0%}:")
+        for metric, base, current, change in regressions:
+            print(f"  {metric}: {base:.3f} -> {current:.3f} ({change:+.1%})")
+    if missing or regressions:
+        return 1
+    print(f"\nNo regressions beyond {args.tolerance:.0%} against baseline.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
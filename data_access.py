@@ -0,0 +1,135 @@
+import asyncio
+import concurrent.futures
+import json
+import logging
+import os
+import threading
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+# Threads serving the API's reads; the event loop never touches the disk itself
+DATA_IO_WORKERS = int(os.getenv("DATA_IO_WORKERS", "8"))
+
+
+class DataAccess:
+    """
+    Shared read path for the API and the pipeline: status files, dataset
+    slices from the partition store and file checks.
+
+    Every read is identified by (operation, arguments, data version). While
+    a read is in flight, identical reads join it instead of starting their
+    own, so 20 concurrent previews of one vertical cost one disk read and
+    one parse. Nothing is kept once the read returns (the store's partition
+    LRU and the HTTP response cache do that), and results are shared, so
+    callers must treat returned frames as read-only.
+
+    Coroutines (`a*` methods) run reads on a bounded thread pool; the plain
+    methods run them in the calling thread, e.g. a pipeline stage, and join
+    reads started by either side.
+    """
+
+    def __init__(self, store, workers=None):
+        self.store = store
+        self.workers = workers or DATA_IO_WORKERS
+        self._pool = None
+        self._lock = threading.Lock()
+        self._inflight = {}
+
+    def _executor(self):
+        with self._lock:
+            if self._pool is None:
+                self._pool = concurrent.futures.ThreadPoolExecutor(
+                    max_workers=self.workers, thread_name_prefix="data-io"
+                )
+            return self._pool
+
+    # --- Single flight ---
+
+    def _join(self, op, key):
+        """(future, leader): the in-flight read for `key`, or a new one this caller must run."""
+        key = (op,) + key
+        with self._lock:
+            future = self._inflight.get(key)
+            if future is not None:
+                metrics.DATA_READS.inc(op=op, result="coalesced")
+                return key, future, False
+            future = self._inflight[key] = concurrent.futures.Future()
+            # Running futures cannot be cancelled, so one waiter giving up leaves the rest unaffected
+            future.set_running_or_notify_cancel()
+        metrics.DATA_READS.inc(op=op, result="read")
+        return key, future, True
+
+    def _run(self, key, future, fn, args):
+        try:
+            with metrics.DATA_READ_SECONDS.time(op=key[0]):
+                result = fn(*args)
+        except BaseException as e:
+            future.set_exception(e)
+        else:
+            future.set_result(result)
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+
+    def read(self, op, key, fn, *args):
+        """fn(*args) in this thread, or the result of the identical read already in flight."""
+        key, future, leader = self._join(op, key)
+        if leader:
+            self._run(key, future, fn, args)
+        return future.result()
+
+    async def aread(self, op, key, fn, *args):
+        """fn(*args) on the I/O pool, or the result of the identical read already in flight."""
+        key, future, leader = self._join(op, key)
+        if leader:
+            self._executor().submit(self._run, key, future, fn, args)
+        return await asyncio.wrap_future(future)
+
+    def inflight(self):
+        with self._lock:
+            return len(self._inflight)
+
+    def shutdown(self):
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=False)
+
+    # --- Partition store ---
+
+    def _slice_key(self, vertical, *args):
+        return (vertical, self.store.version(vertical)) + args
+
+    def tail(self, vertical, n_rows):
+        return self.read("tail", self._slice_key(vertical, n_rows), self.store.tail, vertical, n_rows)
+
+    async def atail(self, vertical, n_rows):
+        return await self.aread("tail", self._slice_key(vertical, n_rows), self.store.tail, vertical, n_rows)
+
+    def load(self, vertical, year=None, quarter=None, month=None, start=None, end=None):
+        """PartitionStore.load, coalesced."""
+        args = (year, quarter, month, start, end)
+        return self.read("load", self._slice_key(vertical, *args), self.store.load, vertical, *args)
+
+    async def aload(self, vertical, year=None, quarter=None, month=None, start=None, end=None):
+        args = (year, quarter, month, start, end)
+        return await self.aread("load", self._slice_key(vertical, *args), self.store.load, vertical, *args)
+
+    # --- Files ---
+
+    async def aread_json(self, path):
+        """Parsed JSON file, or None when it does not exist."""
+        return await self.aread("json", (path,), _read_json, path)
+
+    async def aexists(self, path):
+        return await self.aread("exists", (path,), os.path.exists, path)
+
+
+def _read_json(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
@@ -0,0 +1,370 @@
+import json
+import logging
+import math
+import os
+import threading
+from datetime import datetime, timedelta
+
+import metrics
+from partitions import VERTICAL_BASENAMES
+from schemas import SCHEMAS
+
+logger = logging.getLogger(__name__)
+
+# Recent days compared against everything older
+DRIFT_WINDOW_DAYS = int(os.getenv("DRIFT_WINDOW_DAYS", "30"))
+# Population stability index: >= warn is a moderate shift, >= alert a significant one
+DRIFT_PSI_WARN = float(os.getenv("DRIFT_PSI_WARN", "0.1"))
+DRIFT_PSI_ALERT = float(os.getenv("DRIFT_PSI_ALERT", "0.25"))
+# Share of the window's values outside the reference fences that raises an alert
+DRIFT_OOD_ALERT = float(os.getenv("DRIFT_OOD_ALERT", "0.05"))
+# Rise in the share of missing values (window minus reference) that raises an alert
+DRIFT_NULL_ALERT = float(os.getenv("DRIFT_NULL_ALERT", "0.05"))
+# Relative accuracy of the quantile sketches
+SKETCH_ACCURACY = 0.01
+# Out-of-distribution fences: quartiles widened by this many interquartile ranges
+OOD_FENCE_IQR = 3.0
+PSI_BINS = 10
+# Fewest window values PSI and the out-of-range rate are computed from
+MIN_WINDOW_VALUES = 20
+# Bump when the state layout changes, so state is rebuilt from history
+DRIFT_FORMAT = 1
+
+_GAMMA = (1 + SKETCH_ACCURACY) / (1 - SKETCH_ACCURACY)
+_LOG_GAMMA = math.log(_GAMMA)
+# Magnitudes below this fall into the zero bucket
+_MIN_MAGNITUDE = 1e-9
+
+
+def monitored_columns(vertical):
+    """Numeric columns of a vertical's schema."""
+    return [col for col, dtype in SCHEMAS[vertical].items() if dtype != "category" and not dtype.startswith("datetime")]
+
+
+# --- Quantile sketch ---
+
+def sketch_counts(values):
+    """
+    Bucket counts of `values` (finite floats) as a sketch dict
+    {"buckets": {index: count}}. Buckets are log-spaced by _GAMMA, signed
+    (negative values use negative-side keys "-i"), with "0" for ~zero, so any
+    value is represented within SKETCH_ACCURACY relative error however large
+    it grows. Sketches merge by adding counts.
+    """
+    import numpy as np
+    magnitude = np.abs(values)
+    keys = np.full(len(values), "0", dtype=object)
+    nonzero = magnitude >= _MIN_MAGNITUDE
+    index = np.ceil(np.log(magnitude[nonzero]) / _LOG_GAMMA).astype(np.int64)
+    signs = np.where(values[nonzero] < 0, "-", "")
+    keys[nonzero] = [f"{s}{i}" for s, i in zip(signs.tolist(), index.tolist())]
+    uniq, counts = np.unique(keys.astype(str), return_counts=True)
+    return {k: int(c) for k, c in zip(uniq.tolist(), counts.tolist())}
+
+
+def merge_counts(into, other):
+    for key, count in other.items():
+        into[key] = into.get(key, 0) + count
+    return into
+
+
+def _bucket_value(key):
+    if key == "0":
+        return 0.0
+    negative = key.startswith("-")
+    value = 2 * _GAMMA ** int(key.lstrip("-")) / (_GAMMA + 1)
+    return -value if negative else value
+
+
+def _points(buckets):
+    """(values, counts) of a sketch's buckets, ascending by value."""
+    import numpy as np
+    if not buckets:
+        return np.empty(0), np.empty(0)
+    values = np.array([_bucket_value(k) for k in buckets])
+    counts = np.array(list(buckets.values()), dtype=np.float64)
+    order = np.argsort(values)
+    return values[order], counts[order]
+
+
+def quantiles(buckets, qs):
+    """Approximate quantiles `qs` of a sketch; None when it is empty."""
+    import numpy as np
+    values, counts = _points(buckets)
+    if not len(values):
+        return [None] * len(qs)
+    cum = np.cumsum(counts)
+    ranks = np.asarray(qs) * (cum[-1] - 1)
+    return [float(values[min(np.searchsorted(cum, r, side="right"), len(values) - 1)]) for r in ranks]
+
+
+def _binned(buckets, edges):
+    import numpy as np
+    values, counts = _points(buckets)
+    out = np.zeros(len(edges) + 1)
+    np.add.at(out, np.searchsorted(edges, values, side="right"), counts)
+    return out
+
+
+def psi(reference, window):
+    """Population stability index of `window` against `reference`, over the reference's deciles."""
+    import numpy as np
+    edges = np.unique([q for q in quantiles(reference, np.arange(1, PSI_BINS) / PSI_BINS) if q is not None])
+    ref = _binned(reference, edges)
+    cur = _binned(window, edges)
+    ref = np.maximum(ref / ref.sum(), 1e-4)
+    cur = np.maximum(cur / cur.sum(), 1e-4)
+    return float(((cur - ref) * np.log(cur / ref)).sum())
+
+
+def fences(reference):
+    """(low, high) beyond which a value is out of distribution: quartiles +/- OOD_FENCE_IQR ranges."""
+    p01, q1, q3, p99 = quantiles(reference, [0.01, 0.25, 0.75, 0.99])
+    if q1 is None:
+        return None
+    spread = q3 - q1 if q3 > q1 else p99 - p01
+    return q1 - OOD_FENCE_IQR * spread, q3 + OOD_FENCE_IQR * spread
+
+
+# --- Monitor ---
+
+class DriftMonitor:
+    """
+    Incremental drift and data-quality statistics per vertical and numeric column.
+
+    State lives in {data_dir}/drift/{vertical}.json. For each column it holds
+    running count/mean/variance/min/max (Welford, merged per batch), a
+    quantile sketch of the reference (every day older than the window), and
+    per-day sketches and null counts for the last DRIFT_WINDOW_DAYS days.
+    update() reads only rows newer than the last date it saw, so a daily run
+    costs O(new rows); days leaving the window are merged into the reference.
+
+    Each update recomputes the summary: per column PSI of the window against
+    the reference, the share of window values outside the reference fences,
+    and missing-value rates, with alerts where they pass their thresholds.
+    check() flags a single row's out-of-distribution values for predictors.
+    """
+
+    def __init__(self, data_dir=None, window_days=None):
+        self.data_dir = data_dir or os.getenv("DATA_DIR", "data")
+        self.root = os.path.join(self.data_dir, "drift")
+        self.window_days = window_days or DRIFT_WINDOW_DAYS
+        self._lock = threading.Lock()
+        self._states = {}
+
+    def _path(self, vertical):
+        return os.path.join(self.root, f"{vertical}.json")
+
+    def _load(self, vertical):
+        # Cached per mtime so the API's instance sees what the pipeline wrote
+        path = self._path(vertical)
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except FileNotFoundError:
+            return None
+        cached = self._states.get(vertical)
+        if cached is None or cached[0] != mtime:
+            with open(path) as f:
+                state = json.load(f)
+            if state.get("format") != DRIFT_FORMAT:
+                return None
+            cached = self._states[vertical] = (mtime, state)
+        return cached[1]
+
+    def _save(self, vertical, state):
+        os.makedirs(self.root, exist_ok=True)
+        tmp = self._path(vertical) + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(state, f, separators=(",", ":"))
+        os.replace(tmp, self._path(vertical))
+
+    def max_date(self, vertical):
+        state = self._load(vertical)
+        return state["max_date"] if state else None
+
+    # --- Update ---
+
+    def update(self, store, vertical, reset=False):
+        """
+        Fold the vertical's rows newer than the last update into the
+        statistics (all of them with `reset`, e.g. after the history was
+        regenerated). Returns {"rows": new rows, "alerts": [...]}.
+        """
+        import pandas as pd
+        with self._lock:
+            state = None if reset else self._load(vertical)
+            if state is None:
+                state = {"format": DRIFT_FORMAT, "max_date": None, "columns": {}}
+            else:
+                state = json.loads(json.dumps(state))  # cached copy stays untouched until saved
+            start = None
+            if state["max_date"]:
+                start = datetime.strptime(state["max_date"], "%Y-%m-%d") + timedelta(days=1)
+            df = store.load(vertical, start=start)
+            if not df.empty:
+                self._ingest(state, vertical, df)
+                state["max_date"] = pd.Timestamp(df["date"].max()).strftime("%Y-%m-%d")
+                self._roll(state)
+                state["summary"] = self._summarize(state)
+                self._save(vertical, state)
+        summary = state.get("summary") or {}
+        alerts = summary.get("alerts", [])
+        for alert in alerts:
+            logger.warning(f"Drift alert {vertical}.{alert['column']}: {alert['kind']} "
+                           f"{alert['value']} >= {alert['threshold']}")
+        return {"rows": int(len(df)), "alerts": alerts}
+
+    def _ingest(self, state, vertical, df):
+        import numpy as np
+        import pandas as pd
+        days = df["date"].dt.strftime("%Y-%m-%d").to_numpy()
+        for col in monitored_columns(vertical):
+            if col not in df:
+                continue
+            values = pd.to_numeric(df[col], errors="coerce").to_numpy(dtype=np.float64)
+            finite = np.isfinite(values)
+            entry = state["columns"].setdefault(col, {
+                "count": 0, "mean": 0.0, "m2": 0.0, "min": None, "max": None, "nulls": 0,
+                "reference": {}, "reference_rows": 0, "reference_nulls": 0, "days": {}
+            })
+
+            # Chan et al. parallel update of the running moments
+            batch = values[finite]
+            if len(batch):
+                n_a, n_b = entry["count"], len(batch)
+                mean_b = float(batch.mean())
+                delta = mean_b - entry["mean"]
+                total = n_a + n_b
+                entry["mean"] += delta * n_b / total
+                entry["m2"] += float(((batch - mean_b) ** 2).sum()) + delta ** 2 * n_a * n_b / total
+                entry["count"] = total
+                low, high = float(batch.min()), float(batch.max())
+                entry["min"] = low if entry["min"] is None else min(entry["min"], low)
+                entry["max"] = high if entry["max"] is None else max(entry["max"], high)
+            entry["nulls"] += int((~finite).sum())
+
+            for day in np.unique(days):
+                on_day = days == day
+                day_values = values[on_day & finite]
+                record = entry["days"].setdefault(day, {"rows": 0, "nulls": 0, "sketch": {}})
+                record["rows"] += int(on_day.sum())
+                record["nulls"] += int(on_day.sum() - len(day_values))
+                merge_counts(record["sketch"], sketch_counts(day_values))
+
+    def _roll(self, state):
+        """Merge days older than the window into the reference."""
+        cutoff = (datetime.strptime(state["max_date"], "%Y-%m-%d")
+                  - timedelta(days=self.window_days - 1)).strftime("%Y-%m-%d")
+        for entry in state["columns"].values():
+            for day in [d for d in entry["days"] if d < cutoff]:
+                record = entry["days"].pop(day)
+                merge_counts(entry["reference"], record["sketch"])
+                entry["reference_rows"] += record["rows"]
+                entry["reference_nulls"] += record["nulls"]
+
+    def _summarize(self, state):
+        import numpy as np
+        columns = {}
+        alerts = []
+        for col, entry in state["columns"].items():
+            window = {}
+            rows = nulls = 0
+            for record in entry["days"].values():
+                merge_counts(window, record["sketch"])
+                rows += record["rows"]
+                nulls += record["nulls"]
+            reference = entry["reference"]
+            count = sum(window.values())
+            info = {
+                "count": entry["count"],
+                "mean": entry["mean"],
+                "std": math.sqrt(entry["m2"] / (entry["count"] - 1)) if entry["count"] > 1 else 0.0,
+                "min": entry["min"],
+                "max": entry["max"],
+                "reference_quantiles": dict(zip(("p01", "p25", "p50", "p75", "p99"),
+                                                quantiles(reference, [0.01, 0.25, 0.5, 0.75, 0.99]))),
+                "window_quantiles": dict(zip(("p01", "p25", "p50", "p75", "p99"),
+                                             quantiles(window, [0.01, 0.25, 0.5, 0.75, 0.99]))),
+                "null_rate": nulls / rows if rows else 0.0,
+                "reference_null_rate": (entry["reference_nulls"] / entry["reference_rows"]
+                                        if entry["reference_rows"] else 0.0),
+                "fences": fences(reference),
+                "psi": None,
+                "ood_rate": None
+            }
+            if reference and count >= MIN_WINDOW_VALUES:
+                info["psi"] = round(psi(reference, window), 4)
+                values, counts = _points(window)
+                low, high = info["fences"]
+                info["ood_rate"] = round(float(counts[(values < low) | (values > high)].sum() / count), 4)
+
+            checks = (
+                ("psi", info["psi"], DRIFT_PSI_ALERT),
+                ("out_of_range", info["ood_rate"], DRIFT_OOD_ALERT),
+                ("nulls", info["null_rate"] - info["reference_null_rate"], DRIFT_NULL_ALERT)
+            )
+            for kind, value, threshold in checks:
+                if value is not None and value >= threshold:
+                    alerts.append({"column": col, "kind": kind, "value": round(float(value), 4),
+                                   "threshold": threshold})
+            info["status"] = ("alert" if any(a["column"] == col for a in alerts) else
+                              "warn" if (info["psi"] or 0) >= DRIFT_PSI_WARN else "ok")
+            columns[col] = info
+        return {"updated": datetime.now().strftime("%Y-%m-%d %H:%M:%S"), "window_days": self.window_days,
+                "max_date": state["max_date"], "columns": columns, "alerts": alerts}
+
+    # --- Reads ---
+
+    def summary(self, vertical):
+        state = self._load(vertical)
+        return state.get("summary") if state else None
+
+    def alerts(self):
+        """{vertical: [alerts]} for verticals with any."""
+        out = {}
+        for vertical in VERTICAL_BASENAMES:
+            summary = self.summary(vertical)
+            if summary and summary["alerts"]:
+                out[vertical] = summary["alerts"]
+        return out
+
+    def check(self, vertical, row, columns=None):
+        """
+        Out-of-distribution flag for one input row: the monitored columns
+        (of `columns`, when given) whose value lies outside the reference
+        fences. None until the vertical has a reference.
+        """
+        summary = self.summary(vertical)
+        if not summary:
+            return None
+        flagged = {}
+        for col, info in summary["columns"].items():
+            if columns is not None and col not in columns or not info["fences"]:
+                continue
+            value = row.get(col)
+            if value is None or isinstance(value, str):
+                continue
+            low, high = info["fences"]
+            if not low <= value <= high:
+                flagged[col] = {"value": value, "low": round(low, 6), "high": round(high, 6)}
+        if flagged:
+            metrics.DRIFT_OOD_INPUTS.inc(vertical=vertical)
+        return {"flag": bool(flagged), "columns": flagged}
+
+    def psi_values(self):
+        """{(vertical, column): psi} for the metrics gauge."""
+        out = {}
+        for vertical in VERTICAL_BASENAMES:
+            summary = self.summary(vertical)
+            for col, info in (summary or {}).get("columns", {}).items():
+                if info["psi"] is not None:
+                    out[(vertical, col)] = info["psi"]
+        return out
+
+    def alert_counts(self):
+        """{(vertical, kind): open alerts} for the metrics gauge."""
+        out = {}
+        for vertical, alerts in self.alerts().items():
+            for alert in alerts:
+                out[(vertical, alert["kind"])] = out.get((vertical, alert["kind"]), 0) + 1
+        return out
@@ -0,0 +1,77 @@
+import itertools
+import logging
+import os
+import threading
+import time
+from collections import deque
+
+import metrics
+from streaming import publish
+
+logger = logging.getLogger(__name__)
+
+# Entries kept in memory; older ones fall off the ring
+EVENT_LOG_SIZE = int(os.getenv("EVENT_LOG_SIZE", "500"))
+# Most entries one /api/status poll returns
+EVENT_LOG_PAGE = int(os.getenv("EVENT_LOG_PAGE", "100"))
+
+
+class EventLog:
+    """
+    Structured start-up and pipeline log: a fixed-size ring buffer of
+    entries with monotonic sequence numbers. Clients keep the last `seq`
+    they saw and ask for what came after it, so a poll costs the same
+    whether the process has been up a minute or a month. Every entry is
+    also published on the live feed's "log" topic.
+    """
+
+    def __init__(self, size=None):
+        self._entries = deque(maxlen=size or EVENT_LOG_SIZE)
+        self._seq = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def append(self, source, message, level="info", **data):
+        """Record an event from `source` ("system", "ml", "pipeline", ...) and return the entry."""
+        with self._lock:
+            entry = {"seq": next(self._seq), "ts": time.time(), "source": source,
+                     "level": level, "message": message}
+            if data:
+                entry["data"] = data
+            self._entries.append(entry)
+        metrics.EVENT_LOG_EVENTS.inc(source=source, level=level)
+        publish("log", dict(entry, lines=[message]))
+        return entry
+
+    def since(self, cursor=None, limit=None):
+        """
+        (entries, cursor, missed): up to `limit` entries after `cursor`
+        (the latest ones when it is None), the cursor to send next time and
+        how many entries after the old cursor had already left the ring.
+        """
+        limit = limit or EVENT_LOG_PAGE
+        with self._lock:
+            if not self._entries:
+                return [], cursor or 0, 0
+            first = self._entries[0]["seq"]
+            last = self._entries[-1]["seq"]
+            # A cursor from before a restart is ahead of the log; start over from the latest entries
+            if cursor is None or cursor > last:
+                entries = list(itertools.islice(self._entries, max(0, len(self._entries) - limit), None))
+                return entries, last, 0
+            missed = max(0, first - cursor - 1)
+            # Sequence numbers are contiguous, so the cursor maps straight to a position in the ring
+            offset = max(0, cursor + 1 - first)
+            entries = list(itertools.islice(self._entries, offset, offset + limit))
+        return entries, entries[-1]["seq"] if entries else cursor, missed
+
+
+EVENT_LOG = EventLog()
+metrics.EVENT_LOG_ENTRIES.set_function(lambda: len(EVENT_LOG))
+
+
+def log_event(source, message, level="info", **data):
+    """Module-level shortcut for EVENT_LOG.append()."""
+    return EVENT_LOG.append(source, message, level=level, **data)
@@ -0,0 +1,450 @@
+import concurrent.futures
+import json
+import logging
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+
+import metrics
+import streaming
+from partitions import PartitionStore, VERTICAL_BASENAMES
+from pipeline_dag import fingerprint
+from schemas import SCHEMAS
+
+logger = logging.getLogger(__name__)
+
+# Worker processes running exports, and jobs allowed to wait for one
+EXPORT_WORKERS = int(os.getenv("EXPORT_WORKERS", "2"))
+EXPORT_QUEUE = int(os.getenv("EXPORT_QUEUE", "16"))
+# Disk budget for finished export files
+EXPORT_CACHE_BYTES = int(float(os.getenv("EXPORT_CACHE_MB", "512")) * 1024 * 1024)
+# Finished jobs remembered for polling
+EXPORT_MAX_JOBS = int(os.getenv("EXPORT_MAX_JOBS", "1000"))
+# Bump when the export file format changes, so cached results are not reused
+EXPORT_FORMAT = 1
+
+EXPORT_FORMATS = ("csv", "ndjson")
+# Always exported, whatever `columns` asks for
+KEY_COLUMNS = ("company", "date")
+
+
+class ExportQueueFull(Exception):
+    """Every worker is busy and the queue is full. `retry_after` is in seconds."""
+
+    def __init__(self, retry_after):
+        super().__init__("Export queue is full")
+        self.retry_after = retry_after
+
+
+def _as_list(value, field):
+    if value is None:
+        return []
+    if isinstance(value, str):
+        value = [v for v in value.split(",") if v]
+    if not isinstance(value, list) or not all(isinstance(v, str) for v in value):
+        raise ValueError(f"'{field}' must be a list of strings")
+    return sorted({v.strip() for v in value if v.strip()})
+
+
+def _as_date(value, field):
+    if value is None:
+        return None
+    try:
+        return datetime.strptime(str(value), "%Y-%m-%d").strftime("%Y-%m-%d")
+    except ValueError:
+        raise ValueError(f"'{field}' must be a YYYY-MM-DD date")
+
+
+def normalize_spec(body):
+    """
+    Validate an export request and put it in canonical form (sorted, de-duplicated
+    lists), so requests differing only in order share a job. Raises ValueError.
+
+    Fields: verticals (required), companies, start, end (inclusive YYYY-MM-DD),
+    columns and format ("csv" or "ndjson").
+    """
+    if not isinstance(body, dict):
+        raise ValueError("Export request must be a JSON object")
+    unknown = set(body) - {"verticals", "companies", "start", "end", "columns", "format"}
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(sorted(unknown))}")
+
+    verticals = _as_list(body.get("verticals"), "verticals")
+    if not verticals:
+        raise ValueError("'verticals' is required")
+    bad = [v for v in verticals if v not in VERTICAL_BASENAMES]
+    if bad:
+        raise ValueError(f"Unknown verticals: {', '.join(bad)}")
+
+    start = _as_date(body.get("start"), "start")
+    end = _as_date(body.get("end"), "end")
+    if start and end and start > end:
+        raise ValueError("'start' is after 'end'")
+
+    columns = _as_list(body.get("columns"), "columns")
+    if columns:
+        available = set().union(*(SCHEMAS[v] for v in verticals))
+        bad = [c for c in columns if c not in available]
+        if bad:
+            raise ValueError(f"Unknown columns for {', '.join(verticals)}: {', '.join(bad)}")
+
+    fmt = body.get("format", "csv")
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"'format' must be one of {', '.join(EXPORT_FORMATS)}")
+
+    return {
+        "verticals": verticals,
+        "companies": _as_list(body.get("companies"), "companies"),
+        "start": start,
+        "end": end,
+        "columns": columns,
+        "format": fmt
+    }
+
+
+def _selected_partitions(store, spec, vertical):
+    """Partition descriptors of `vertical` overlapping the spec's date range."""
+    parts = store.partitions(vertical)
+    if spec["start"]:
+        parts = [p for p in parts if p["max_date"] >= spec["start"]]
+    if spec["end"]:
+        parts = [p for p in parts if p["min_date"] <= spec["end"]]
+    return parts
+
+
+def result_filename(spec, job_id):
+    """Download name of an export: .csv for one vertical, .zip of CSVs for several, or .ndjson."""
+    stem = f"export_{spec['verticals'][0] if len(spec['verticals']) == 1 else 'multi'}_{job_id}"
+    if spec["format"] == "ndjson":
+        return f"{stem}.ndjson"
+    return f"{stem}.csv" if len(spec["verticals"]) == 1 else f"{stem}.zip"
+
+
+# --- Worker process side ---
+
+_progress_queue = None
+
+
+def _init_worker(progress_queue):
+    global _progress_queue
+    _progress_queue = progress_queue
+
+
+def _report(job_id, **state):
+    if _progress_queue is not None:
+        _progress_queue.put((job_id, state))
+
+
+def _select(df, spec):
+    if spec["companies"]:
+        df = df[df["company"].isin(spec["companies"])]
+    if spec["columns"]:
+        wanted = set(KEY_COLUMNS) | set(spec["columns"])
+        df = df[[c for c in df.columns if c in wanted]]
+    return df
+
+
+def run_export(spec, data_dir, path, job_id=None):
+    """
+    Write the rows selected by `spec` to `path`, one partition at a time, so
+    memory stays bounded by a month of one vertical. CSV values get the same
+    display formatting as catalog downloads; NDJSON carries raw values and a
+    "vertical" field per row. Runs in a worker process; progress goes back
+    through the queue set up by _init_worker. Returns (rows, bytes).
+    """
+    import io
+    import zipfile
+    from schemas import to_export, to_records
+
+    store = PartitionStore(data_dir, cache_partitions=0)
+    plan = [(v, p) for v in spec["verticals"] for p in _selected_partitions(store, spec, v)]
+    _report(job_id, status="running", partitions_total=len(plan))
+
+    rows = 0
+    done = 0
+    archive = None
+    handle = open(path, "wb")
+    try:
+        if spec["format"] == "csv" and len(spec["verticals"]) > 1:
+            archive = zipfile.ZipFile(handle, "w", compression=zipfile.ZIP_DEFLATED)
+        for vertical in spec["verticals"]:
+            parts = [p for v, p in plan if v == vertical]
+            if spec["format"] == "ndjson":
+                out = io.TextIOWrapper(handle, encoding="utf-8", newline="", write_through=True)
+            elif archive is not None:
+                member = archive.open(f"{VERTICAL_BASENAMES[vertical]}.csv", "w")
+                out = io.TextIOWrapper(member, encoding="utf-8", newline="")
+            else:
+                out = io.TextIOWrapper(handle, encoding="utf-8", newline="", write_through=True)
+            first = True
+            for info in parts:
+                df = _select(store.load(vertical, year=info["year"], month=info["month"],
+                                        start=spec["start"], end=spec["end"]), spec)
+                if spec["format"] == "ndjson":
+                    for record in to_records(df):
+                        out.write(json.dumps({"vertical": vertical, **record}, default=str) + "\n")
+                elif len(df) or first:
+                    to_export(df, vertical).to_csv(out, header=first, index=False)
+                    first = False
+                rows += len(df)
+                done += 1
+                _report(job_id, partitions_done=done, rows=rows)
+            if archive is not None:
+                out.close()
+            else:
+                out.flush()
+                out.detach()
+        if archive is not None:
+            archive.close()
+        size = handle.tell()
+    finally:
+        handle.close()
+    return rows, size
+
+
+# --- API process side ---
+
+class ExportJob:
+    """
+    One export. Its id is the hash of the normalized request and of the
+    partitions it covers, so identical requests on unchanged data share a job
+    and its result file, and a data change makes a new job.
+    """
+    __slots__ = ("id", "spec", "status", "filename", "path", "submitted", "started", "finished",
+                 "partitions_done", "partitions_total", "rows", "bytes", "error")
+
+    def __init__(self, job_id, spec, path):
+        self.id = job_id
+        self.spec = spec
+        self.status = "queued"
+        self.filename = result_filename(spec, job_id)
+        self.path = path
+        self.submitted = time.time()
+        self.started = None
+        self.finished = None
+        self.partitions_done = 0
+        self.partitions_total = None
+        self.rows = 0
+        self.bytes = None
+        self.error = None
+
+    def to_dict(self):
+        total = self.partitions_total
+        return {
+            "id": self.id,
+            "status": self.status,
+            "request": self.spec,
+            "filename": self.filename,
+            "submitted": self.submitted,
+            "started": self.started,
+            "finished": self.finished,
+            "progress": {
+                "partitions_done": self.partitions_done,
+                "partitions_total": total,
+                "fraction": round(self.partitions_done / total, 4) if total else (1.0 if self.status == "done" else 0.0),
+                "rows": self.rows
+            },
+            "bytes": self.bytes,
+            "error": self.error,
+            "download_url": f"/api/exports/{self.id}/download" if self.status == "done" else None
+        }
+
+
+class ExportJobManager:
+    """
+    Custom slice exports run in a bounded pool of worker processes, so large
+    pulls neither hold the GIL nor block the API. At most `workers` jobs run
+    and `max_queue` more wait; further submissions get ExportQueueFull.
+    Identical requests are de-duplicated onto one job, and finished files are
+    kept in {data_dir}/exports up to `max_bytes`, least recently downloaded
+    evicted first, so a repeated request is answered from disk.
+    Job state changes are published on the live feed's "export" topic.
+    """
+
+    def __init__(self, data_dir=None, store=None, workers=None, max_queue=None, max_bytes=None):
+        self.data_dir = data_dir or os.getenv("DATA_DIR", "data")
+        self.store = store or PartitionStore(self.data_dir)
+        self.workers = workers or EXPORT_WORKERS
+        self.max_queue = EXPORT_QUEUE if max_queue is None else max_queue
+        self.max_bytes = EXPORT_CACHE_BYTES if max_bytes is None else max_bytes
+        self.directory = os.path.join(self.data_dir, "exports")
+        self.jobs = OrderedDict()
+        self.avg_seconds = 5.0
+        self._lock = threading.Lock()
+        self._pool = None
+        self._progress = None
+        self._drain_thread = None
+
+    def _ensure_pool(self):
+        # Spawned (not forked) workers: the API process runs threads and an event loop
+        if self._pool is None:
+            ctx = multiprocessing.get_context("spawn")
+            self._progress = ctx.Queue()
+            self._pool = concurrent.futures.ProcessPoolExecutor(
+                max_workers=self.workers, mp_context=ctx,
+                initializer=_init_worker, initargs=(self._progress,)
+            )
+            self._drain_thread = threading.Thread(target=self._drain, name="export-progress", daemon=True)
+            self._drain_thread.start()
+            os.makedirs(self.directory, exist_ok=True)
+        return self._pool
+
+    def _drain(self):
+        """Apply progress reports from the workers to their jobs."""
+        while True:
+            try:
+                item = self._progress.get(timeout=1.0)
+            except queue.Empty:
+                if self._pool is None:
+                    return
+                continue
+            except (EOFError, OSError):
+                return
+            if item is None:
+                return
+            job_id, state = item
+            with self._lock:
+                job = self.jobs.get(job_id)
+                if job is None or job.status not in ("queued", "running"):
+                    continue
+                if state.get("status") == "running" and job.status == "queued":
+                    job.started = time.time()
+                for field, value in state.items():
+                    setattr(job, field, value)
+            self._publish(job)
+
+    def _publish(self, job):
+        streaming.publish("export", job.to_dict(), key=job.id)
+
+    def job_id(self, spec):
+        """Request hash: the normalized spec plus the content hashes of the partitions it reads."""
+        data = {v: [p["hash"] for p in _selected_partitions(self.store, spec, v)] for v in spec["verticals"]}
+        return fingerprint([EXPORT_FORMAT, spec, data])
+
+    def _active(self):
+        return sum(1 for job in self.jobs.values() if job.status in ("queued", "running"))
+
+    def submit(self, body):
+        """
+        Start (or join) the export for a request body. Returns (job, created).
+        Raises ValueError for an invalid request and ExportQueueFull when no
+        worker or queue slot is free.
+        """
+        spec = normalize_spec(body)
+        job_id = self.job_id(spec)
+        path = os.path.join(self.directory, result_filename(spec, job_id))
+        with self._lock:
+            job = self.jobs.get(job_id)
+            if job is not None and (job.status in ("queued", "running") or
+                                    (job.status == "done" and os.path.exists(job.path))):
+                self.jobs.move_to_end(job_id)
+                metrics.EXPORT_JOBS.inc(result="deduplicated")
+                return job, False
+
+            job = ExportJob(job_id, spec, path)
+            if os.path.exists(path):
+                # Finished by an earlier job, possibly before a restart
+                job.status = "done"
+                job.finished = job.started = os.path.getmtime(path)
+                job.bytes = os.path.getsize(path)
+                job.rows = None
+                self._remember(job)
+                metrics.EXPORT_JOBS.inc(result="cached")
+                return job, False
+
+            active = self._active()
+            if active >= self.workers + self.max_queue:
+                metrics.EXPORT_JOBS.inc(result="rejected")
+                raise ExportQueueFull((active - self.workers + 1) * self.avg_seconds / self.workers)
+            self._remember(job)
+            pool = self._ensure_pool()
+            tmp_path = f"{path}.{job_id}.tmp"
+            future = pool.submit(run_export, spec, self.data_dir, tmp_path, job_id)
+            metrics.EXPORT_JOBS.inc(result="submitted")
+        future.add_done_callback(lambda f: self._finished(job, tmp_path, f))
+        self._publish(job)
+        logger.info(f"Export {job_id} queued: {spec}")
+        return job, True
+
+    def _remember(self, job):
+        self.jobs[job.id] = job
+        self.jobs.move_to_end(job.id)
+        # Forget the oldest finished jobs; their files stay in the cache
+        while len(self.jobs) > EXPORT_MAX_JOBS:
+            oldest = next((j for j in self.jobs.values() if j.status not in ("queued", "running")), None)
+            if oldest is None:
+                break
+            del self.jobs[oldest.id]
+
+    def _finished(self, job, tmp_path, future):
+        try:
+            rows, size = future.result()
+            os.replace(tmp_path, job.path)
+        except Exception as e:
+            logger.error(f"Export {job.id} failed: {e}")
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            with self._lock:
+                job.status, job.error, job.finished = "failed", str(e), time.time()
+            metrics.EXPORT_JOBS.inc(result="failed")
+        else:
+            with self._lock:
+                job.status, job.rows, job.bytes, job.finished = "done", rows, size, time.time()
+                job.started = job.started or job.submitted
+                job.partitions_done = job.partitions_total or 0
+                elapsed = job.finished - job.started
+                self.avg_seconds = 0.8 * self.avg_seconds + 0.2 * elapsed
+            metrics.EXPORT_JOBS.inc(result="done")
+            metrics.EXPORT_SECONDS.observe(elapsed)
+            logger.info(f"Export {job.id} done: {rows} rows, {size} bytes in {elapsed:.1f}s")
+            self._evict(keep=job.path)
+        self._publish(job)
+
+    def _evict(self, keep=None):
+        """Delete least recently used export files until the directory fits the budget."""
+        entries = []
+        for name in os.listdir(self.directory):
+            if name.endswith(".tmp"):
+                continue
+            path = os.path.join(self.directory, name)
+            st = os.stat(path)
+            entries.append((st.st_mtime, st.st_size, path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            if path == keep:
+                continue
+            os.remove(path)
+            total -= size
+
+    def get(self, job_id):
+        """The job, or None. A finished job whose file was evicted reads as "expired"."""
+        with self._lock:
+            job = self.jobs.get(job_id)
+            if job is not None and job.status == "done" and not os.path.exists(job.path):
+                job.status = "expired"
+            return job
+
+    def open_result(self, job):
+        """Path of a finished job's file, marked as recently used; None if it is gone."""
+        try:
+            os.utime(job.path)
+        except FileNotFoundError:
+            return None
+        return job.path
+
+    def queue_state(self):
+        with self._lock:
+            states = [job.status for job in self.jobs.values()]
+        return {("queued",): states.count("queued"), ("running",): states.count("running")}
+
+    def shutdown(self):
+        pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
+            self._progress.put(None)
@@ -1,8 +1,12 @@
-import React, { useState, useEffect } from 'react';
+import React, { useState, useEffect, useRef } from 'react';
 import { Activity, Zap, Shield, Globe, Lock, Download, ChevronDown, FileText } from 'lucide-react';
 import PredictionCard from './ml/PredictionCard';
 import ModelPerformance from './ml/ModelPerformance';
 import FeatureImportance from './ml/FeatureImportance';
+import { subscribe, isLiveFeedSupported } from '../liveFeed';
+
+// Start-up log lines kept on screen
+const STATUS_LOG_LINES = 200;
 
 const ProductSection = ({ vertical, id }) => {
     const [data, setData] = useState(null);
@@ -13,6 +17,8 @@ const ProductSection = ({ vertical, id }) => {
 
     const [status, setStatus] = useState(null);
     const [debugLogs, setDebugLogs] = useState([]);
+    // Last event log sequence number seen; /api/status?since= returns only newer entries
+    const statusCursor = useRef(null);
 
     const addDebugLog = (msg) => {
         setDebugLogs(prev => [`[${new Date().toLocaleTimeString()}] ${msg}`, ...prev].slice(0, 50));
@@ -39,9 +45,9 @@ const ProductSection = ({ vertical, id }) => {
                 console.error("API Error:", errorMsg);
                 addDebugLog(`API Error: ${errorMsg}`);
 
-                // If error is due to loading, start polling
+                // If error is due to loading, wait for the engine to come up
                 if (predictionData.error === "ML Engine Loading" || errorMsg === "Not Found") {
-                    pollStatus();
+                    waitForReady();
                 }
             } else {
                 setData(previewData);
@@ -62,12 +68,62 @@ const ProductSection = ({ vertical, id }) => {
         fetchData();
     }, [vertical]);
 
+    // Live updates pushed over the shared /api/stream connection
+    useEffect(() => {
+        const unsubscribers = [
+            subscribe('prediction', (update) => {
+                if (update.vertical === vertical) setPrediction(update);
+            }),
+            subscribe('rows', (update) => {
+                if (update.vertical !== vertical || !update.rows.length) return;
+                setData(prev => prev && {
+                    ...prev,
+                    latest: update.rows[update.rows.length - 1],
+                    history: [...prev.history, ...update.rows].slice(-30),
+                    total_rows: update.total_rows
+                });
+            }),
+            // Missed events while the tab was slow: resync from the REST endpoints
+            subscribe('lagged', () => fetchData())
+        ];
+        return () => unsubscribers.forEach(unsubscribe => unsubscribe());
+    }, [vertical]);
+
+    // Follow ML start-up over the live feed; fall back to polling /api/status
+    const waitForReady = () => {
+        if (!isLiveFeedSupported()) {
+            pollStatus();
+            return;
+        }
+        const unsubscribers = [
+            subscribe('status', (update) => {
+                setStatus(prev => ({ ...(prev || {}), ...update }));
+                if (update.ready) {
+                    unsubscribers.forEach(unsubscribe => unsubscribe());
+                    fetchData();
+                }
+            }),
+            subscribe('log', (update) => {
+                setStatus(prev => ({ ...(prev || {}), logs: [...((prev && prev.logs) || []), ...update.lines].slice(-STATUS_LOG_LINES) }));
+            })
+        ];
+    };
+
+    const mergeStatus = (data) => {
+        statusCursor.current = data.cursor ?? null;
+        setStatus(prev => ({
+            ...data,
+            logs: [...((prev && prev.logs) || []), ...(data.logs || [])].slice(-STATUS_LOG_LINES)
+        }));
+    };
+
     const pollStatus = async () => {
         const apiUrl = import.meta.env.VITE_API_URL || '';
         try {
             addDebugLog(`Polling ${apiUrl}/api/status...`);
-            // Add cache buster
-            const res = await fetch(`${apiUrl}/api/status?t=${Date.now()}`);
+            // The endpoint is no-store; the cursor keeps each poll down to new log entries
+            const since = statusCursor.current === null ? '' : `?since=${statusCursor.current}`;
+            const res = await fetch(`${apiUrl}/api/status${since}`);
 
             // Log Headers for debugging
             const dateHeader = res.headers.get('date');
@@ -108,11 +164,11 @@ const ProductSection = ({ vertical, id }) => {
             } else if (res.status === 503) {
                 addDebugLog("Status: 503 Service Unavailable (Initializing)");
                 const data = await res.json();
-                setStatus(data);
+                mergeStatus(data);
             } else if (res.ok) {
                 const data = await res.json();
                 addDebugLog(`Status: 200 OK (Ready: ${data.ready})`);
-                setStatus(data);
+                mergeStatus(data);
 
                 if (!data.ready) {
                     setTimeout(pollStatus, 1000);
@@ -305,7 +361,7 @@ const ProductSection = ({ vertical, id }) => {
                                 vertical={vertical}
                             />
 
-                            <FeatureImportance explanation={prediction.explanation} />
+                            <FeatureImportance explanation={prediction.explanation} attribution={prediction.attribution} />
                         </div>
 
                         {/* RIGHT COLUMN: Model Performance (4 cols) */}
@@ -3,10 +3,12 @@ import { motion } from 'framer-motion';
 import { BarChart, Bar, XAxis, YAxis, Tooltip, ResponsiveContainer, Cell } from 'recharts';
 import { Microscope } from 'lucide-react';
 
-const FeatureImportance = ({ explanation }) => {
-    // Transform explanation dict to array for Recharts
+const FeatureImportance = ({ explanation, attribution }) => {
+    // Transform explanation dict to array for Recharts. Signed attributions
+    // (when present) tell whether a feature pushed the prediction up or down.
+    const signed = attribution?.values || {};
     const data = Object.entries(explanation)
-        .map(([name, value]) => ({ name: name.replace(/_/g, ' '), value }))
+        .map(([key, value]) => ({ name: key.replace(/_/g, ' '), value, impact: signed[key] }))
         .sort((a, b) => b.value - a.value)
         .slice(0, 5); // Top 5 features
 
@@ -35,13 +37,21 @@ const FeatureImportance = ({ explanation }) => {
                             tickLine={false}
                         />
                         <Tooltip
+                            formatter={(value, _name, item) => {
+                                const impact = item.payload.impact;
+                                const share = `${Math.round(value * 100)}%`;
+                                return impact === undefined ? share : `${share} (${impact >= 0 ? '+' : ''}${impact.toFixed(2)})`;
+                            }}
                             contentStyle={{ backgroundColor: '#1e293b', borderColor: '#334155', color: '#fff' }}
                             itemStyle={{ color: '#fff' }}
                             cursor={{ fill: 'rgba(255,255,255,0.05)' }}
                         />
                         <Bar dataKey="value" radius={[0, 4, 4, 0]}>
                             {data.map((entry, index) => (
-                                <Cell key={`cell-${index}`} fill={index === 0 ? '#3b82f6' : '#64748b'} />
+                                <Cell
+                                    key={`cell-${index}`}
+                                    fill={entry.impact < 0 ? '#f87171' : index === 0 ? '#3b82f6' : '#64748b'}
+                                />
                             ))}
                         </Bar>
                     </BarChart>
@@ -53,6 +63,11 @@ const FeatureImportance = ({ explanation }) => {
                     "Primary driver is <span className="text-blue-400 font-bold">{data[0]?.name}</span> with {Math.round(data[0]?.value * 100)}% weight.
                     This suggests the model is prioritizing {data[0]?.name.includes('hiring') ? 'talent acquisition' : 'growth metrics'} over other signals."
                 </p>
+                {attribution && (
+                    <p className="text-xs text-slate-500 mt-2">
+                        Shapley attributions of {attribution.target.replace(/_/g, ' ')} ({attribution.method}) relative to a historical baseline of {attribution.base_value.toFixed(1)}.
+                    </p>
+                )}
             </div>
         </div>
     );
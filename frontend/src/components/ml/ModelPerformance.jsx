@@ -1,6 +1,7 @@
 import React, { useState, useEffect } from 'react';
 import { motion } from 'framer-motion';
 import { TrendingUp, Activity, DollarSign, Target } from 'lucide-react';
+import { subscribe, isLiveFeedSupported } from '../../liveFeed';
 
 const ModelPerformance = () => {
     const [metrics, setMetrics] = useState(null);
@@ -16,7 +17,11 @@ const ModelPerformance = () => {
             }
         };
         fetchPnL();
-        const interval = setInterval(fetchPnL, 5000); // Live updates
+        if (isLiveFeedSupported()) {
+            // Pushed by the server whenever a metric changes
+            return subscribe('pnl', (update) => setMetrics(update.metrics));
+        }
+        const interval = setInterval(fetchPnL, 5000); // Fallback: poll
         return () => clearInterval(interval);
     }, []);
 
@@ -0,0 +1,30 @@
+// Single shared connection to /api/stream for the whole dashboard.
+// Components subscribe by topic instead of each polling the API.
+
+const TOPICS = ['status', 'log', 'pipeline', 'rows', 'prediction', 'pnl', 'lagged'];
+const listeners = {};
+let source = null;
+
+export const isLiveFeedSupported = () => typeof EventSource !== 'undefined';
+
+const ensureSource = () => {
+    if (source || !isLiveFeedSupported()) return;
+    const apiUrl = import.meta.env.VITE_API_URL || '';
+    // EventSource reconnects on its own and resends Last-Event-ID,
+    // so the server replays anything missed while disconnected.
+    source = new EventSource(`${apiUrl}/api/stream`);
+    TOPICS.forEach(topic => {
+        source.addEventListener(topic, (e) => {
+            const message = JSON.parse(e.data);
+            (listeners[topic] || []).forEach(fn => fn(message.data));
+        });
+    });
+};
+
+export const subscribe = (topic, handler) => {
+    listeners[topic] = [...(listeners[topic] || []), handler];
+    ensureSource();
+    return () => {
+        listeners[topic] = (listeners[topic] || []).filter(fn => fn !== handler);
+    };
+};
@@ -0,0 +1,179 @@
+import asyncio
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from email.utils import formatdate, parsedate_to_datetime
+
+from fastapi.responses import JSONResponse, Response
+
+import metrics
+
+# Cache-Control per endpoint. Data changes about once a day, so browsers
+# revalidate after a minute and the edge (Cloudflare) may hold responses a
+# bit longer, serving stale while it revalidates with a conditional GET.
+CACHE_POLICIES = {
+    "catalog": "public, max-age=60, s-maxage=300, stale-while-revalidate=600",
+    "preview": "public, max-age=60, s-maxage=600, stale-while-revalidate=3600",
+    "files": "public, max-age=60, s-maxage=600, stale-while-revalidate=3600",
+    "predict": "public, max-age=30, s-maxage=120, stale-while-revalidate=300",
+    "backtest": "public, max-age=60, s-maxage=600, stale-while-revalidate=3600",
+    "panel": "public, max-age=60, s-maxage=600, stale-while-revalidate=3600",
+    "none": "no-store"
+}
+
+
+class CachedResponse:
+    """Encoded JSON body with its validators."""
+    __slots__ = ("body", "etag", "last_modified")
+
+    def __init__(self, body, last_modified):
+        self.body = body
+        # Strong ETag from the bytes themselves, so it is only ever shared
+        # by byte-identical bodies
+        self.etag = '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+        self.last_modified = last_modified
+
+
+class ResponseCache:
+    """
+    Server-side LRU of encoded responses, keyed by (path, validator). The
+    validator is whatever identifies the data generation behind a response
+    (partition index mtime, export file stats), so a new pipeline run yields
+    new keys and stale entries simply age out.
+    """
+
+    def __init__(self, max_entries=256):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, path, validator):
+        key = (path, validator)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+        metrics.record_cache("http_responses", hit=entry is not None)
+        return entry
+
+    def put(self, path, validator, content, last_modified):
+        entry = CachedResponse(JSONResponse(content).body, last_modified)
+        with self._lock:
+            self._entries[(path, validator)] = entry
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return entry
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class SingleFlight:
+    """
+    Concurrent identical requests share one computation. A flight is keyed
+    by (route, key), where the key carries the request's parameters and the
+    data generation (the same validator ResponseCache uses), so requests
+    only merge when they would compute the same answer. Nothing is kept
+    once the computation finishes; that is ResponseCache's job. Used from
+    the event loop only.
+    """
+
+    def __init__(self):
+        self._inflight = {}
+
+    async def do(self, route, key, compute):
+        """Result of `await compute()`, shared with every identical call made while it runs."""
+        flight_key = (route, key)
+        task = self._inflight.get(flight_key)
+        if task is None:
+            task = asyncio.ensure_future(compute())
+            self._inflight[flight_key] = task
+            task.add_done_callback(lambda t: self._landed(flight_key, t))
+            metrics.COALESCED_REQUESTS.inc(route=route, result="computed")
+        else:
+            metrics.COALESCED_REQUESTS.inc(route=route, result="coalesced")
+        # A caller that goes away (client disconnect) leaves the computation running for the rest
+        return await asyncio.shield(task)
+
+    def _landed(self, flight_key, task):
+        self._inflight.pop(flight_key, None)
+        if not task.cancelled():
+            task.exception()  # retrieved here in case every caller has gone
+
+    def inflight(self):
+        """{(route,): computations in flight} for the metrics gauge."""
+        counts = {}
+        for route, _ in self._inflight:
+            counts[(route,)] = counts.get((route,), 0) + 1
+        return counts
+
+
+def file_signature(paths=(), directories=(), prefix=None):
+    """
+    (validator, last_modified) from the stat of `paths` and of the files in
+    `directories` (optionally only names starting with `prefix`). Cheap
+    enough to run per request; changes whenever a file is added, removed or
+    rewritten.
+    """
+    parts = []
+    latest = 0.0
+    for path in paths:
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            continue
+        parts.append(f"{path}:{st.st_size}:{st.st_mtime_ns}")
+        latest = max(latest, st.st_mtime)
+    for directory in directories:
+        try:
+            entries = list(os.scandir(directory))
+        except FileNotFoundError:
+            continue
+        for entry in sorted(entries, key=lambda e: e.name):
+            if prefix and not entry.name.startswith(prefix):
+                continue
+            if not entry.is_file():
+                continue
+            st = entry.stat()
+            parts.append(f"{entry.name}:{st.st_size}:{st.st_mtime_ns}")
+            latest = max(latest, st.st_mtime)
+    validator = hashlib.blake2b("|".join(parts).encode("utf-8"), digest_size=12).hexdigest()
+    return validator, latest
+
+
+def _etag_matches(header, etag):
+    if header.strip() == "*":
+        return True
+    # Weak comparison, as RFC 9110 requires for If-None-Match
+    candidates = [t.strip() for t in header.split(",")]
+    return any(c.removeprefix("W/") == etag for c in candidates)
+
+
+def is_not_modified(request, entry):
+    """Evaluate If-None-Match (preferred) or If-Modified-Since against `entry`."""
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        return _etag_matches(if_none_match, entry.etag)
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since and entry.last_modified:
+        try:
+            since = parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+        return int(entry.last_modified) <= since
+    return False
+
+
+def respond(request, entry, cache_control):
+    """200 with the cached body, or 304 when the client's copy is current."""
+    headers = {"ETag": entry.etag, "Cache-Control": cache_control}
+    if entry.last_modified:
+        headers["Last-Modified"] = formatdate(entry.last_modified, usegmt=True)
+    if is_not_modified(request, entry):
+        metrics.record_cache("http_conditional", hit=True)
+        return Response(status_code=304, headers=headers)
+    if request.headers.get("if-none-match") or request.headers.get("if-modified-since"):
+        metrics.record_cache("http_conditional", hit=False)
+    return Response(content=entry.body, media_type="application/json", headers=headers)
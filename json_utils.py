@@ -1,26 +1,32 @@
-import numpy as np
-import pandas as pd
 import logging
+import sys
 
 logger = logging.getLogger(__name__)
 
 def convert_numpy_types(obj):
     """
     Recursively convert NumPy types to standard Python types for JSON serialization.
+
+    NumPy and pandas are looked up rather than imported: a value cannot be one
+    of their types unless they are already loaded, and importing them here
+    would put them on the API's startup path.
     """
-    if isinstance(obj, (np.int_, np.intc, np.intp, np.int8,
-                        np.int16, np.int32, np.int64, np.uint8,
-                        np.uint16, np.uint32, np.uint64)):
-        return int(obj)
-    elif isinstance(obj, (np.float_, np.float16, np.float32, np.float64)):
-        return float(obj)
-    elif isinstance(obj, (np.ndarray,)):
-        return obj.tolist()
-    elif isinstance(obj, dict):
+    np = sys.modules.get("numpy")
+    if np is not None:
+        if isinstance(obj, np.integer):
+            return int(obj)
+        elif isinstance(obj, np.floating):
+            return float(obj)
+        elif isinstance(obj, np.bool_):
+            return bool(obj)
+        elif isinstance(obj, (np.ndarray,)):
+            return obj.tolist()
+    if isinstance(obj, dict):
         return {k: convert_numpy_types(v) for k, v in obj.items()}
     elif isinstance(obj, list):
         return [convert_numpy_types(i) for i in obj]
-    elif isinstance(obj, (pd.Timestamp, pd.DatetimeIndex)):
+    pd = sys.modules.get("pandas")
+    if pd is not None and isinstance(obj, (pd.Timestamp, pd.DatetimeIndex)):
         return str(obj)
     return obj
 
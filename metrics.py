@@ -0,0 +1,426 @@
+import threading
+import time
+from contextlib import contextmanager
+
+# Default latency buckets (seconds). Covers sub-millisecond JSON work up to
+# multi-second backfills without needing per-metric tuning.
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1,
+                   0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labelnames, labelvalues, extra=None):
+    pairs = list(zip(labelnames, labelvalues))
+    if extra:
+        pairs.extend(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+
+class _Metric:
+    """
+    Base class for in-process metrics.
+    Series are keyed by a tuple of label values in `labelnames` order.
+    """
+    metric_type = "untyped"
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._series = {}
+
+    def _key(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def clear(self):
+        with self._lock:
+            self._series.clear()
+
+    def samples(self):
+        """Yield (suffix, labelvalues, extra_labels, value) tuples."""
+        raise NotImplementedError
+
+    def render(self):
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.metric_type}",
+        ]
+        for suffix, labelvalues, extra, value in self.samples():
+            labels = _format_labels(self.labelnames, labelvalues, extra)
+            lines.append(f"{self.name}{suffix}{labels} {_format_value(value)}")
+        return "\n".join(lines)
+
+
+class Counter(_Metric):
+    """Monotonically increasing counter."""
+    metric_type = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._series[key] = self._series.get(key, 0) + amount
+
+    def value(self, **labels):
+        return self._series.get(self._key(labels), 0)
+
+    def samples(self):
+        with self._lock:
+            items = sorted(self._series.items())
+        for key, value in items:
+            yield "_total", key, None, value
+
+
+class Gauge(_Metric):
+    """
+    Point-in-time value. A gauge can also be bound to a callback that is
+    evaluated at scrape time, which keeps hot paths free of bookkeeping.
+    """
+    metric_type = "gauge"
+
+    def __init__(self, name, documentation, labelnames=()):
+        super().__init__(name, documentation, labelnames)
+        self._callback = None
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._series[key] = value
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._series[key] = self._series.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+    def value(self, **labels):
+        return self._series.get(self._key(labels), 0)
+
+    def set_function(self, callback):
+        """
+        Register a callable returning {labelvalues_tuple: value} (or a plain
+        number for unlabelled gauges), evaluated on every scrape.
+        """
+        self._callback = callback
+
+    def samples(self):
+        if self._callback is not None:
+            result = self._callback()
+            if not isinstance(result, dict):
+                result = {(): result}
+            with self._lock:
+                self._series = {tuple(str(v) for v in k): val for k, val in result.items()}
+        with self._lock:
+            items = sorted(self._series.items())
+        for key, value in items:
+            yield "", key, None, value
+
+
+class Histogram(_Metric):
+    """Cumulative histogram with fixed upper bounds."""
+    metric_type = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = {
+                    "counts": [0] * len(self.buckets),
+                    "sum": 0.0,
+                    "count": 0
+                }
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series["counts"][i] += 1
+                    break
+            series["sum"] += value
+            series["count"] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        """Observe the wall time of the enclosed block."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def snapshot(self, **labels):
+        """Return (count, sum) for a series, mainly for status reporting."""
+        series = self._series.get(self._key(labels))
+        if series is None:
+            return 0, 0.0
+        return series["count"], series["sum"]
+
+    def samples(self):
+        with self._lock:
+            items = sorted((k, dict(v, counts=list(v["counts"]))) for k, v in self._series.items())
+        for key, series in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets, series["counts"]):
+                cumulative += count
+                yield "_bucket", key, [("le", _format_value(bound))], cumulative
+            yield "_bucket", key, [("le", "+Inf")], series["count"]
+            yield "_sum", key, None, series["sum"]
+            yield "_count", key, None, series["count"]
+
+
+class MetricsRegistry:
+    """Holds every metric exposed on /metrics."""
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Duplicate metric: {metric.name}")
+            self._metrics[metric.name] = metric
+        return metric
+
+    def get(self, name):
+        return self._metrics.get(name)
+
+    def render(self):
+        """Render all metrics in the Prometheus text exposition format (0.0.4)."""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return "\n".join(m.render() for m in metrics) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+CONTENT_TYPE_LATEST = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def counter(name, documentation, labelnames=()):
+    return REGISTRY.register(Counter(name, documentation, labelnames))
+
+
+def gauge(name, documentation, labelnames=()):
+    return REGISTRY.register(Gauge(name, documentation, labelnames))
+
+
+def histogram(name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+    return REGISTRY.register(Histogram(name, documentation, labelnames, buckets))
+
+
+# --- Shared instruments ---
+# Declared here so the API, the pipeline and the ML engine all report into
+# the same registry without importing each other.
+
+HTTP_REQUEST_SECONDS = histogram(
+    "hh_http_request_duration_seconds",
+    "API request latency by route template.",
+    ("method", "route", "status")
+)
+CSV_PARSE_SECONDS = histogram(
+    "hh_csv_parse_seconds",
+    "Time spent in pd.read_csv.",
+    ("source",)
+)
+DATA_READS = counter(
+    "hh_data_reads",
+    "Reads through the data access layer: performed, or coalesced into an identical read in flight.",
+    ("op", "result")
+)
+DATA_READ_SECONDS = histogram(
+    "hh_data_read_seconds",
+    "Duration of performed data access reads.",
+    ("op",)
+)
+DATA_READS_IN_FLIGHT = gauge(
+    "hh_data_reads_in_flight",
+    "Distinct data access reads currently running."
+)
+SERIALIZATION_SECONDS = histogram(
+    "hh_serialization_seconds",
+    "Time spent converting and encoding JSON response bodies.",
+    ("route",)
+)
+COALESCED_REQUESTS = counter(
+    "hh_coalesced_requests",
+    "API requests that computed a response, or shared one already being computed by an identical request.",
+    ("route", "result")
+)
+IN_FLIGHT_COMPUTATIONS = gauge(
+    "hh_in_flight_computations",
+    "Distinct response computations in flight, by route.",
+    ("route",)
+)
+CACHE_REQUESTS = counter(
+    "hh_cache_requests",
+    "Cache lookups by cache name and result (hit/miss).",
+    ("cache", "result")
+)
+CACHE_HIT_RATIO = gauge(
+    "hh_cache_hit_ratio",
+    "Hit ratio per cache since process start.",
+    ("cache",)
+)
+PIPELINE_STAGE_SECONDS = histogram(
+    "hh_pipeline_stage_seconds",
+    "Per-vertical duration of run_pipeline stages.",
+    ("vertical", "stage")
+)
+PIPELINE_STAGE_RUNS = counter(
+    "hh_pipeline_stage_runs",
+    "Pipeline DAG stage outcomes (ran, skipped, failed, blocked) by stage kind.",
+    ("stage", "result")
+)
+PIPELINE_ROWS = gauge(
+    "hh_pipeline_rows",
+    "Rows in the master dataset after the last pipeline run.",
+    ("vertical",)
+)
+PREDICT_SECONDS = histogram(
+    "hh_predict_seconds",
+    "Predictor inference latency (BasePredictor._run_inference).",
+    ("vertical",)
+)
+MODEL_SECONDS = histogram(
+    "hh_model_seconds",
+    "Latency of individual trained-model calls, by vertical and target.",
+    ("vertical", "target")
+)
+MODEL_FALLBACKS = counter(
+    "hh_model_fallbacks",
+    "Targets answered by the heuristic because their models did not "
+    "(timeout, error, busy).",
+    ("vertical", "target", "reason")
+)
+DRIFT_PSI = gauge(
+    "hh_drift_psi",
+    "Population stability index of the recent window against the reference, by column.",
+    ("vertical", "column")
+)
+DRIFT_ALERTS = gauge(
+    "hh_drift_alerts",
+    "Open drift / data-quality alerts (psi, out_of_range, nulls).",
+    ("vertical", "kind")
+)
+DRIFT_OOD_INPUTS = counter(
+    "hh_drift_ood_inputs",
+    "Prediction inputs flagged as out of distribution.",
+    ("vertical",)
+)
+PNL_LEDGER_SIZE = gauge(
+    "hh_pnl_ledger_entries",
+    "Entries held by the P&L tracker.",
+    ("ledger",)
+)
+
+STREAM_SUBSCRIBERS = gauge(
+    "hh_stream_subscribers",
+    "Clients connected to the live feed (/api/stream)."
+)
+STREAM_EVENTS = counter(
+    "hh_stream_events",
+    "Events published to the live feed by topic.",
+    ("topic",)
+)
+STREAM_DROPPED = counter(
+    "hh_stream_dropped_events",
+    "Events dropped from slow live-feed clients' buffers by topic.",
+    ("topic",)
+)
+EVENT_LOG_EVENTS = counter(
+    "hh_event_log_events",
+    "Entries appended to the status event log by source and level.",
+    ("source", "level")
+)
+EVENT_LOG_ENTRIES = gauge(
+    "hh_event_log_entries",
+    "Entries held by the status event log's ring buffer."
+)
+ATTRIBUTION_EVALUATIONS = counter(
+    "hh_attribution_evaluations",
+    "Model rows evaluated to compute feature attributions, by method.",
+    ("method",)
+)
+PRODUCT_RENDER_SECONDS = histogram(
+    "hh_product_render_seconds",
+    "Time to render a product chunk (one month) from the partition store on a cache miss."
+)
+PRODUCT_CACHE_BYTES = gauge(
+    "hh_product_cache_bytes",
+    "Disk used by rendered product chunks."
+)
+EXPORT_JOBS = counter(
+    "hh_export_jobs",
+    "Export job submissions and outcomes "
+    "(submitted, deduplicated, cached, rejected, done, failed).",
+    ("result",)
+)
+EXPORT_SECONDS = histogram(
+    "hh_export_job_seconds",
+    "Run time of completed export jobs in the worker pool.",
+    buckets=(0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0, 600.0)
+)
+EXPORT_QUEUE = gauge(
+    "hh_export_jobs_active",
+    "Export jobs waiting for or holding a worker, by state.",
+    ("state",)
+)
+ADMISSION_DECISIONS = counter(
+    "hh_admission_decisions",
+    "Requests to rate-limited routes by policy and result "
+    "(admitted, rate_limited, client_limited, shed, timeout).",
+    ("policy", "result")
+)
+ADMISSION_IN_FLIGHT = gauge(
+    "hh_admission_in_flight",
+    "Requests holding a concurrency slot, by policy.",
+    ("policy",)
+)
+ADMISSION_QUEUE_DEPTH = gauge(
+    "hh_admission_queue_depth",
+    "Requests waiting for a concurrency slot, by policy.",
+    ("policy",)
+)
+ADMISSION_WAIT_SECONDS = histogram(
+    "hh_admission_wait_seconds",
+    "Time admitted requests waited for a concurrency slot, by policy.",
+    ("policy",)
+)
+
+
+def record_cache(cache, hit):
+    """Count a cache lookup. Call from any cache so hit ratios show on /metrics."""
+    CACHE_REQUESTS.inc(cache=cache, result="hit" if hit else "miss")
+
+
+def _cache_hit_ratios():
+    # Copied under the metric's lock: record_cache() may add series mid-scrape
+    with CACHE_REQUESTS._lock:
+        series = list(CACHE_REQUESTS._series.items())
+    totals = {}
+    for (cache, result), value in series:
+        hits, lookups = totals.get(cache, (0, 0))
+        totals[cache] = (hits + (value if result == "hit" else 0), lookups + value)
+    return {(cache,): (hits / lookups if lookups else 0.0) for cache, (hits, lookups) in totals.items()}
+
+
+CACHE_HIT_RATIO.set_function(_cache_hit_ratios)
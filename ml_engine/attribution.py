@@ -0,0 +1,194 @@
+import hashlib
+import math
+import os
+import threading
+from collections import OrderedDict
+from typing import Dict, Any
+
+import numpy as np
+
+import metrics
+
+# Model rows one explanation request may evaluate (rows x coalitions x background)
+DEFAULT_BUDGET = int(os.getenv("ATTRIBUTION_BUDGET", "50000"))
+# Up to this many features every coalition is evaluated (2^f per row)
+MAX_EXACT_FEATURES = 10
+
+
+class AttributionEngine:
+    """
+    Shapley-value attributions of a predictor's primary target.
+
+    Values are interventional: features outside a coalition take the values
+    of a fixed background sample from the vertical's history, so a row's
+    attributions sum to its prediction minus the background's mean
+    prediction. With few features every coalition is evaluated (exact);
+    otherwise, or when the request budget does not allow it, features are
+    added along seeded random permutations. All evaluations go through the
+    predictor's vectorized _run_inference as flat batches.
+
+    Results are cached per (model version, input row hash), so serving an
+    explanation with every prediction costs a hash lookup for repeat inputs.
+    """
+
+    def __init__(self, predictor, background_size=32, min_background=4,
+                 max_permutations=64, budget=None, cache_size=4096):
+        self.predictor = predictor
+        self.background_size = background_size
+        self.min_background = min_background
+        self.max_permutations = max_permutations
+        self.budget = budget or DEFAULT_BUDGET
+        self.cache_size = cache_size
+        self._background = None
+        self._exact = None
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+
+    # --- Setup ---
+
+    def set_background(self, X: np.ndarray):
+        """Evenly spaced background rows from an imputed reference matrix."""
+        if len(X) == 0:
+            return
+        idx = np.unique(np.linspace(0, len(X) - 1, min(len(X), self.background_size)).round().astype(int))
+        self._background = np.ascontiguousarray(X[idx])
+
+    def _background_rows(self, size: int) -> np.ndarray:
+        if self._background is None:
+            # Unfitted predictor: attribute against its baseline row
+            return self.predictor._baseline(np.empty((1, len(self.predictor.FEATURES))))[None, :]
+        if size >= len(self._background):
+            return self._background
+        idx = np.linspace(0, len(self._background) - 1, size).round().astype(int)
+        return self._background[idx]
+
+    def _exact_tables(self, f: int):
+        """Coalition masks (2^f, f) and the Shapley weight matrix (f, 2^f)."""
+        if self._exact is None or self._exact[0].shape[1] != f:
+            codes = np.arange(2 ** f)
+            masks = ((codes[:, None] >> np.arange(f)) & 1).astype(bool)
+            sizes = masks.sum(axis=1)
+            weight = np.array([math.factorial(s) * math.factorial(f - s - 1) / math.factorial(f) for s in range(f)])
+            W = np.where(masks.T, weight[np.maximum(sizes - 1, 0)], -weight[np.minimum(sizes, f - 1)])
+            self._exact = (masks, W)
+        return self._exact
+
+    # --- Evaluation ---
+
+    def _values(self, X: np.ndarray, masks: np.ndarray, background: np.ndarray) -> np.ndarray:
+        """Mean primary-target prediction per (row, coalition) over the background."""
+        n, f = X.shape
+        m, b = len(masks), len(background)
+        inputs = np.where(masks[None, :, None, :], X[:, None, None, :], background[None, None, :, :])
+        target = self.predictor.primary_target
+        out = self.predictor._run_inference(inputs.reshape(-1, f))[target]
+        return out.reshape(n, m, b).mean(axis=2)
+
+    def _compute_exact(self, X: np.ndarray, background: np.ndarray):
+        masks, W = self._exact_tables(X.shape[1])
+        v = self._values(X, masks, background)
+        metrics.ATTRIBUTION_EVALUATIONS.inc(len(X) * len(masks) * len(background), method="exact")
+        return v @ W.T, v[:, 0]
+
+    def _compute_permutation(self, X: np.ndarray, background: np.ndarray, permutations: int):
+        n, f = X.shape
+        # Same seed every call, so a row's attribution does not depend on call order
+        perms = np.argsort(np.random.default_rng(0).random((permutations, f)), axis=1)
+        ranks = np.argsort(perms, axis=1)
+        # masks[p, k, j]: feature j is among the first k of permutation p
+        masks = ranks[:, None, :] < np.arange(f + 1)[None, :, None]
+        v = self._values(X, masks.reshape(-1, f), background).reshape(n, permutations, f + 1)
+        marginal = np.diff(v, axis=2)
+        phi = np.take_along_axis(marginal, np.broadcast_to(ranks[None], (n, permutations, f)), axis=2).mean(axis=1)
+        metrics.ATTRIBUTION_EVALUATIONS.inc(n * masks.shape[0] * masks.shape[1] * len(background), method="permutation")
+        return phi, v[:, 0, 0]
+
+    def _plan(self, n: int, f: int, budget: int):
+        """(method, background size, permutations) for `n` rows within `budget`, or None."""
+        available = len(self._background) if self._background is not None else 1
+        floor = min(self.min_background, available)
+        if f <= MAX_EXACT_FEATURES:
+            size = min(available, budget // max(1, n * 2 ** f))
+            if size >= floor:
+                return "exact", size, None
+        permutations = min(self.max_permutations, budget // max(1, n * (f + 1) * floor))
+        if permutations >= 1:
+            return "permutation", floor, permutations
+        return None
+
+    def _compute(self, X: np.ndarray, budget: int):
+        n, f = X.shape
+        phi = np.full((n, f), np.nan)
+        base = np.full(n, np.nan)
+        methods = [None] * n
+        plan = self._plan(n, f, budget)
+        if plan is None:
+            # Over budget: explain as many rows as one permutation each allows
+            floor = min(self.min_background, len(self._background) if self._background is not None else 1)
+            n = budget // ((f + 1) * floor)
+            if n == 0:
+                return phi, base, methods
+            X = X[:n]
+            plan = ("permutation", floor, 1)
+        method, size, permutations = plan
+        background = self._background_rows(size)
+        if method == "exact":
+            phi[:n], base[:n] = self._compute_exact(X, background)
+        else:
+            phi[:n], base[:n] = self._compute_permutation(X, background, permutations)
+        methods[:n] = [method] * n
+        return phi, base, methods
+
+    # --- Public API ---
+
+    def explain(self, X: np.ndarray, budget: int = None) -> Dict[str, Any]:
+        """
+        Attributions for each row of an imputed feature matrix: `values`
+        (rows, features), `base` (rows,) and `method` per row. Rows the budget
+        could not cover have NaN values and method None.
+        """
+        X = np.ascontiguousarray(X, dtype=np.float64)
+        version = self.predictor.model_version
+        keys = [(version, hashlib.blake2b(row.tobytes(), digest_size=16).digest()) for row in X]
+        phi = np.empty(X.shape)
+        base = np.empty(len(X))
+        methods = [None] * len(X)
+
+        missing = []
+        with self._lock:
+            for i, key in enumerate(keys):
+                hit = self._cache.get(key)
+                if hit is None:
+                    missing.append(i)
+                    continue
+                self._cache.move_to_end(key)
+                phi[i], base[i], methods[i] = hit
+        for hit in [True] * (len(X) - len(missing)) + [False] * len(missing):
+            metrics.record_cache("attributions", hit=hit)
+
+        if missing:
+            new_phi, new_base, new_methods = self._compute(X[missing], budget or self.budget)
+            with self._lock:
+                for j, i in enumerate(missing):
+                    phi[i], base[i], methods[i] = new_phi[j], new_base[j], new_methods[j]
+                    if new_methods[j] is not None:
+                        self._cache[keys[i]] = (new_phi[j], new_base[j], new_methods[j])
+                while len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+        return {"values": phi, "base": base, "method": methods}
+
+    def global_importance(self, X: np.ndarray) -> np.ndarray:
+        """Mean absolute attribution per feature over `X`, normalised to sum to 1."""
+        n, f = X.shape
+        if n == 0:
+            return np.zeros(f)
+        size = len(self._background) if self._background is not None else 1
+        cost = n * 2 ** f * size if f <= MAX_EXACT_FEATURES else n * (f + 1) * size * self.max_permutations
+        phi, _, _ = self._compute(np.ascontiguousarray(X, dtype=np.float64), cost)
+        weights = np.nan_to_num(np.abs(phi)).mean(axis=0)
+        total = weights.sum()
+        return weights / total if total > 0 else weights
+
+    def clear(self):
+        with self._lock:
+            self._cache.clear()
@@ -0,0 +1,154 @@
+import numpy as np
+import pandas as pd
+from typing import Dict, Any, Optional
+
+from profiling import span
+from .pnl_tracker import PnLTracker
+
+# Return on a position whose outcome moves one historical standard deviation its way
+RETURN_PER_SIGMA = 0.10
+# Predictions closer than this (in standard deviations) to the historical median open no position
+MIN_SIGNAL = 0.10
+
+
+def _grid(values, day_idx, company_idx, shape):
+    """(days, companies) matrix of `values`, NaN where a company has no row that day."""
+    grid = np.full(shape, np.nan)
+    grid[day_idx, company_idx] = values
+    return grid
+
+
+def run_backtest(predictor, history: pd.DataFrame, horizon_days: int = 30,
+                 tracker: Optional[PnLTracker] = None) -> Dict[str, Any]:
+    """
+    Replay a vertical's history through `predictor` in one batch and trade it.
+
+    Each day, every company's primary prediction is turned into a long/short
+    view on the predictor's BACKTEST_OUTCOME column (above the historical
+    median prediction means the outcome should move in the declared
+    direction). Positions are sized with tracker.calculate_position_size()
+    on the prediction's confidence, scaled down together when a day's sizes
+    add up to more than 100% of its capital, and resolved against the
+    outcome `horizon_days` later. A position earns RETURN_PER_SIGMA per standard
+    deviation the outcome moves its way, capped at +/-100%.
+
+    Capital is split into `horizon_days` tranches that each open positions
+    every `horizon_days` (tranche o trades on days o, o + h, ...), so every
+    prediction is used, no capital is committed twice, and each tranche
+    compounds independently. All of this is array arithmetic over a
+    (days, companies) grid.
+    """
+    tracker = tracker or PnLTracker()
+    initial_capital = tracker.initial_capital
+    if predictor.BACKTEST_OUTCOME is None:
+        raise ValueError(f"{predictor.vertical} predictor declares no BACKTEST_OUTCOME")
+    outcome, direction = predictor.BACKTEST_OUTCOME
+    target = predictor.primary_target
+    h = int(horizon_days)
+
+    result = {
+        'vertical': predictor.vertical,
+        'target': target,
+        'outcome': outcome,
+        'horizon_days': h,
+        'initial_capital': initial_capital
+    }
+    if history.empty or outcome not in history or h < 1:
+        return {**result, 'predictions': 0, 'total_trades': 0, 'equity_curve': []}
+
+    with span("backtest", vertical=predictor.vertical, step="predict"):
+        X = predictor.featurize_frame(history)
+        outputs, confidence = predictor.predict_batch(X)
+
+    with span("backtest", vertical=predictor.vertical, step="resolve"):
+        dates = pd.to_datetime(history["date"]).to_numpy(dtype="datetime64[D]")
+        start = dates.min()
+        day_idx = (dates - start).astype(np.int64)
+        company_idx, companies = pd.factorize(history["company"], sort=True)
+        shape = (int(day_idx.max()) + 1, len(companies))
+        days = shape[0]
+
+        pred = _grid(outputs[target], day_idx, company_idx, shape)
+        conf = _grid(confidence[target], day_idx, company_idx, shape)
+        realized = _grid(pd.to_numeric(history[outcome], errors="coerce").to_numpy(dtype=float),
+                         day_idx, company_idx, shape)
+
+        # Long/short view from where the prediction sits in its own history
+        spread = np.nanstd(pred)
+        z = (pred - np.nanmedian(pred)) / (spread if spread > 0 else 1.0) * direction
+        side = np.where(np.abs(z) >= MIN_SIGNAL, np.sign(z), 0.0)
+
+        # Resolve each entry against the realized outcome h days later
+        cohorts = max(days - h, 0)
+        entry, exit_ = realized[:cohorts], realized[h:]
+        outcome_scale = np.nanstd(realized)
+        move = (exit_ - entry) / (outcome_scale if outcome_scale > 0 else 1.0)
+        ret = np.clip(side[:cohorts] * move * RETURN_PER_SIGMA, -1.0, 1.0)
+        fraction = tracker.calculate_position_size(conf[:cohorts], capital=1.0)
+        traded = (side[:cohorts] != 0) & np.isfinite(ret) & (fraction > 0)
+        fraction = np.where(traded, fraction, 0.0)
+        ret = np.where(traded, ret, 0.0)
+        # A day's positions share its tranche's capital: scale them down when they add up to more than all of it
+        gross = fraction.sum(axis=1, keepdims=True)
+        fraction = fraction / np.maximum(gross, 1.0)
+        cohort_return = (fraction * ret).sum(axis=1)
+
+    with span("backtest", vertical=predictor.vertical, step="equity"):
+        # cum[k, o]: growth of tranche o after its k-th cohort, which exits on day o + (k + 1) * h
+        blocks = -(-cohorts // h) if cohorts else 0
+        growth = np.ones(blocks * h)
+        growth[:cohorts] += cohort_return
+        cum = np.cumprod(growth.reshape(blocks, h), axis=0)
+
+        steps = np.full((days, h), np.nan)
+        steps[0] = 1.0
+        exit_day = (np.arange(blocks)[:, None] + 1) * h + np.arange(h)[None, :]
+        valid = exit_day < days
+        steps[exit_day[valid], np.broadcast_to(np.arange(h), exit_day.shape)[valid]] = cum[valid]
+        # Forward-fill each tranche between its exits
+        filled = np.where(np.isnan(steps), 0, np.arange(days)[:, None])
+        filled = np.maximum.accumulate(filled, axis=0)
+        tranche_equity = steps[filled, np.arange(h)[None, :]]
+        equity = initial_capital * tranche_equity.mean(axis=1)
+
+        peak = np.maximum.accumulate(equity)
+        drawdown = equity / peak - 1.0
+        underwater = drawdown < 0
+        # Longest run of consecutive days below the previous peak
+        run_starts = np.where(underwater, 0, np.arange(days))
+        run_length = np.arange(days) - np.maximum.accumulate(run_starts)
+        max_drawdown_days = int(run_length[underwater].max()) if underwater.any() else 0
+
+        daily = np.diff(equity) / equity[:-1] if days > 1 else np.zeros(0)
+        sharpe = float(daily.mean() / daily.std() * np.sqrt(365)) if daily.size and daily.std() > 0 else 0.0
+
+    trade_returns = ret[traded]
+    wins = trade_returns[trade_returns > 0]
+    losses = trade_returns[trade_returns <= 0]
+    viewed = (side[:cohorts] != 0) & np.isfinite(move)
+    hit_rate = float((np.sign(move[viewed]) == side[:cohorts][viewed]).mean() * 100) if viewed.any() else 0.0
+    calendar = start + np.arange(days)
+
+    final_capital = float(equity[-1])
+    return {
+        **result,
+        'start': str(start),
+        'end': str(calendar[-1]),
+        'companies': [str(c) for c in companies],
+        'predictions': int(len(history)),
+        'final_capital': round(final_capital, 2),
+        'total_pnl': round(final_capital - initial_capital, 2),
+        'roi_pct': round((final_capital - initial_capital) / initial_capital * 100, 2),
+        'total_trades': int(traded.sum()),
+        'win_rate': round(float(wins.size / trade_returns.size * 100), 1) if trade_returns.size else 0.0,
+        'avg_win_pct': round(float(wins.mean() * 100), 1) if wins.size else 0.0,
+        'avg_loss_pct': round(float(losses.mean() * 100), 1) if losses.size else 0.0,
+        'signal_hit_rate': round(hit_rate, 1),
+        'max_drawdown_pct': round(float(drawdown.min() * 100), 2),
+        'max_drawdown_days': max_drawdown_days,
+        'sharpe': round(sharpe, 2),
+        'equity_curve': [
+            {'date': str(d), 'equity': round(float(e), 2), 'drawdown_pct': round(float(dd * 100), 2)}
+            for d, e, dd in zip(calendar, equity, drawdown)
+        ]
+    }
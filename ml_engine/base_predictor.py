@@ -1,102 +1,399 @@
 import os
 import json
+import hashlib
+import threading
+import zlib
 import numpy as np
 import pandas as pd
-from typing import Dict, List, Any, Tuple
+from typing import Dict, List, Any, Tuple, Optional
 from datetime import datetime
 import joblib
+import metrics
+from profiling import span
+from .attribution import AttributionEngine
+from .ensemble import ENSEMBLE, MODEL_TIMEOUT
 from .pnl_tracker import PnLTracker
 
 class BasePredictor:
     """
     Base class for all vertical-specific ML predictors.
     Handles model loading, prediction orchestration, and confidence calibration.
+
+    Subclasses declare their inputs in FEATURES and implement _run_inference
+    on a float64 matrix (one row per company-day), so a single prediction and
+    a batch over a vertical's whole history share one vectorized code path.
+
+    Targets with trained models (see _load_models and add_model) are
+    predicted by them instead, every model of a prediction running at once
+    on the shared EnsembleRunner; the heuristic answers for any target whose
+    models miss their timeout. Attributions explain the heuristic.
     """
-    
+
+    # Ordered model inputs: (feature name, column in the dataset row)
+    FEATURES: Tuple[Tuple[str, str], ...] = ()
+    # Numeric codes for string-valued columns, e.g. {"hiring_spike": {"Yes": 1.0}}
+    CATEGORY_CODES: Dict[str, Dict[str, float]] = {}
+    # Targets reported as labels: target -> (threshold, label at/below, label above)
+    LABELS: Dict[str, Tuple[float, str, str]] = {}
+    # Decimal places per numeric target (0 -> int, negative rounds to tens, hundreds...)
+    ROUNDING: Dict[str, int] = {}
+    # (dataset column, direction) a backtest resolves the primary target against:
+    # a high prediction expects the column to rise (+1) or fall (-1)
+    BACKTEST_OUTCOME: Optional[Tuple[str, int]] = None
+    # Seconds a request waits for a target's models (default MODEL_TIMEOUT_MS)
+    MODEL_TIMEOUTS: Dict[str, float] = {}
+
+    # Fixed perturbation draws used to measure prediction stability
+    CONFIDENCE_DRAWS = 32
+    # Perturbation size as a fraction of each feature's historical spread
+    CONFIDENCE_NOISE = 0.25
+    # Reference rows used to compute global importances
+    IMPORTANCE_SAMPLE = 500
+
     def __init__(self, vertical_name: str, pnl_tracker: PnLTracker):
         self.vertical = vertical_name
         self.pnl_tracker = pnl_tracker
-        self.models = {}
+        # target -> [(member name, model with .predict(X))]
+        self.models: Dict[str, List[Tuple[str, Any]]] = {}
         self.model_metadata = {}
         self.feature_importance = {}
-        
+
+        self.feature_names = [name for name, _ in self.FEATURES]
+        self._feature_index = {name: i for i, name in enumerate(self.feature_names)}
+        # Reference statistics (see fit_reference); until fitted, perturbations
+        # are relative to each value and attributions use a zero baseline
+        self._ref_mean = None
+        self._ref_scale = None
+        self._targets = None
+        self.model_version = f"{type(self).__name__}:unfitted"
+        self.attributions = AttributionEngine(self)
+        # Optional drift.DriftMonitor; when set, predict() flags inputs outside
+        # the vertical's reference distribution
+        self.drift_monitor = None
+        # Data generation the last simulated trade was recorded for (see predict)
+        self._pnl_key = None
+        self._pnl_lock = threading.Lock()
+        # Seeded per vertical so confidence is reproducible for the same input
+        rng = np.random.default_rng(zlib.crc32(vertical_name.encode("utf-8")))
+        self._noise = rng.standard_normal((self.CONFIDENCE_DRAWS, len(self.FEATURES)))
+
         # Load models if they exist
         self._load_models()
-        
+
     def _load_models(self):
         """
         Load trained models from disk.
-        Expected structure: ml_engine/models/{vertical}/{target}.pkl
+        Expected structure: ml_engine/models/{vertical}/{target}.pkl, plus
+        optional ensemble members {target}__{member}.pkl. Each model takes the
+        imputed (rows, FEATURES) float64 matrix and returns one value per row.
         """
         model_dir = f"ml_engine/models/{self.vertical}"
         if not os.path.exists(model_dir):
             print(f"No models found for {self.vertical}, initializing empty.")
             return
 
-        # This is a placeholder for actual model loading logic
-        # In a real scenario, we would iterate through .pkl files
-        pass
+        for filename in sorted(os.listdir(model_dir)):
+            stem, ext = os.path.splitext(filename)
+            if ext not in (".pkl", ".joblib"):
+                continue
+            target, _, member = stem.partition("__")
+            if target not in self.targets:
+                print(f"Ignoring {self.vertical} model {filename}: {target} is not a target")
+                continue
+            self.add_model(target, joblib.load(os.path.join(model_dir, filename)), name=member or "model")
+        print(f"Loaded {sum(len(m) for m in self.models.values())} models for {self.vertical}")
+
+    def add_model(self, target: str, model: Any, name: Optional[str] = None):
+        """Register a model (or an extra ensemble member) for `target`."""
+        members = self.models.setdefault(target, [])
+        members.append((name or f"member{len(members)}", model))
+
+    # --- Feature matrices ---
+
+    def _encode(self, column: str, value: Any) -> float:
+        if value is None:
+            return np.nan
+        if isinstance(value, str):
+            codes = self.CATEGORY_CODES.get(column)
+            if codes is not None:
+                return codes.get(value, 0.0)
+            try:
+                return float(value)
+            except ValueError:
+                return np.nan
+        return float(value)
+
+    def featurize(self, records, out: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Fill a (rows, features) float64 matrix from one record dict or a list
+        of them. Pass `out` to reuse a preallocated matrix. Missing values stay NaN.
+        """
+        if isinstance(records, dict):
+            records = [records]
+        if out is None:
+            out = np.empty((len(records), len(self.FEATURES)))
+        for i, record in enumerate(records):
+            row = out[i]
+            for j, (_, column) in enumerate(self.FEATURES):
+                row[j] = self._encode(column, record.get(column))
+        return out
+
+    def featurize_frame(self, df: pd.DataFrame, out: Optional[np.ndarray] = None) -> np.ndarray:
+        """Column-wise featurize() for a typed dataset frame (see schemas.py)."""
+        if out is None:
+            out = np.empty((len(df), len(self.FEATURES)))
+        for j, (_, column) in enumerate(self.FEATURES):
+            if column not in df:
+                out[:, j] = np.nan
+                continue
+            values = df[column]
+            codes = self.CATEGORY_CODES.get(column)
+            if codes is not None:
+                out[:, j] = values.astype(object).map(codes).fillna(0.0).to_numpy(dtype=np.float64)
+            else:
+                out[:, j] = pd.to_numeric(values, errors="coerce").to_numpy(dtype=np.float64, na_value=np.nan)
+        return out
+
+    def column(self, X: np.ndarray, name: str) -> np.ndarray:
+        """Column of feature `name` in a feature matrix."""
+        return X[:, self._feature_index[name]]
+
+    def _baseline(self, X: np.ndarray) -> np.ndarray:
+        if self._ref_mean is not None:
+            return self._ref_mean
+        return np.zeros(X.shape[1])
+
+    def _impute(self, X: np.ndarray) -> np.ndarray:
+        missing = np.isnan(X)
+        if not missing.any():
+            return X
+        return np.where(missing, self._baseline(X), X)
+
+    @property
+    def reference_fitted(self) -> bool:
+        return self._ref_mean is not None
+
+    @property
+    def targets(self) -> List[str]:
+        """Targets in output order, as the heuristic returns them."""
+        if self._targets is None:
+            probe = self._baseline(np.empty((1, len(self.FEATURES))))[None, :]
+            self._targets = list(self._run_inference(probe))
+        return self._targets
+
+    @property
+    def primary_target(self) -> str:
+        """The first target, which explanations and the P&L log follow."""
+        return self.targets[0]
+
+    def fit_reference(self, history: pd.DataFrame):
+        """
+        Record per-feature statistics from a vertical's history. They set the
+        perturbation size for confidence and the attribution background, and
+        the global feature importances are computed here once.
+        """
+        X = self.featurize_frame(history)
+        if len(X) == 0:
+            return
+        self._ref_mean = np.nan_to_num(np.nanmean(X, axis=0))
+        scale = np.nan_to_num(np.nanstd(X, axis=0))
+        # Constant features still get a small spread so they are not treated as exact
+        self._ref_scale = np.where(scale > 0, scale, np.maximum(np.abs(self._ref_mean) * 0.1, 1e-6))
+
+        digest = hashlib.blake2b(self._ref_mean.tobytes() + self._ref_scale.tobytes(), digest_size=6)
+        self.model_version = f"{type(self).__name__}:{digest.hexdigest()}"
+
+        X = self._impute(X)
+        self.attributions.set_background(X)
+        step = max(1, len(X) // self.IMPORTANCE_SAMPLE)
+        weights = self.attributions.global_importance(X[::step])
+        self.feature_importance = {
+            name: round(float(w), 4) for name, w in zip(self.feature_names, weights)
+        }
+
+    # --- Prediction ---
 
-    def predict(self, company_data: Dict[str, Any]) -> Dict[str, Any]:
+    def predict(self, company_data: Dict[str, Any], pnl_key: Optional[Any] = None) -> Dict[str, Any]:
         """
         Main entry point. Returns predictions, confidence, and explanation.
+
+        `pnl_key` identifies the data the prediction was made from (the API
+        passes the partition version). The P&L tracker records one simulated
+        trade per key, however often the same data is predicted on; without
+        a key every call records one.
         """
         # 1. Preprocess Data
-        features = self._preprocess(company_data)
-        
+        with span("predict", vertical=self.vertical, step="preprocess"):
+            raw = self._preprocess(company_data)
+            features = self._impute(raw)
+
         # 2. Generate Predictions
-        predictions = self._run_inference(features)
-        
+        with span("predict", metrics.PREDICT_SECONDS, vertical=self.vertical, step="inference"):
+            outputs, samples, model_report = self._infer(features)
+            predictions = self._format_predictions(outputs)
+
         # 3. Calculate Confidence
-        confidence = self._calculate_confidence(features, predictions)
-        
+        with span("predict", vertical=self.vertical, step="confidence"):
+            scores = self._calculate_confidence(raw, features, outputs, samples)
+            confidence = {k: round(float(v[0]), 4) for k, v in scores.items()}
+
         # 4. Explain Prediction (Feature Importance)
-        explanation = self._explain_prediction(features)
-        
+        with span("predict", vertical=self.vertical, step="explain"):
+            attribution = self.attributions.explain(features)
+            explanation = self._explain_prediction(attribution)
+
         # 5. Log to P&L Tracker (Simulated)
-        self._log_pnl_impact(predictions, confidence)
-        
-        return {
-            'company': company_data.get('name', 'Unknown'),
+        with span("predict", vertical=self.vertical, step="pnl_log"):
+            if self._claim_pnl_key(pnl_key):
+                self._log_pnl_impact(predictions, confidence)
+
+        result = {
+            'company': company_data.get('name', company_data.get('company', 'Unknown')),
             'predictions': predictions,
             'confidence': confidence,
             'explanation': explanation,
+            'attribution': self._attribution_detail(attribution),
             'timestamp': datetime.now().isoformat()
         }
+        if model_report is not None:
+            result['models'] = model_report
+        if self.drift_monitor is not None:
+            ood = self.drift_monitor.check(self.vertical, company_data, [col for _, col in self.FEATURES])
+            if ood is not None:
+                result['out_of_distribution'] = ood
+        return result
 
-    def _preprocess(self, data: Dict) -> pd.DataFrame:
+    def predict_batch(self, X: np.ndarray) -> Tuple[Dict[str, np.ndarray], Dict[str, np.ndarray]]:
         """
-        Convert raw dictionary data into model-ready feature vector.
-        Must be implemented by subclasses.
+        Raw predictions and confidence for every row of a feature matrix
+        (see featurize_frame), without explanations or P&L logging.
         """
-        raise NotImplementedError("Subclasses must implement _preprocess")
+        features = self._impute(X)
+        outputs, samples, _ = self._infer(features, timed=False)
+        return outputs, self._calculate_confidence(X, features, outputs, samples)
 
-    def _run_inference(self, features: pd.DataFrame) -> Dict[str, Any]:
+    def _infer(self, features: np.ndarray, timed: bool = True):
+        """
+        (outputs, samples, report): predictions for the rows of `features` and
+        for their perturbed copies (see _perturb), made as one batch so each
+        model is called once. Targets with models get their ensemble's values,
+        the rest the heuristic's. `timed` applies the per-target timeouts
+        (requests); batch callers wait for the models. The report is None
+        without models.
         """
-        Run the actual ML models.
-        Must be implemented by subclasses.
+        n = len(features)
+        batch = np.vstack([features, self._perturb(features)])
+        combined = self._run_inference(batch)
+        report = None
+        if self.models:
+            timeouts = {target: self.MODEL_TIMEOUTS.get(target, MODEL_TIMEOUT) if timed else None
+                        for target in self.models}
+            combined, report = ENSEMBLE.run(self.vertical, self.models, batch, combined, timeouts)
+        outputs = {target: values[:n] for target, values in combined.items()}
+        samples = {target: values[n:] for target, values in combined.items()}
+        return outputs, samples, report
+
+    def _preprocess(self, data: Dict) -> np.ndarray:
+        """
+        Convert raw dictionary data into a model-ready (1, features) matrix.
+        Subclasses may override to derive extra inputs.
+        """
+        return self.featurize(data)
+
+    def _run_inference(self, features: np.ndarray) -> Dict[str, np.ndarray]:
+        """
+        Run the actual ML models on a (rows, features) matrix, returning one
+        float array per target. Must be implemented by subclasses.
         """
         raise NotImplementedError("Subclasses must implement _run_inference")
 
-    def _calculate_confidence(self, features: pd.DataFrame, predictions: Dict) -> Dict[str, float]:
+    def _format_predictions(self, outputs: Dict[str, np.ndarray], row: int = 0) -> Dict[str, Any]:
+        """Plain Python values for one row: labels, ints or rounded floats."""
+        predictions = {}
+        for target, values in outputs.items():
+            value = float(values[row])
+            if target in self.LABELS:
+                threshold, low, high = self.LABELS[target]
+                predictions[target] = high if value > threshold else low
+                continue
+            digits = self.ROUNDING.get(target, 2)
+            predictions[target] = int(value) if digits == 0 else round(value, digits)
+        return predictions
+
+    def _perturb(self, features: np.ndarray) -> np.ndarray:
+        """CONFIDENCE_DRAWS noisy copies of every row, as a flat (draws * rows, features) batch."""
+        n, f = features.shape
+        if self._ref_scale is not None:
+            scale = self._ref_scale * self.CONFIDENCE_NOISE
+        else:
+            scale = np.maximum(np.abs(features), 1e-6) * self.CONFIDENCE_NOISE
+        perturbed = features[None, :, :] + self._noise[:, None, :] * scale
+        return perturbed.reshape(-1, f)
+
+    def _calculate_confidence(self, raw: np.ndarray, features: np.ndarray,
+                              outputs: Dict[str, np.ndarray],
+                              samples: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
         """
-        Calculate confidence score (0.0 - 1.0) for the prediction.
-        Default implementation uses a heuristic based on data completeness.
+        Confidence (0.4 - 0.98) per target and row, from how stable the
+        prediction is when inputs move by a fraction of their usual spread:
+        agreement rate for labels, 1 / (1 + coefficient of variation) for
+        numeric targets. Scaled down for rows with missing inputs.
+        `samples` are the predictions for _perturb(features).
         """
-        # Placeholder: Confidence based on how many features are non-null
-        completeness = features.notnull().mean().mean()
-        base_confidence = 0.7 + (completeness * 0.2) # 0.7 to 0.9 range
-        
-        # Add some random variance for "realism" in the demo if no real model
-        return {k: min(0.98, max(0.4, base_confidence)) for k in predictions.keys()}
+        n = len(features)
+        completeness = 1.0 - np.isnan(raw).mean(axis=1)
 
-    def _explain_prediction(self, features: pd.DataFrame) -> Dict[str, float]:
+        confidence = {}
+        for target, point in outputs.items():
+            draws = samples[target].reshape(self.CONFIDENCE_DRAWS, n)
+            if target in self.LABELS:
+                threshold = self.LABELS[target][0]
+                stability = ((draws > threshold) == (point > threshold)).mean(axis=0)
+            else:
+                spread = draws.std(axis=0) / np.maximum(np.abs(point), 1e-9)
+                stability = 1.0 / (1.0 + spread)
+            confidence[target] = np.clip(stability * (0.5 + 0.5 * completeness), 0.4, 0.98)
+        return confidence
+
+    def _explain_prediction(self, attribution: Dict[str, Any], row: int = 0) -> Dict[str, float]:
         """
-        Return feature importance weights for the prediction.
+        Return feature importance weights for the prediction: each feature's
+        share of the row's absolute attributions, or the global importances
+        when the row was over the attribution budget or nothing moved it.
         """
-        # Placeholder: Return random weights for demo purposes if no SHAP
-        # Subclasses should override this with real SHAP values
-        return {col: np.random.uniform(0.1, 0.9) for col in features.columns[:5]}
+        weights = np.abs(attribution["values"][row])
+        total = weights.sum()
+        if not total > 0:
+            return dict(sorted(self.feature_importance.items(), key=lambda kv: kv[1], reverse=True))
+        order = np.argsort(-weights, kind="stable")
+        return {self.feature_names[j]: round(float(weights[j] / total), 4) for j in order}
+
+    def _attribution_detail(self, attribution: Dict[str, Any], row: int = 0) -> Dict[str, Any]:
+        """Signed attributions of the primary target for one row."""
+        if attribution["method"][row] is None:
+            return None
+        values = attribution["values"][row]
+        # Features the target ignores come out as float noise around zero
+        tolerance = np.abs(values).max() * 1e-9
+        return {
+            'target': self.primary_target,
+            'base_value': float(f"{attribution['base'][row]:.6g}"),
+            'values': {
+                name: float(f"{v:.6g}") if abs(v) > tolerance else 0.0
+                for name, v in zip(self.feature_names, values)
+            },
+            'method': attribution["method"][row]
+        }
+
+    def _claim_pnl_key(self, pnl_key) -> bool:
+        """True when no trade has been recorded for `pnl_key` yet (always for None)."""
+        if pnl_key is None:
+            return True
+        with self._pnl_lock:
+            if pnl_key == self._pnl_key:
+                return False
+            self._pnl_key = pnl_key
+            return True
 
     def _log_pnl_impact(self, predictions: Dict, confidence: Dict):
         """
@@ -106,7 +403,7 @@ class BasePredictor:
         primary_target = list(predictions.keys())[0]
         pred_value = predictions[primary_target]
         conf_score = confidence.get(primary_target, 0.5)
-        
+
         # Log it
         self.pnl_tracker.record_prediction(
             prediction_id=f"{self.vertical}_{datetime.now().timestamp()}",
@@ -0,0 +1,143 @@
+import concurrent.futures
+import logging
+import os
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+# Threads shared by every predictor's models
+MODEL_WORKERS = int(os.getenv("MODEL_WORKERS", "8"))
+# Default per-target budget for a request's model calls; past it the heuristic answers
+MODEL_TIMEOUT = float(os.getenv("MODEL_TIMEOUT_MS", "200")) / 1000
+
+
+class EnsembleRunner:
+    """
+    Runs every model of a prediction at once on a shared thread pool, so a
+    request costs the slowest model rather than the sum of them.
+
+    Each target's value is the mean of its members that answered within the
+    target's timeout; when none did (timed out, raised, or still busy with a
+    previous call that timed out), the target falls back to the predictor's
+    heuristic output. Timed-out calls cannot be interrupted, so a member is
+    not called again until its last call has returned, which keeps one slow
+    model from filling the pool. Requests skip a busy member; callers
+    without a timeout (batches, backtests) wait for it instead, so their
+    output never depends on what else is running.
+    """
+
+    def __init__(self, workers=None):
+        self.workers = workers or MODEL_WORKERS
+        self._pool = None
+        self._lock = threading.Lock()
+        self._busy = set()
+        # Notified whenever a member call returns
+        self._idle = threading.Condition(self._lock)
+
+    def _executor(self):
+        with self._lock:
+            if self._pool is None:
+                self._pool = concurrent.futures.ThreadPoolExecutor(
+                    max_workers=self.workers, thread_name_prefix="model"
+                )
+            return self._pool
+
+    def _call(self, key, model, X):
+        started = time.perf_counter()
+        try:
+            values = np.asarray(model.predict(X), dtype=np.float64).reshape(-1)
+            if len(values) != len(X):
+                raise ValueError(f"returned {len(values)} values for {len(X)} rows")
+            return values, time.perf_counter()
+        finally:
+            metrics.MODEL_SECONDS.observe(time.perf_counter() - started, vertical=key[0], target=key[1])
+            with self._lock:
+                self._busy.discard(key)
+                self._idle.notify_all()
+
+    def _call_when_idle(self, key, model, X):
+        """_call once the member's previous call has returned (for callers without a deadline)."""
+        with self._lock:
+            while key in self._busy:
+                self._idle.wait()
+            self._busy.add(key)
+        return self._call(key, model, X)
+
+    def run(self, vertical: str, members: Dict[str, List[Tuple[str, Any]]], X: np.ndarray,
+            fallback: Dict[str, np.ndarray], timeouts: Dict[str, Optional[float]]
+            ) -> Tuple[Dict[str, np.ndarray], Dict[str, Dict[str, Any]]]:
+        """
+        Predict every target in `fallback` for the rows of X. `members` maps a
+        target to its (name, model) pairs; `timeouts` gives each target's budget
+        in seconds (None waits for the models). Returns (outputs, report), the
+        report saying per target which members answered and why any fell back.
+        """
+        X = X.view()
+        X.setflags(write=False)  # shared by every member
+        pool = self._executor()
+        started = time.perf_counter()
+        futures = {}
+        report = {}
+        for target, models in members.items():
+            if target not in fallback:
+                continue
+            report[target] = {"members": [], "fallback": None}
+            for name, model in models:
+                key = (vertical, target, name)
+                if timeouts.get(target) is None:
+                    futures[pool.submit(self._call_when_idle, key, model, X)] = (target, name)
+                    continue
+                with self._lock:
+                    if key in self._busy:
+                        report[target].setdefault("busy", []).append(name)
+                        continue
+                    self._busy.add(key)
+                futures[pool.submit(self._call, key, model, X)] = (target, name)
+
+        deadlines = {t: None if timeouts.get(t) is None else started + timeouts[t] for t in report}
+        latest = None if None in deadlines.values() else max(deadlines.values(), default=started)
+        concurrent.futures.wait(futures, timeout=None if latest is None else max(0.0, latest - time.perf_counter()))
+
+        answers = {target: [] for target in report}
+        for future, (target, name) in futures.items():
+            if not future.done():
+                report[target].setdefault("timed_out", []).append(name)
+                continue
+            try:
+                values, finished = future.result()
+            except Exception as e:
+                logger.warning(f"{vertical} model {target}/{name} failed: {e}")
+                report[target].setdefault("failed", []).append(name)
+                continue
+            deadline = deadlines[target]
+            if deadline is not None and finished > deadline:
+                report[target].setdefault("timed_out", []).append(name)
+                continue
+            answers[target].append(values)
+            report[target]["members"].append(name)
+
+        outputs = dict(fallback)
+        for target, values in answers.items():
+            if values:
+                outputs[target] = np.mean(values, axis=0)
+                continue
+            reason = ("timeout" if report[target].get("timed_out") else
+                      "error" if report[target].get("failed") else "busy")
+            report[target]["fallback"] = reason
+            metrics.MODEL_FALLBACKS.inc(vertical=vertical, target=target, reason=reason)
+        return outputs, report
+
+    def shutdown(self):
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+
+ENSEMBLE = EnsembleRunner()
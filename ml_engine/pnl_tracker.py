@@ -22,20 +22,25 @@ class PnLTracker:
         self.total_pnl = 0.0
         self.roi_pct = 0.0
         
-    def calculate_position_size(self, confidence: float) -> float:
+    def calculate_position_size(self, confidence, capital=None):
         """
         Kelly Criterion-inspired position sizing based on confidence.
         Higher confidence = larger bet size.
+
+        Accepts a scalar or an array of confidences (and optionally of
+        capital), so backtests can size every position in one call.
         """
-        if confidence < 0.5:
-            return 0.0
-            
+        if capital is None:
+            capital = self.current_capital
+
         # Simple scaling: 50% conf = 0% size, 100% conf = 10% of capital
         # This is a conservative simulation
         max_position_pct = 0.10
-        scale_factor = (confidence - 0.5) * 2  # 0.0 to 1.0
-        
-        return self.current_capital * max_position_pct * scale_factor
+        confidence = np.asarray(confidence, dtype=float)
+        scale_factor = np.clip((confidence - 0.5) * 2, 0.0, 1.0)  # 0.0 to 1.0, nothing below 50%
+
+        size = capital * max_position_pct * scale_factor
+        return float(size) if np.ndim(size) == 0 else size
 
     def record_prediction(self, prediction_id: str, vertical: str, target: str, 
                          predicted_value: any, confidence: float, 
@@ -1,5 +1,4 @@
-from typing import Dict, Any
-import pandas as pd
+from typing import Dict
 import numpy as np
 from .base_predictor import BasePredictor
 
@@ -10,33 +9,34 @@ class FintechPredictor(BasePredictor):
     2. Funding amount
     3. Round series
     """
-    def _preprocess(self, data: Dict) -> pd.DataFrame:
-        # Extract the 32 features defined in the prompt
-        features = {
-            'download_velocity_30d': data.get('download_velocity', 0),
-            'hiring_spike': 1 if data.get('hiring_spike') == 'Active' else 0,
-            'review_sentiment': data.get('review_sentiment', 0),
-            # Add placeholders for other features to match model expectations
-            'competitor_funding_gap': np.random.randint(0, 180), # Mock for now
-            'burn_rate_proxy': np.random.uniform(0.5, 5.0)      # Mock for now
-        }
-        return pd.DataFrame([features])
+    FEATURES = (
+        ('download_velocity_30d', 'download_velocity'),
+        ('hiring_spike', 'hiring_spike'),
+        ('review_sentiment', 'review_sentiment'),
+        ('competitor_funding_gap', 'competitor_funding_gap'),
+        ('burn_rate_proxy', 'burn_rate_proxy')
+    )
+    CATEGORY_CODES = {'hiring_spike': {'Active': 1.0}}
+    LABELS = {'round_series': (20000000, 'Series A', 'Series B')}
+    ROUNDING = {'days_to_funding': 0, 'funding_amount': -5}  # Round to nearest 100k
+    # A round coming sooner should show up as institutional accumulation
+    BACKTEST_OUTCOME = ('smart_money_score', -1)
 
-    def _run_inference(self, features: pd.DataFrame) -> Dict[str, Any]:
+    def _run_inference(self, features: np.ndarray) -> Dict[str, np.ndarray]:
         # Placeholder logic until real models are trained
         # In reality, self.models['days_to_funding'].predict(features)
-        
+
         # Heuristic-based "prediction" for demo
-        hiring_strength = features['hiring_spike'].iloc[0]
-        downloads = features['download_velocity_30d'].iloc[0]
-        
-        days_to_funding = max(14, 120 - (downloads * 0.5) - (hiring_strength * 30))
+        hiring_strength = self.column(features, 'hiring_spike')
+        downloads = self.column(features, 'download_velocity_30d')
+
+        days_to_funding = np.maximum(14, 120 - (downloads * 0.5) - (hiring_strength * 30))
         funding_amount = (downloads * 10000) + (hiring_strength * 5000000)
-        
+
         return {
-            'days_to_funding': int(days_to_funding),
-            'funding_amount': round(funding_amount, -5), # Round to nearest 100k
-            'round_series': 'Series B' if funding_amount > 20000000 else 'Series A'
+            'days_to_funding': days_to_funding,
+            'funding_amount': funding_amount,
+            'round_series': funding_amount
         }
 
 class AiTalentPredictor(BasePredictor):
@@ -46,25 +46,25 @@ class AiTalentPredictor(BasePredictor):
     2. Performance leap magnitude
     3. Commercialization timeline
     """
-    def _preprocess(self, data: Dict) -> pd.DataFrame:
-        features = {
-            'github_stars_7d': data.get('github_stars_7d', 0),
-            'arxiv_papers': data.get('arxiv_papers', 0),
-            'talent_score': data.get('talent_score', 0)
-        }
-        return pd.DataFrame([features])
-
-    def _run_inference(self, features: pd.DataFrame) -> Dict[str, Any]:
-        stars = features['github_stars_7d'].iloc[0]
-        papers = features['arxiv_papers'].iloc[0]
-        
-        days_to_release = max(30, 180 - (stars * 0.1) - (papers * 2))
-        perf_leap = min(50, (stars * 0.05) + (papers * 1.5))
-        
+    FEATURES = (
+        ('github_stars_7d', 'github_stars_7d'),
+        ('arxiv_papers', 'arxiv_papers'),
+        ('talent_score', 'talent_score')
+    )
+    ROUNDING = {'next_release_days': 0, 'performance_leap_pct': 1, 'commercialization_months': 0}
+    BACKTEST_OUTCOME = ('technical_momentum', -1)
+
+    def _run_inference(self, features: np.ndarray) -> Dict[str, np.ndarray]:
+        stars = self.column(features, 'github_stars_7d')
+        papers = self.column(features, 'arxiv_papers')
+
+        days_to_release = np.maximum(30, 180 - (stars * 0.1) - (papers * 2))
+        perf_leap = np.minimum(50, (stars * 0.05) + (papers * 1.5))
+
         return {
-            'next_release_days': int(days_to_release),
-            'performance_leap_pct': round(perf_leap, 1),
-            'commercialization_months': int(days_to_release / 30) + 2
+            'next_release_days': days_to_release,
+            'performance_leap_pct': perf_leap,
+            'commercialization_months': np.floor(days_to_release / 30) + 2
         }
 
 class EsgPredictor(BasePredictor):
@@ -74,45 +74,73 @@ class EsgPredictor(BasePredictor):
     2. Correction timing
     3. Fine probability
     """
-    def _preprocess(self, data: Dict) -> pd.DataFrame:
-        features = {
-            'esg_claims': data.get('esg_claims', 0),
-            'verifiable_actions': data.get('verifiable_actions', 0),
-            'greenwashing_index': data.get('greenwashing_index', 0)
-        }
-        return pd.DataFrame([features])
-
-    def _run_inference(self, features: pd.DataFrame) -> Dict[str, Any]:
-        claims = features['esg_claims'].iloc[0]
-        verified = features['verifiable_actions'].iloc[0]
-        
-        gap = max(0, claims - verified)
-        risk_score = min(100, gap * 5)
-        
+    FEATURES = (
+        ('esg_claims', 'esg_claims'),
+        ('verifiable_actions', 'verifiable_actions'),
+        ('greenwashing_index', 'greenwashing_index')
+    )
+    LABELS = {'fine_probability': (60, 'Low', 'High')}
+    ROUNDING = {'greenwashing_score': 0, 'correction_days': 0}
+    BACKTEST_OUTCOME = ('greenwashing_index', 1)
+
+    def _run_inference(self, features: np.ndarray) -> Dict[str, np.ndarray]:
+        claims = self.column(features, 'esg_claims')
+        verified = self.column(features, 'verifiable_actions')
+
+        gap = np.maximum(0, claims - verified)
+        risk_score = np.minimum(100, gap * 5)
+
         return {
-            'greenwashing_score': int(risk_score),
-            'correction_days': int(max(7, 90 - risk_score)),
-            'fine_probability': 'High' if risk_score > 60 else 'Low'
+            'greenwashing_score': risk_score,
+            'correction_days': np.maximum(7, 90 - risk_score),
+            'fine_probability': risk_score
         }
 
 class RegulatoryPredictor(BasePredictor):
-    def _preprocess(self, data: Dict) -> pd.DataFrame:
-        return pd.DataFrame([data]) # Pass through for now
+    """
+    Predicts:
+    1. Enforcement probability
+    2. Expected fine
+    3. Time to enforcement action
+    """
+    FEATURES = (
+        ('enforcement_probability_pct', 'enforcement_probability_pct'),
+        ('fine_impact_usd', 'fine_impact_usd'),
+        ('regulatory_foresight', 'regulatory_foresight'),
+        ('action_timeline_days', 'action_timeline_days')
+    )
+    ROUNDING = {'enforcement_probability': 2, 'estimated_fine': -5, 'action_timeline_days': 0}
+    BACKTEST_OUTCOME = ('enforcement_probability_pct', 1)
 
-    def _run_inference(self, features: pd.DataFrame) -> Dict[str, Any]:
+    def _run_inference(self, features: np.ndarray) -> Dict[str, np.ndarray]:
+        n = len(features)
         return {
-            'enforcement_probability': 0.75,
-            'estimated_fine': 5000000,
-            'action_timeline_days': 45
+            'enforcement_probability': np.full(n, 0.75),
+            'estimated_fine': np.full(n, 5000000.0),
+            'action_timeline_days': np.full(n, 45.0)
         }
 
 class SupplyChainPredictor(BasePredictor):
-    def _preprocess(self, data: Dict) -> pd.DataFrame:
-        return pd.DataFrame([data])
+    """
+    Predicts:
+    1. Disruption risk score
+    2. Recovery time
+    3. Revenue impact
+    """
+    FEATURES = (
+        ('disruption_risk', 'disruption_risk'),
+        ('resilience_score', 'resilience_score'),
+        ('recovery_days', 'recovery_days'),
+        ('cost_inflation', 'cost_inflation'),
+        ('impact_revenue_pct', 'impact_revenue_pct')
+    )
+    ROUNDING = {'disruption_risk_score': 0, 'recovery_time_days': 0, 'impact_revenue_pct': 1}
+    BACKTEST_OUTCOME = ('disruption_probability', 1)
 
-    def _run_inference(self, features: pd.DataFrame) -> Dict[str, Any]:
+    def _run_inference(self, features: np.ndarray) -> Dict[str, np.ndarray]:
+        n = len(features)
         return {
-            'disruption_risk_score': 65,
-            'recovery_time_days': 14,
-            'impact_revenue_pct': 3.5
+            'disruption_risk_score': np.full(n, 65.0),
+            'recovery_time_days': np.full(n, 14.0),
+            'impact_revenue_pct': np.full(n, 3.5)
         }
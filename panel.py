@@ -0,0 +1,265 @@
+import json
+import logging
+import os
+import threading
+
+import metrics
+from partitions import VERTICAL_BASENAMES, next_generation, read_index
+from schemas import SCHEMAS
+
+logger = logging.getLogger(__name__)
+
+KEY_COLUMNS = ("date", "company")
+# Bump when the stored layout changes, so every month is rebuilt
+PANEL_FORMAT = 1
+
+
+def panel_columns(verticals=None):
+    """Value columns of the panel, `{vertical}.{column}` in schema order."""
+    return [
+        f"{vertical}.{col}"
+        for vertical in (verticals or VERTICAL_BASENAMES)
+        for col in SCHEMAS[vertical] if col not in KEY_COLUMNS
+    ]
+
+
+def _stored_dtype(dtype):
+    # Missing cells are NaN, so integers widen to a float that holds them exactly
+    if dtype in ("int16", "float32"):
+        return "float32"
+    return "float64"
+
+
+class PanelStore:
+    """
+    Cross-vertical panel: one row per (date, company) seen in any vertical,
+    with every vertical's columns side by side as `{vertical}.{column}`
+    (empty where the company is not covered by that vertical).
+
+    Stored per calendar month, column by column:
+        {data_dir}/panel/year=YYYY/month=MM.npz
+        {data_dir}/panel/_index.json
+
+    Each .npz holds one array per column (categoricals as int16 codes plus a
+    `{column}.categories` array), so a query reads only the columns it asks
+    for. The index records, per month, the content hash of each vertical's
+    source partition; update() rebuilds only months whose sources changed.
+    """
+
+    def __init__(self, data_dir=None):
+        self.data_dir = data_dir or os.getenv("DATA_DIR", "data")
+        self.root = os.path.join(self.data_dir, "panel")
+        self._lock = threading.Lock()
+        self._index = None
+
+    # --- Index ---
+
+    def _index_path(self):
+        return os.path.join(self.root, "_index.json")
+
+    def _month_path(self, year, month):
+        return os.path.join(self.root, f"year={int(year):04d}", f"month={int(month):02d}.npz")
+
+    def _load_index(self):
+        """(generation, index). Compared by content (see read_index) so the API's instance sees months the pipeline rebuilt."""
+        loaded = read_index(self._index_path(), self._index)
+        if loaded is None:
+            return 0, {"format": PANEL_FORMAT, "months": {}}
+        self._index = loaded
+        return loaded[2], loaded[1]
+
+    def _save_index(self, index):
+        os.makedirs(self.root, exist_ok=True)
+        index = dict(index, generation=next_generation(self._load_index()[0]))
+        tmp = self._index_path() + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(index, f, indent=2, sort_keys=True)
+        os.replace(tmp, self._index_path())
+
+    def version(self):
+        """
+        Index generation (see partitions.next_generation); changes whenever a
+        month is rebuilt or dropped. 0 before the first build.
+        """
+        return self._load_index()[0]
+
+    def months(self):
+        """Month descriptors (oldest first)."""
+        return [info for _, info in sorted(self._load_index()[1]["months"].items())]
+
+    def fingerprint(self):
+        """{month: source hashes} of the built panel, from the index alone."""
+        return {key: info["sources"] for key, info in self._load_index()[1]["months"].items()}
+
+    # --- Build ---
+
+    def update(self, store):
+        """
+        Bring the panel in line with the partition store: rebuild months whose
+        source partitions changed (or are new), drop months no source has any
+        more. Returns {"rebuilt": [...], "removed": [...]}.
+        """
+        with self._lock:
+            index = dict(self._load_index()[1])
+            if index.get("format") != PANEL_FORMAT:
+                index = {"format": PANEL_FORMAT, "months": {}}
+            months = dict(index["months"])
+
+            sources = {}
+            for vertical in VERTICAL_BASENAMES:
+                for info in store.partitions(vertical):
+                    key = f"{info['year']:04d}-{info['month']:02d}"
+                    sources.setdefault(key, {})[vertical] = info["hash"]
+
+            rebuilt = []
+            for key, hashes in sorted(sources.items()):
+                current = months.get(key)
+                year, month = (int(part) for part in key.split("-"))
+                path = self._month_path(year, month)
+                if current and current["sources"] == hashes and os.path.exists(path):
+                    continue
+                with metrics.PIPELINE_STAGE_SECONDS.time(vertical="panel", stage="join"):
+                    months[key] = self._build_month(store, year, month, hashes, path)
+                rebuilt.append(key)
+
+            removed = sorted(set(months) - set(sources))
+            for key in removed:
+                info = months.pop(key)
+                path = os.path.join(self.data_dir, info["path"])
+                if os.path.exists(path):
+                    os.remove(path)
+
+            if rebuilt or removed or index["months"] != months:
+                self._save_index({"format": PANEL_FORMAT, "months": months})
+        if rebuilt or removed:
+            logger.info(f"Panel: rebuilt {len(rebuilt)} months, removed {len(removed)}")
+        return {"rebuilt": rebuilt, "removed": removed}
+
+    def _build_month(self, store, year, month, hashes, path):
+        """
+        Sort-merge join of one month across verticals. Each side is sorted on
+        an integer (day, company) key; the union of keys is the panel's row
+        order, and each vertical's rows land at their searchsorted positions.
+        """
+        import numpy as np
+        import pandas as pd
+
+        frames = {v: store.load(v, year=year, month=month) for v in hashes}
+        frames = {v: df for v, df in frames.items() if not df.empty}
+        companies = np.array(sorted({str(c) for df in frames.values() for c in df["company"].unique()}))
+
+        keys = {}
+        for vertical, df in frames.items():
+            day = df["date"].to_numpy(dtype="datetime64[D]").astype(np.int64)
+            code = np.searchsorted(companies, df["company"].astype(str).to_numpy())
+            key = day * len(companies) + code
+            order = np.argsort(key, kind="stable")
+            frames[vertical] = df.iloc[order]
+            keys[vertical] = key[order]
+        union = np.unique(np.concatenate(list(keys.values())))
+        rows = len(union)
+
+        arrays = {
+            "date": (union // len(companies)).astype("datetime64[D]"),
+            "company": (union % len(companies)).astype(np.int16),
+            "company.categories": companies
+        }
+        for vertical in VERTICAL_BASENAMES:
+            df = frames.get(vertical)
+            pos = np.searchsorted(union, keys[vertical]) if df is not None else None
+            for col, dtype in SCHEMAS[vertical].items():
+                if col in KEY_COLUMNS:
+                    continue
+                name = f"{vertical}.{col}"
+                if dtype == "category":
+                    values = df[col].astype(str).to_numpy(dtype=str) if df is not None else np.array([], dtype=str)
+                    categories, codes = np.unique(values, return_inverse=True)
+                    column = np.full(rows, -1, dtype=np.int16)
+                    if df is not None:
+                        column[pos] = codes
+                    arrays[name] = column
+                    arrays[f"{name}.categories"] = categories
+                else:
+                    column = np.full(rows, np.nan, dtype=_stored_dtype(dtype))
+                    if df is not None:
+                        column[pos] = pd.to_numeric(df[col], errors="coerce").to_numpy(dtype=column.dtype)
+                    arrays[name] = column
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = path + ".tmp"
+        with open(tmp, "wb") as f:
+            np.savez(f, **arrays)
+        os.replace(tmp, path)
+        day_range = arrays["date"][[0, -1]].astype(str)
+        return {
+            "year": year,
+            "month": month,
+            "path": os.path.relpath(path, self.data_dir),
+            "rows": rows,
+            "min_date": str(day_range[0]),
+            "max_date": str(day_range[1]),
+            "bytes": os.path.getsize(path),
+            "sources": hashes
+        }
+
+    # --- Reads ---
+
+    def load(self, start=None, end=None, companies=None, columns=None):
+        """
+        Panel rows between `start` and `end` (inclusive YYYY-MM-DD), optionally
+        for some companies, with the requested value columns only (all when
+        None). Only the months overlapping the range are opened, and only the
+        requested columns are read from them.
+        """
+        import numpy as np
+        import pandas as pd
+
+        columns = list(columns) if columns else panel_columns()
+        parts = self.months()
+        if start:
+            parts = [p for p in parts if p["max_date"] >= start]
+        if end:
+            parts = [p for p in parts if p["min_date"] <= end]
+
+        frames = []
+        categorical = {"company"}
+        for info in parts:
+            with np.load(os.path.join(self.data_dir, info["path"])) as npz:
+                data = {"date": pd.to_datetime(npz["date"]),
+                        "company": pd.Categorical.from_codes(npz["company"], npz["company.categories"])}
+                for name in columns:
+                    if f"{name}.categories" in npz.files:
+                        categorical.add(name)
+                        data[name] = pd.Categorical.from_codes(npz[name], npz[f"{name}.categories"])
+                    else:
+                        data[name] = npz[name]
+            df = pd.DataFrame(data)
+            if start:
+                df = df[df["date"] >= pd.Timestamp(start)]
+            if end:
+                df = df[df["date"] <= pd.Timestamp(end)]
+            if companies:
+                df = df[df["company"].isin(companies)]
+            frames.append(df)
+        if not frames:
+            return pd.DataFrame(columns=list(KEY_COLUMNS) + columns)
+        # Categories differ between months, so strings are re-unified after concat
+        df = pd.concat(frames, ignore_index=True)
+        return df.astype({col: "category" for col in categorical})
+
+
+def _schema_dtype(name):
+    vertical, _, col = name.partition(".")
+    return SCHEMAS.get(vertical, {}).get(col, "")
+
+
+def to_panel_records(df):
+    """JSON-friendly records (empty cells are None, see to_records) with integer columns as ints again."""
+    from schemas import to_records
+    int_cols = [c for c in df.columns if _schema_dtype(c).startswith("int")]
+    records = to_records(df)
+    for rec in records:
+        for col in int_cols:
+            if rec[col] is not None:
+                rec[col] = int(rec[col])
+    return records
@@ -0,0 +1,388 @@
+import glob
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+
+import metrics
+from schemas import apply_schema
+
+logger = logging.getLogger(__name__)
+
+# Vertical slug -> base filename used for exports and legacy files
+VERTICAL_BASENAMES = {
+    "fintech": "fintech_growth_digest",
+    "ai_talent": "ai_talent_heatmap",
+    "esg": "esg_sentiment_tracker",
+    "regulatory": "regulatory_risk_index",
+    "supply_chain": "supply_chain_risk"
+}
+
+
+def _period_key(year, month):
+    return f"{int(year):04d}-{int(month):02d}"
+
+
+def _quarter(month):
+    return (int(month) - 1) // 3 + 1
+
+
+def next_generation(previous):
+    """
+    Generation number for an index about to be saved: the current time in
+    ns, but always above `previous`, so two saves within one clock tick (or
+    mtime granularity) still get different generations. Doubles as the
+    index's last-modified time.
+    """
+    return max(time.time_ns(), (previous or 0) + 1)
+
+
+def read_index(path, cached):
+    """
+    (raw bytes, parsed index, generation) of the JSON index at `path`, or
+    None if it does not exist. The file is re-read on every call (it is a
+    few KB) and only parsed when its bytes differ from `cached`, a previous
+    return value, so a reader never keys on a stale mtime. Indexes saved
+    before generations were recorded fall back to their mtime.
+    """
+    try:
+        with open(path, "rb") as f:
+            raw = f.read()
+            if cached is not None and cached[0] == raw:
+                return cached
+            mtime = os.fstat(f.fileno()).st_mtime_ns
+    except FileNotFoundError:
+        return None
+    index = json.loads(raw)
+    return raw, index, index.get("generation") or mtime
+
+
+class PartitionStore:
+    """
+    Time-partitioned master store for the generated datasets.
+
+    Layout (one CSV per calendar month):
+        {data_dir}/store/{vertical}/year=YYYY/quarter=Q/month=MM.csv
+        {data_dir}/store/{vertical}/_index.json
+
+    The index records rows, date range, size and content hash per partition,
+    so discovery, row counts and "is today already present?" checks never
+    touch the data files. Reads load only the partitions overlapping the
+    requested period, keeping request cost flat as history grows.
+
+    Partitions are parsed into compact typed frames (see schemas.py) and the
+    most recently used ones are kept in memory, keyed by content hash, so
+    hot reads such as the API's tail() skip parsing entirely.
+    """
+
+    def __init__(self, data_dir=None, retention_years=None, cache_partitions=64):
+        self.data_dir = data_dir or os.getenv("DATA_DIR", "data")
+        self.root = os.path.join(self.data_dir, "store")
+        if retention_years is None and os.getenv("RETENTION_YEARS"):
+            retention_years = int(os.getenv("RETENTION_YEARS"))
+        self.retention_years = retention_years
+        self._locks = {}
+        self._locks_guard = threading.Lock()
+        self._indexes = {}
+        self._frames = OrderedDict()
+        self._frames_lock = threading.Lock()
+        self.cache_partitions = cache_partitions
+
+    # --- Index / discovery ---
+
+    def _vertical_dir(self, vertical):
+        return os.path.join(self.root, vertical)
+
+    def _index_path(self, vertical):
+        return os.path.join(self._vertical_dir(vertical), "_index.json")
+
+    def _partition_path(self, vertical, year, month):
+        return os.path.join(
+            self._vertical_dir(vertical),
+            f"year={int(year):04d}", f"quarter={_quarter(month)}", f"month={int(month):02d}.csv"
+        )
+
+    def _vertical_lock(self, vertical):
+        # Writers of different verticals (e.g. concurrent pipeline stages) don't contend
+        with self._locks_guard:
+            return self._locks.setdefault(vertical, threading.Lock())
+
+    def _load_index(self, vertical):
+        # Compared by content (see read_index) so a store instance in the API
+        # process picks up partitions written by the pipeline's own instance.
+        cached = self._indexes.get(vertical)
+        loaded = read_index(self._index_path(vertical), cached if cached and cached[0] is not None else None)
+        if loaded is None:
+            if cached is not None and cached[0] is None:
+                return cached[1]
+            loaded = (None, self._discover(vertical), 0)
+        self._indexes[vertical] = loaded
+        return loaded[1]
+
+    def _save_index(self, vertical, index):
+        os.makedirs(self._vertical_dir(vertical), exist_ok=True)
+        previous = self._indexes.get(vertical)
+        index = dict(index, generation=next_generation(max(index.get("generation") or 0,
+                                                           previous[2] if previous else 0)))
+        raw = json.dumps(index, indent=2, sort_keys=True).encode()
+        tmp = self._index_path(vertical) + ".tmp"
+        with open(tmp, "wb") as f:
+            f.write(raw)
+        os.replace(tmp, self._index_path(vertical))
+        self._indexes[vertical] = (raw, index, index["generation"])
+
+    def _discover(self, vertical):
+        """Rebuild the index by scanning partition files (used when _index.json is missing)."""
+        import pandas as pd
+        partitions = {}
+        pattern = os.path.join(self._vertical_dir(vertical), "year=*", "quarter=*", "month=*.csv")
+        for path in sorted(glob.glob(pattern)):
+            parts = path.split(os.sep)
+            year = int(parts[-3].split("=")[1])
+            month = int(parts[-1].split("=")[1].replace(".csv", ""))
+            df = apply_schema(pd.read_csv(path, float_precision="round_trip"), vertical)
+            partitions[_period_key(year, month)] = self._describe(df, path, year, month)
+        if partitions:
+            logger.info(f"Discovered {len(partitions)} partitions for {vertical}")
+        return {"vertical": vertical, "partitions": partitions}
+
+    def _describe(self, df, path, year, month):
+        import pandas as pd
+        from seeding import content_hash
+        dates = pd.to_datetime(df["date"])
+        return {
+            "year": int(year),
+            "quarter": _quarter(month),
+            "month": int(month),
+            "path": os.path.relpath(path, self.data_dir),
+            "rows": int(len(df)),
+            "min_date": dates.min().strftime("%Y-%m-%d"),
+            "max_date": dates.max().strftime("%Y-%m-%d"),
+            "bytes": os.path.getsize(path),
+            "hash": content_hash(df)
+        }
+
+    def partitions(self, vertical, year=None, quarter=None, month=None):
+        """Partition descriptors (oldest first), optionally filtered by period."""
+        selected = []
+        for key, info in sorted(self._load_index(vertical)["partitions"].items()):
+            if year is not None and info["year"] != int(year):
+                continue
+            if quarter is not None and info["quarter"] != int(quarter):
+                continue
+            if month is not None and info["month"] != int(month):
+                continue
+            selected.append(info)
+        return selected
+
+    def periods(self, vertical):
+        """Available years, (year, quarter) and (year, month) periods."""
+        parts = self.partitions(vertical)
+        return {
+            "years": sorted({p["year"] for p in parts}),
+            "quarters": sorted({(p["year"], p["quarter"]) for p in parts}),
+            "months": sorted({(p["year"], p["month"]) for p in parts})
+        }
+
+    def total_rows(self, vertical):
+        return sum(p["rows"] for p in self.partitions(vertical))
+
+    def max_date(self, vertical):
+        parts = self.partitions(vertical)
+        return max(p["max_date"] for p in parts) if parts else None
+
+    def version(self, vertical):
+        """
+        Data generation of a vertical: the index's generation number (see
+        next_generation), which changes whenever a partition is written or
+        dropped, and is also its last-modified time in ns. 0 when the store
+        is empty.
+        """
+        self._load_index(vertical)
+        return self._indexes[vertical][2]
+
+    def fingerprint(self, vertical):
+        """{period: content hash} of every partition, from the index alone."""
+        return {key: info["hash"] for key, info in self._load_index(vertical)["partitions"].items()}
+
+    def has_date(self, vertical, date_obj):
+        """Whether rows for `date_obj` exist, answered from the index alone."""
+        day = date_obj.strftime("%Y-%m-%d")
+        info = self._load_index(vertical)["partitions"].get(_period_key(date_obj.year, date_obj.month))
+        return info is not None and info["min_date"] <= day <= info["max_date"]
+
+    def universe(self, vertical):
+        """Settings the stored history was generated with (see set_universe), or None if not recorded."""
+        return self._load_index(vertical).get("universe")
+
+    def set_universe(self, vertical, universe):
+        """Record the settings (e.g. seed, companies, years) the vertical's history was generated with."""
+        with self._vertical_lock(vertical):
+            index = self._load_index(vertical)
+            if index.get("universe") != universe:
+                self._save_index(vertical, dict(index, universe=universe))
+
+    # --- Reads ---
+
+    def _read_partition(self, vertical, info):
+        """Typed frame for one partition, served from the LRU when its hash is unchanged."""
+        key = (info["path"], info["hash"])
+        with self._frames_lock:
+            df = self._frames.get(key)
+            if df is not None:
+                self._frames.move_to_end(key)
+        metrics.record_cache("partitions", hit=df is not None)
+        if df is not None:
+            return df
+
+        import pandas as pd
+        path = os.path.join(self.data_dir, info["path"])
+        with metrics.CSV_PARSE_SECONDS.time(source="partition"):
+            # Partitions are small, so inferring then downcasting once is
+            # cheaper than a per-column dtype map in the parser. Files
+            # written before typed schemas ("+123", "87%") parse the same way.
+            df = apply_schema(pd.read_csv(path, float_precision="round_trip"), vertical)
+
+        self._cache_frame(key, df)
+        return df
+
+    def _cache_frame(self, key, df):
+        with self._frames_lock:
+            self._frames[key] = df
+            self._frames.move_to_end(key)
+            while len(self._frames) > self.cache_partitions:
+                self._frames.popitem(last=False)
+
+    def load(self, vertical, year=None, quarter=None, month=None, start=None, end=None):
+        """
+        Load only the partitions overlapping the requested period.
+        `start`/`end` (inclusive, datetime-like) further trim the rows.
+        """
+        import pandas as pd
+        parts = self.partitions(vertical, year=year, quarter=quarter, month=month)
+        if start is not None:
+            start = pd.Timestamp(start)
+            parts = [p for p in parts if p["max_date"] >= start.strftime("%Y-%m-%d")]
+        if end is not None:
+            end = pd.Timestamp(end)
+            parts = [p for p in parts if p["min_date"] <= end.strftime("%Y-%m-%d")]
+        if not parts:
+            return pd.DataFrame()
+
+        # Categories differ between months, so the schema is re-applied after concat
+        frames = [self._read_partition(vertical, p) for p in parts]
+        df = apply_schema(pd.concat(frames, ignore_index=True), vertical)
+        if start is not None:
+            df = df[df["date"] >= start.normalize()]
+        if end is not None:
+            df = df[df["date"] <= end]
+        return df.reset_index(drop=True)
+
+    def iter_frames(self, vertical, year=None, quarter=None, month=None):
+        """Typed frame of each partition in the period, oldest first, one at a time."""
+        for info in self.partitions(vertical, year=year, quarter=quarter, month=month):
+            yield self._read_partition(vertical, info)
+
+    def tail(self, vertical, n_rows):
+        """Last `n_rows` rows, reading partitions newest-first until enough are loaded."""
+        import pandas as pd
+        frames = []
+        remaining = n_rows
+        for info in reversed(self.partitions(vertical)):
+            frames.append(self._read_partition(vertical, info))
+            remaining -= info["rows"]
+            if remaining <= 0:
+                break
+        if not frames:
+            return pd.DataFrame()
+        if len(frames) == 1:
+            return frames[0].tail(n_rows).reset_index(drop=True)
+        df = pd.concat(frames[::-1], ignore_index=True).tail(n_rows).reset_index(drop=True)
+        return apply_schema(df, vertical)
+
+    # --- Writes ---
+
+    def upsert(self, vertical, df):
+        """
+        Merge `df` into the store. Only months present in `df` are read and
+        rewritten; rows for an existing (company, date) are replaced.
+        Returns the list of (year, month) partitions whose content changed.
+        """
+        import pandas as pd
+        from seeding import content_hash
+        if df.empty:
+            return []
+        df = apply_schema(df, vertical)
+        changed = []
+        with self._vertical_lock(vertical):
+            index = self._load_index(vertical)
+            for (year, month), month_df in df.groupby([df["date"].dt.year, df["date"].dt.month]):
+                key = _period_key(year, month)
+                existing = index["partitions"].get(key)
+                if existing is not None:
+                    merged = pd.concat([self._read_partition(vertical, existing), month_df], ignore_index=True)
+                    merged = merged.drop_duplicates(subset=["company", "date"], keep="last")
+                else:
+                    merged = month_df
+                merged = merged.sort_values(["date", "company"], kind="stable").reset_index(drop=True)
+                merged = apply_schema(merged, vertical)
+
+                digest = content_hash(merged)
+                if existing is not None and existing["hash"] == digest:
+                    continue
+
+                path = self._partition_path(vertical, year, month)
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                out = merged.copy()
+                out["date"] = out["date"].dt.strftime("%Y-%m-%d")
+                out.to_csv(path, index=False)
+                index["partitions"][key] = info = self._describe(merged, path, year, month)
+                self._cache_frame((info["path"], info["hash"]), merged)
+                changed.append((int(year), int(month)))
+            if changed:
+                self._save_index(vertical, index)
+        return changed
+
+    def clear(self, vertical):
+        """Delete every partition of the vertical. Returns the removed (year, month) periods."""
+        with self._vertical_lock(vertical):
+            index = self._load_index(vertical)
+            removed = []
+            for key in sorted(index["partitions"]):
+                info = index["partitions"][key]
+                path = os.path.join(self.data_dir, info["path"])
+                if os.path.exists(path):
+                    os.remove(path)
+                removed.append((info["year"], info["month"]))
+            self._save_index(vertical, {"vertical": vertical, "partitions": {}})
+        if removed:
+            logger.info(f"Cleared {len(removed)} partitions from {vertical}")
+        return removed
+
+    def apply_retention(self, vertical, now=None):
+        """
+        Drop partitions older than `retention_years` full years before `now`.
+        Returns the removed (year, month) periods.
+        """
+        if self.retention_years is None:
+            return []
+        now = now or datetime.now()
+        cutoff = _period_key(now.year - self.retention_years, 1)
+        removed = []
+        with self._vertical_lock(vertical):
+            index = self._load_index(vertical)
+            for key in sorted(index["partitions"]):
+                if key >= cutoff:
+                    break
+                info = index["partitions"].pop(key)
+                path = os.path.join(self.data_dir, info["path"])
+                if os.path.exists(path):
+                    os.remove(path)
+                removed.append((info["year"], info["month"]))
+            if removed:
+                self._save_index(vertical, index)
+                logger.info(f"Retention removed {len(removed)} partitions from {vertical}")
+        return removed
@@ -0,0 +1,160 @@
+import concurrent.futures
+import hashlib
+import json
+import logging
+import os
+import time
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+
+def fingerprint(value):
+    """Stable short hash of a JSON-able value."""
+    payload = json.dumps(value, sort_keys=True, default=str).encode("utf-8")
+    return hashlib.blake2b(payload, digest_size=12).hexdigest()
+
+
+def file_state(paths):
+    """{name: [size, mtime_ns]} for the files in `paths` that exist. Cheap output fingerprint."""
+    state = {}
+    for path in paths:
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            continue
+        state[os.path.basename(path)] = [st.st_size, st.st_mtime_ns]
+    return state
+
+
+class Stage:
+    """
+    One pipeline step. `inputs` and `outputs` are callables returning
+    JSON-able descriptions of the external state the stage reads and of what
+    it has produced (e.g. file stats, partition hashes). A stage without
+    `outputs` always runs.
+    """
+    __slots__ = ("name", "fn", "after", "inputs", "outputs", "kind")
+
+    def __init__(self, name, fn, after=(), inputs=None, outputs=None, kind=None):
+        self.name = name
+        self.fn = fn
+        self.after = tuple(after)
+        self.inputs = inputs
+        self.outputs = outputs
+        self.kind = kind or name.split(":")[0]
+
+
+class PipelineDAG:
+    """
+    Small dependency-graph executor for the data pipeline.
+
+    A stage's key is the hash of its own inputs plus the outputs of the
+    stages it depends on. When the key matches the previous run (kept in
+    `state_path`) and its outputs are still as that run left them, the stage
+    is skipped and its recorded outputs are passed downstream, so an
+    unchanged branch costs a few stat() calls. Stages whose dependencies are
+    done run concurrently on a thread pool. A failing stage blocks only its
+    dependents; the first error is re-raised once the rest of the graph has
+    finished.
+    """
+
+    def __init__(self, state_path=None):
+        self.stages = {}
+        self.state_path = state_path
+
+    def add(self, name, fn, after=(), inputs=None, outputs=None, kind=None):
+        for dep in after:
+            if dep not in self.stages:
+                raise ValueError(f"Stage {name} depends on unknown stage {dep}")
+        self.stages[name] = Stage(name, fn, after, inputs, outputs, kind)
+        return name
+
+    def _load_state(self):
+        if self.state_path and os.path.exists(self.state_path):
+            with open(self.state_path) as f:
+                return json.load(f)
+        return {}
+
+    def _save_state(self, state):
+        if not self.state_path:
+            return
+        tmp = self.state_path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(state, f, indent=2, sort_keys=True)
+        os.replace(tmp, self.state_path)
+
+    def _execute(self, stage, results, produced, previous):
+        """Run or skip one stage. Returns (status, key, outputs, result)."""
+        key = fingerprint([
+            stage.inputs() if stage.inputs else None,
+            [produced.get(dep) for dep in stage.after]
+        ])
+        if stage.outputs is not None:
+            recorded = previous.get(stage.name)
+            if recorded and recorded["key"] == key and recorded["outputs"] == stage.outputs():
+                return "skipped", key, recorded["outputs"], None
+        result = stage.fn({dep: results.get(dep) for dep in stage.after})
+        outputs = stage.outputs() if stage.outputs is not None else None
+        return "ran", key, outputs, result
+
+    def run(self, workers=4, on_complete=None):
+        """
+        Execute the graph. Returns (report, results): per-stage status
+        ("ran", "skipped", "failed", "blocked") with timings, and the return
+        values of the stages that ran (skipped stages have no result).
+        `on_complete(name, status, result)` is called as stages finish.
+        """
+        previous = self._load_state()
+        state = {}
+        results, produced, report = {}, {}, {}
+        errors = []
+        pending = dict(self.stages)
+        running = {}
+
+        def ready(stage):
+            return all(dep in report for dep in stage.after)
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+            while pending or running:
+                for name, stage in list(pending.items()):
+                    if not ready(stage):
+                        continue
+                    del pending[name]
+                    if any(report[dep]["status"] in ("failed", "blocked") for dep in stage.after):
+                        report[name] = {"status": "blocked", "seconds": 0.0}
+                        metrics.PIPELINE_STAGE_RUNS.inc(stage=stage.kind, result="blocked")
+                        continue
+                    running[pool.submit(self._execute, stage, results, produced, previous)] = (stage, time.perf_counter())
+                if not running:
+                    continue
+
+                done, _ = concurrent.futures.wait(running, return_when=concurrent.futures.FIRST_COMPLETED)
+                for future in done:
+                    stage, started = running.pop(future)
+                    elapsed = time.perf_counter() - started
+                    try:
+                        status, key, outputs, result = future.result()
+                    except Exception as e:
+                        logger.error(f"Pipeline stage {stage.name} failed: {e}")
+                        errors.append(e)
+                        status, result = "failed", None
+                    else:
+                        produced[stage.name] = outputs
+                        results[stage.name] = result
+                        if stage.outputs is not None:
+                            state[stage.name] = {"key": key, "outputs": outputs}
+                    report[stage.name] = {"status": status, "seconds": round(elapsed, 4)}
+                    metrics.PIPELINE_STAGE_RUNS.inc(stage=stage.kind, result=status)
+                    if on_complete is not None:
+                        on_complete(stage.name, status, result)
+
+        # Keep records of stages that did not complete this time
+        for name, recorded in previous.items():
+            if name not in state and report.get(name, {}).get("status") not in ("ran", "skipped"):
+                state[name] = recorded
+        self._save_state(state)
+        if errors:
+            raise errors[0]
+        return report, results
@@ -0,0 +1,279 @@
+import cProfile
+import io
+import json
+import logging
+import os
+import pstats
+import random
+import subprocess
+import sys
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+
+def _env_flag(name, default=False):
+    return os.getenv(name, str(default)).lower() in ("1", "true", "yes", "on")
+
+
+class _SpanStats:
+    __slots__ = ("name", "labels", "count", "total_s", "max_s", "last_s",
+                 "sampled", "alloc_net_bytes", "alloc_peak_bytes", "cpu_stats")
+
+    def __init__(self, name, labels):
+        self.name = name
+        self.labels = labels
+        self.count = 0
+        self.total_s = 0.0
+        self.max_s = 0.0
+        self.last_s = 0.0
+        self.sampled = 0
+        self.alloc_net_bytes = 0
+        self.alloc_peak_bytes = 0
+        self.cpu_stats = None  # pstats.Stats aggregated over sampled runs
+
+    def to_dict(self, top_n=10):
+        data = {
+            "name": self.name,
+            "labels": self.labels,
+            "count": self.count,
+            "total_s": round(self.total_s, 6),
+            "avg_s": round(self.total_s / self.count, 6) if self.count else 0.0,
+            "max_s": round(self.max_s, 6),
+            "last_s": round(self.last_s, 6),
+            "sampled": self.sampled,
+            "alloc_net_bytes": self.alloc_net_bytes,
+            "alloc_peak_bytes": self.alloc_peak_bytes,
+        }
+        if self.cpu_stats is not None:
+            data["top_functions"] = _top_functions(self.cpu_stats, top_n)
+        return data
+
+
+def _top_functions(stats, top_n):
+    rows = []
+    for (filename, lineno, func), (cc, nc, tt, ct, _) in stats.stats.items():
+        rows.append({
+            "function": f"{os.path.basename(filename)}:{lineno}({func})",
+            "ncalls": nc,
+            "tottime_s": round(tt, 6),
+            "cumtime_s": round(ct, 6)
+        })
+    rows.sort(key=lambda r: r["cumtime_s"], reverse=True)
+    return rows[:top_n]
+
+
+class Profiler:
+    """
+    Lightweight span recorder for pipeline stages and predictor steps.
+
+    Every span records wall time. When sampling is switched on, a fraction of
+    spans additionally run under cProfile (CPU attribution) and/or tracemalloc
+    (allocation attribution), so the overhead can be enabled in production
+    without a debug build.
+    """
+
+    def __init__(self):
+        self.enabled = _env_flag("PROFILE_ENABLED", True)
+        self.sample_rate = float(os.getenv("PROFILE_SAMPLE_RATE", "0.0"))
+        self.cprofile = _env_flag("PROFILE_CPROFILE")
+        self.tracemalloc = _env_flag("PROFILE_TRACEMALLOC")
+        self._stats = {}
+        self._lock = threading.Lock()
+        # cProfile and tracemalloc are process-wide, so only one sampled
+        # span may hold them at a time. Others just record wall time.
+        self._sampler_lock = threading.Lock()
+        if self.tracemalloc and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    def configure(self, enabled=None, sample_rate=None, cprofile=None, tracemalloc_on=None):
+        """Update settings at runtime (used by the admin endpoint)."""
+        if enabled is not None:
+            self.enabled = bool(enabled)
+        if sample_rate is not None:
+            self.sample_rate = max(0.0, min(1.0, float(sample_rate)))
+        if cprofile is not None:
+            self.cprofile = bool(cprofile)
+        if tracemalloc_on is not None:
+            self.tracemalloc = bool(tracemalloc_on)
+            if self.tracemalloc and not tracemalloc.is_tracing():
+                tracemalloc.start()
+            elif not self.tracemalloc and tracemalloc.is_tracing():
+                tracemalloc.stop()
+        return self.settings()
+
+    def settings(self):
+        return {
+            "enabled": self.enabled,
+            "sample_rate": self.sample_rate,
+            "cprofile": self.cprofile,
+            "tracemalloc": self.tracemalloc
+        }
+
+    def _get_stats(self, name, labels):
+        key = (name, tuple(sorted(labels.items())))
+        stats = self._stats.get(key)
+        if stats is None:
+            with self._lock:
+                stats = self._stats.setdefault(key, _SpanStats(name, dict(labels)))
+        return stats
+
+    @contextmanager
+    def span(self, name, histogram=None, **labels):
+        """
+        Time the enclosed block as `name` with the given labels.
+        If `histogram` is a metrics.Histogram, the duration is also observed
+        there using whichever of `labels` it declares.
+        """
+        if not self.enabled:
+            if histogram is None:
+                yield
+            else:
+                with histogram.time(**{k: labels[k] for k in histogram.labelnames}):
+                    yield
+            return
+
+        sampled = (self.cprofile or self.tracemalloc) and self.sample_rate > 0 \
+            and random.random() < self.sample_rate \
+            and self._sampler_lock.acquire(blocking=False)
+
+        profile = None
+        mem_start = 0
+        if sampled:
+            if self.tracemalloc and tracemalloc.is_tracing():
+                tracemalloc.reset_peak()
+                mem_start = tracemalloc.get_traced_memory()[0]
+            if self.cprofile:
+                profile = cProfile.Profile()
+                profile.enable()
+
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            stats = self._get_stats(name, labels)
+
+            if sampled:
+                if profile is not None:
+                    profile.disable()
+                alloc_net = alloc_peak = 0
+                if self.tracemalloc and tracemalloc.is_tracing():
+                    current, peak = tracemalloc.get_traced_memory()
+                    alloc_net = current - mem_start
+                    alloc_peak = peak - mem_start
+                self._sampler_lock.release()
+
+            with self._lock:
+                stats.count += 1
+                stats.total_s += elapsed
+                stats.last_s = elapsed
+                stats.max_s = max(stats.max_s, elapsed)
+                if sampled:
+                    stats.sampled += 1
+                    stats.alloc_net_bytes += alloc_net
+                    stats.alloc_peak_bytes = max(stats.alloc_peak_bytes, alloc_peak)
+                    if profile is not None:
+                        if stats.cpu_stats is None:
+                            stats.cpu_stats = pstats.Stats(profile, stream=io.StringIO())
+                        else:
+                            stats.cpu_stats.add(profile)
+
+            if histogram is not None:
+                histogram.observe(elapsed, **{k: labels[k] for k in histogram.labelnames})
+
+    def snapshot(self, top_n=10):
+        with self._lock:
+            spans = [s.to_dict(top_n) for s in self._stats.values()]
+        spans.sort(key=lambda s: s["total_s"], reverse=True)
+        return {
+            "settings": self.settings(),
+            "generated_at": datetime.now().isoformat(),
+            "spans": spans
+        }
+
+    def reset(self):
+        with self._lock:
+            self._stats.clear()
+
+    def dump(self, directory, top_n=25):
+        """
+        Write the current snapshot to `directory` as JSON, plus a combined
+        .pstats file when CPU samples exist. Returns the written paths.
+        """
+        os.makedirs(directory, exist_ok=True)
+        stamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        json_path = os.path.join(directory, f"profile_{stamp}.json")
+        with open(json_path, "w") as f:
+            json.dump(self.snapshot(top_n), f, indent=2)
+        paths = [json_path]
+
+        with self._lock:
+            cpu = [s.cpu_stats for s in self._stats.values() if s.cpu_stats is not None]
+        if cpu:
+            combined = pstats.Stats(stream=io.StringIO())
+            combined.add(*cpu)
+            pstats_path = os.path.join(directory, f"profile_{stamp}.pstats")
+            combined.dump_stats(pstats_path)
+            paths.append(pstats_path)
+
+        logger.info(f"Profile dumped to {paths}")
+        return paths
+
+
+PROFILER = Profiler()
+
+
+def span(name, histogram=None, **labels):
+    """Module-level shortcut for PROFILER.span()."""
+    return PROFILER.span(name, histogram=histogram, **labels)
+
+
+# Modules that should stay off the API's startup path (see app.py)
+STARTUP_DEFERRED = ("pandas", "numpy", "faker", "google_play_scraper", "update_data", "ml_engine")
+
+
+def import_times(module="app", top_n=25, python=None):
+    """
+    Import `module` in a fresh interpreter under `-X importtime` and
+    summarise the report: total import time, the slowest modules by
+    cumulative and self time, and which STARTUP_DEFERRED modules were pulled
+    in. Times are in milliseconds.
+    """
+    cmd = [python or sys.executable, "-X", "importtime", "-c", f"import {module}"]
+    start = time.perf_counter()
+    proc = subprocess.run(cmd, capture_output=True, text=True, timeout=120,
+                          cwd=os.path.dirname(os.path.abspath(__file__)))
+    wall = time.perf_counter() - start
+
+    entries = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        if not self_us.strip().isdigit():
+            continue  # column header
+        entries.append({
+            "module": name.strip(),
+            "depth": (len(name) - len(name.lstrip()) - 1) // 2,
+            "self_ms": int(self_us) / 1000,
+            "cumulative_ms": int(cumulative_us) / 1000
+        })
+    loaded = {e["module"]: e for e in entries}
+    target = loaded.get(module)
+
+    return {
+        "module": module,
+        "ok": proc.returncode == 0,
+        "error": (proc.stderr.strip().splitlines() or ["failed"])[-1] if proc.returncode else None,
+        "wall_ms": round(wall * 1000, 1),
+        "import_ms": target["cumulative_ms"] if target else None,
+        "modules": len(entries),
+        "deferred": {name: name not in loaded for name in STARTUP_DEFERRED},
+        "slowest_cumulative": sorted(entries, key=lambda e: -e["cumulative_ms"])[:top_n],
+        "slowest_self": sorted(entries, key=lambda e: -e["self_ms"])[:top_n]
+    }
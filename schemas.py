@@ -0,0 +1,210 @@
+# Per-vertical column types. Numbers are stored raw (no "+", "%", "$...M")
+# and downcast; repeated strings are categorical. Column order here is the
+# order used for exports.
+SCHEMAS = {
+    "fintech": {
+        "company": "category",
+        "date": "datetime64[ns]",
+        "download_velocity": "int32",
+        "review_sentiment": "float32",
+        "hiring_spike": "category",
+        "feature_lead_score": "int16",
+        "adoption_velocity": "int32",
+        "churn_risk": "int16",
+        "funding_signal": "category",
+        "cac_proxy": "int16",
+        "premium_insight": "category",
+        "alpha_window_days": "int16",
+        "smart_money_score": "int16",
+        "download_acceleration": "int32",
+        "review_sentiment_trend": "float32",
+        "engineer_hiring_spike": "int16",
+        "executive_departure_score": "int16",
+        "recruiting_intensity": "float32",
+        "burn_rate_proxy": "float32",
+        "competitor_funding_gap": "int16",
+        "investor_engagement_score": "int16",
+        "api_traffic_growth": "float32",
+        "feature_release_velocity": "int16",
+        "tech_stack_modernization": "int16"
+    },
+    "ai_talent": {
+        "company": "category",
+        "date": "datetime64[ns]",
+        "github_stars_7d": "int32",
+        "arxiv_papers": "int16",
+        "citations": "int32",
+        "patents_filed": "int16",
+        "investor_engagement": "category",
+        "funding_probability": "int16",
+        "technical_momentum": "int16",
+        "talent_score": "int16",
+        "premium_insight": "category",
+        "innovation_delay_days": "int16",
+        "benchmark_inflation_pct": "int16",
+        "flight_status": "category",
+        "performance_leap_magnitude": "float32",
+        "commercialization_timeline": "int16"
+    },
+    "esg": {
+        "company": "category",
+        "date": "datetime64[ns]",
+        "esg_claims": "int16",
+        "verifiable_actions": "int16",
+        "greenwashing_index": "int16",
+        "regulatory_risk": "category",
+        "stakeholder_score": "int16",
+        "impact_verified": "int16",
+        "premium_insight": "category",
+        "claims_psi": "int16",
+        "reality_psi": "int16",
+        "greenwashing_gap_pct": "int16",
+        "audit_gap_size": "int16",
+        "supplier_esg_score": "int16",
+        "employee_whistleblower_count": "int16",
+        "carbon_credit_validity_score": "int16"
+    },
+    "regulatory": {
+        "company": "category",
+        "date": "datetime64[ns]",
+        "enforcement_probability": "int16",
+        "compliance_gap": "category",
+        "fines_estimate": "int32",
+        "remediation_cost": "int32",
+        "whistleblower_risk": "category",
+        "regulatory_foresight": "int16",
+        "premium_insight": "category",
+        "enforcement_probability_pct": "int16",
+        "fine_impact_usd": "int64",
+        "action_timeline_days": "int16"
+    },
+    "supply_chain": {
+        "company": "category",
+        "date": "datetime64[ns]",
+        "disruption_risk": "int16",
+        "recovery_days": "int16",
+        "single_point_failure": "category",
+        "cost_inflation": "float32",
+        "resilience_score": "int16",
+        "premium_insight": "category",
+        "disruption_probability": "int16",
+        "days_to_impact": "int16",
+        "impact_revenue_pct": "float32"
+    }
+}
+
+# Display formatting applied only when writing customer-facing CSVs.
+# Values are (prefix, number format, suffix).
+DISPLAY_FORMATS = {
+    "ai_talent": {
+        "github_stars_7d": ("+", "{:d}", ""),
+        "funding_probability": ("", "{:d}", "%")
+    },
+    "esg": {
+        "impact_verified": ("", "{:d}", "%")
+    },
+    "regulatory": {
+        "enforcement_probability": ("", "{:d}", "%"),
+        "fines_estimate": ("$", "{:d}", "M"),
+        "remediation_cost": ("$", "{:d}", "M")
+    },
+    "supply_chain": {
+        "cost_inflation": ("", "{:.1f}", "%")
+    }
+}
+
+
+def _parse_display(series):
+    """Turn "+123", "87%", "$450M" style strings back into numbers."""
+    import pandas as pd
+    cleaned = series.astype(str).str.replace(r"[+%$M,]", "", regex=True)
+    return pd.to_numeric(cleaned, errors="coerce")
+
+
+def apply_schema(df, vertical):
+    """
+    Cast a frame to the vertical's compact schema. Accepts freshly generated
+    rows, raw partition reads and legacy files with display-formatted values.
+    Only columns whose dtype differs are touched, in one batched astype.
+    Unknown columns are kept as-is after the schema columns.
+    """
+    import pandas as pd
+    schema = SCHEMAS[vertical]
+    updates = {}
+    casts = {}
+    for col, dtype in schema.items():
+        if col not in df.columns:
+            continue
+        series = df[col]
+        if dtype.startswith("datetime"):
+            if not pd.api.types.is_datetime64_any_dtype(series):
+                updates[col] = pd.to_datetime(series)
+        elif dtype == "category":
+            if not isinstance(series.dtype, pd.CategoricalDtype):
+                casts[col] = "category"
+        elif series.dtype != dtype:
+            if not pd.api.types.is_numeric_dtype(series):
+                series = updates[col] = _parse_display(series)
+            if dtype.startswith("int") and series.isna().any():
+                # Keep rows with unparseable values rather than failing the cast
+                casts[col] = "float32"
+            else:
+                casts[col] = dtype
+
+    out = df.assign(**updates) if updates else df
+    if casts:
+        out = out.astype(casts)
+    order = [c for c in schema if c in out.columns]
+    order += [c for c in out.columns if c not in schema]
+    if list(out.columns) != order:
+        out = out[order]
+    return out
+
+
+def to_export(df, vertical):
+    """Copy of `df` with display formatting applied, ready for CSV export."""
+    import numpy as np
+    import pandas as pd
+    out = df.copy()
+    if "date" in out.columns and pd.api.types.is_datetime64_any_dtype(out["date"]):
+        out["date"] = out["date"].dt.strftime("%Y-%m-%d")
+    for col, (prefix, fmt, suffix) in DISPLAY_FORMATS.get(vertical, {}).items():
+        if col in out.columns and pd.api.types.is_numeric_dtype(out[col]):
+            values = out[col].to_numpy()
+            if fmt == "{:d}":
+                values = values.astype(np.int64)
+            out[col] = [f"{prefix}{fmt.format(v)}{suffix}" for v in values.tolist()]
+    return out
+
+
+def to_records(df):
+    """
+    JSON-friendly records. float32 values are widened via their shortest
+    decimal form so 4.2 stays 4.2 instead of 4.199999809265137. Missing and
+    non-finite values (e.g. integers apply_schema could not parse) become
+    None, since JSON has no NaN.
+    """
+    import math
+    import numpy as np
+    import pandas as pd
+    float32_cols = [c for c in df.columns if df[c].dtype == np.float32]
+    float_cols = [c for c in df.columns if pd.api.types.is_float_dtype(df[c]) and c not in float32_cols]
+    has_date = "date" in df.columns and pd.api.types.is_datetime64_any_dtype(df["date"])
+    # Other columns only need checking when they hold missing values (e.g. an empty category)
+    null_cols = [c for c in df.columns
+                 if c not in float32_cols and c not in float_cols and not (has_date and c == "date")
+                 and df[c].isna().any()]
+    records = df.to_dict(orient="records")
+    for rec in records:
+        for col in float32_cols:
+            value = rec[col]
+            rec[col] = float(str(np.float32(value))) if math.isfinite(value) else None
+        for col in float_cols:
+            if not math.isfinite(rec[col]):
+                rec[col] = None
+        for col in null_cols:
+            if pd.isna(rec[col]):
+                rec[col] = None
+        if has_date:
+            rec["date"] = None if pd.isna(rec["date"]) else rec["date"].strftime("%Y-%m-%d")
+    return records
@@ -0,0 +1,118 @@
+import hashlib
+import os
+import threading
+from datetime import date, datetime
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+# Root of every random stream used by the data generators. Changing it (or
+# DATA_SEED) produces a different, but still fully reproducible, universe.
+ROOT_SEED = int(os.getenv("DATA_SEED", "20250101"))
+
+
+def _key_part(part):
+    """Map a key component (str, int, date) to a stable 64-bit integer."""
+    if isinstance(part, (datetime, pd.Timestamp)):
+        part = part.date()
+    if isinstance(part, date):
+        return part.toordinal()
+    if isinstance(part, (int, np.integer)):
+        return int(part)
+    # Python's hash() is salted per process; blake2b is stable everywhere.
+    digest = hashlib.blake2b(str(part).encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "little")
+
+
+def stream(*key, root_seed=None):
+    """
+    Return an independent np.random.Generator for a key such as
+    (vertical, company, date). The same key always yields the same stream,
+    and streams for different keys are statistically independent.
+    """
+    seed_seq = np.random.SeedSequence(
+        ROOT_SEED if root_seed is None else root_seed,
+        spawn_key=tuple(_key_part(p) for p in key)
+    )
+    return np.random.default_rng(seed_seq)
+
+
+_local = threading.local()
+
+
+def _philox_key(root_seed, *key):
+    h = hashlib.blake2b(digest_size=16)
+    h.update(str(root_seed).encode("utf-8"))
+    for part in key:
+        h.update(b"\x1f" + str(_key_part(part)).encode("utf-8"))
+    return int.from_bytes(h.digest(), "little")
+
+
+def day_stream(vertical, company, day, root_seed=None):
+    """
+    Fast per-(vertical, company, date) stream for the row generators.
+
+    Philox is counter-based: the key is derived from (root_seed, vertical,
+    company) and the date ordinal selects a disjoint block of the counter
+    space, so each day is an independent stream. Rather than building a new
+    Generator per row (~20us), a cached per-thread Generator is repositioned
+    (~2us). The returned Generator is only valid until the next day_stream()
+    call for the same (vertical, company) on the same thread.
+    """
+    root_seed = ROOT_SEED if root_seed is None else root_seed
+    if isinstance(day, (datetime, pd.Timestamp)):
+        day = day.date()
+    cache = getattr(_local, "streams", None)
+    if cache is None:
+        cache = _local.streams = {}
+
+    entry = cache.get((root_seed, vertical, company))
+    if entry is None:
+        bit_gen = np.random.Philox(key=_philox_key(root_seed, vertical, company))
+        state = bit_gen.state
+        state["state"]["counter"] = np.zeros(4, dtype=np.uint64)
+        entry = cache[(root_seed, vertical, company)] = (np.random.Generator(bit_gen), bit_gen, state)
+
+    generator, bit_gen, state = entry
+    state["state"]["counter"][:3] = 0
+    state["state"]["counter"][3] = day.toordinal()
+    state["buffer_pos"] = 4
+    state["has_uint32"] = 0
+    bit_gen.state = state
+    return generator
+
+
+@lru_cache(maxsize=4096)
+def yearly_draws(root_seed, vertical, company, tag, year, kind="uniform"):
+    """
+    366 draws (one per day-of-year) for quantities that must be consistent
+    across neighbouring days, e.g. signal onsets or yesterday's value.
+    Cached so regenerating a single day doesn't rebuild the whole year.
+    """
+    rng = stream(vertical, company, tag, year, root_seed=root_seed)
+    if kind == "normal":
+        values = rng.standard_normal(366)
+    else:
+        values = rng.random(366)
+    values.setflags(write=False)
+    return values
+
+
+def daily_draw(root_seed, vertical, company, tag, day, kind="uniform"):
+    """The yearly_draws() value for a single calendar day."""
+    if isinstance(day, (datetime, pd.Timestamp)):
+        day = day.date()
+    return yearly_draws(root_seed, vertical, company, tag, day.year, kind)[day.timetuple().tm_yday - 1]
+
+
+def content_hash(df):
+    """
+    Stable SHA-256 of a DataFrame's contents (values and column names,
+    ignoring the index). Equal data gives equal hashes across processes.
+    """
+    h = hashlib.sha256()
+    h.update("\x1f".join(map(str, df.columns)).encode("utf-8"))
+    if len(df):
+        h.update(pd.util.hash_pandas_object(df, index=False).values.tobytes())
+    return h.hexdigest()
@@ -0,0 +1,180 @@
+import asyncio
+import itertools
+import json
+import logging
+import threading
+import time
+from collections import deque
+
+import metrics
+from json_utils import convert_numpy_types
+
+logger = logging.getLogger(__name__)
+
+
+class Event:
+    """
+    One published update. The wire encodings are built once on first use and
+    shared by every subscriber, so fan-out cost does not grow with the
+    payload size times the number of clients.
+    """
+    __slots__ = ("id", "topic", "key", "data", "ts", "_sse", "_ndjson")
+
+    def __init__(self, event_id, topic, data, key=None):
+        self.id = event_id
+        self.topic = topic
+        self.key = key
+        self.data = data
+        self.ts = time.time()
+        self._sse = None
+        self._ndjson = None
+
+    def _json(self):
+        return json.dumps({"id": self.id, "event": self.topic, "ts": self.ts, "data": self.data},
+                          separators=(",", ":"), default=str)
+
+    def sse(self):
+        if self._sse is None:
+            # Synthetic events (e.g. "lagged") carry no id so they don't move the client's Last-Event-ID
+            head = f"id: {self.id}\n" if self.id is not None else ""
+            self._sse = f"{head}event: {self.topic}\ndata: {self._json()}\n\n".encode("utf-8")
+        return self._sse
+
+    def ndjson(self):
+        if self._ndjson is None:
+            self._ndjson = (self._json() + "\n").encode("utf-8")
+        return self._ndjson
+
+
+class Subscriber:
+    """
+    Per-client buffer. Bounded: when a slow client falls behind, an older
+    event with the same (topic, key) is replaced first, otherwise the oldest
+    event is dropped. Publishing therefore never blocks on a client, and the
+    client is told how many events it missed so it can refetch.
+    """
+
+    def __init__(self, topics, max_queue, loop):
+        self.topics = topics
+        self.max_queue = max_queue
+        self.loop = loop
+        self.buffer = deque()
+        self.dropped = 0
+        self.closed = False
+        self._wakeup = asyncio.Event()
+
+    def wants(self, topic):
+        return self.topics is None or topic in self.topics
+
+    def push(self, event):
+        """Enqueue on the subscriber's event loop thread."""
+        if self.closed:
+            return
+        if len(self.buffer) >= self.max_queue:
+            stale = None
+            if event.key is not None:
+                stale = next((e for e in self.buffer if e.topic == event.topic and e.key == event.key), None)
+            if stale is not None:
+                self.buffer.remove(stale)
+            else:
+                stale = self.buffer.popleft()
+            self.dropped += 1
+            metrics.STREAM_DROPPED.inc(topic=stale.topic)
+        self.buffer.append(event)
+        self._wakeup.set()
+
+    def close(self):
+        self.closed = True
+        self._wakeup.set()
+
+    async def frames(self, fmt="sse", heartbeat=15.0):
+        """Yield encoded frames until closed, with keep-alives while idle."""
+        while not self.closed:
+            if not self.buffer:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), heartbeat)
+                except asyncio.TimeoutError:
+                    yield b": keep-alive\n\n" if fmt == "sse" else b'{"event":"heartbeat"}\n'
+                    continue
+            if self.dropped:
+                lagged = Event(None, "lagged", {"dropped": self.dropped})
+                self.dropped = 0
+                yield lagged.sse() if fmt == "sse" else lagged.ndjson()
+            while self.buffer:
+                event = self.buffer.popleft()
+                yield event.sse() if fmt == "sse" else event.ndjson()
+
+
+class Broadcaster:
+    """
+    Shared fan-out for the live feed (/api/stream).
+
+    Producers (the pipeline, the API's feed task) call publish() from any
+    thread; each event is encoded once and handed to every interested
+    subscriber's bounded buffer on its event loop. Keyed events (e.g. the
+    latest prediction per vertical) are remembered so new subscribers start
+    from current state, and a short replay log lets reconnecting clients
+    resume from Last-Event-ID.
+    """
+
+    def __init__(self, max_queue=100, replay_size=500):
+        self.max_queue = max_queue
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._subscribers = set()
+        self._latest = {}
+        self._replay = deque(maxlen=replay_size)
+
+    def subscriber_count(self):
+        return len(self._subscribers)
+
+    def publish(self, topic, data, key=None):
+        """Publish `data` under `topic`. `key` marks state that supersedes older events with the same key."""
+        with self._lock:
+            event = Event(next(self._ids), topic, convert_numpy_types(data), key)
+            self._replay.append(event)
+            if key is not None:
+                self._latest[(topic, key)] = event
+            targets = [s for s in self._subscribers if s.wants(topic)]
+        metrics.STREAM_EVENTS.inc(topic=topic)
+        for sub in targets:
+            try:
+                sub.loop.call_soon_threadsafe(sub.push, event)
+            except RuntimeError:
+                # Loop already closed; the subscriber is being torn down
+                pass
+        return event
+
+    def subscribe(self, topics=None, last_event_id=None, max_queue=None):
+        """
+        Register a subscriber on the running event loop. It is primed with
+        the events after `last_event_id` when still in the replay log,
+        otherwise with the latest keyed state for its topics.
+        """
+        sub = Subscriber(topics, max_queue or self.max_queue, asyncio.get_running_loop())
+        with self._lock:
+            replay = list(self._replay)
+            if last_event_id is not None and replay and replay[0].id <= last_event_id + 1:
+                backlog = [e for e in replay if e.id > last_event_id]
+            else:
+                backlog = sorted(self._latest.values(), key=lambda e: e.id)
+            self._subscribers.add(sub)
+        for event in backlog:
+            if sub.wants(event.topic):
+                sub.push(event)
+        return sub
+
+    def unsubscribe(self, sub):
+        sub.close()
+        with self._lock:
+            self._subscribers.discard(sub)
+
+
+BROADCASTER = Broadcaster()
+metrics.STREAM_SUBSCRIBERS.set_function(BROADCASTER.subscriber_count)
+
+
+def publish(topic, data, key=None):
+    """Module-level shortcut for BROADCASTER.publish()."""
+    return BROADCASTER.publish(topic, data, key=key)
@@ -0,0 +1,33 @@
+import os
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# Modules read DATA_DIR at import time; keep anything that falls back to it
+# out of the working tree. Tests pass their own tmp_path wherever they can.
+os.environ.setdefault("DATA_DIR", tempfile.mkdtemp(prefix="hh_tests_"))
+
+import pytest  # noqa: E402
+
+
+@pytest.fixture(scope="session")
+def engine():
+    from update_data import PremiumDataEngine
+    return PremiumDataEngine(seed=7)
+
+
+@pytest.fixture
+def make_rows(engine):
+    """make_rows(vertical, dates) -> typed frame of the engine's rows for those days."""
+    import pandas as pd
+    from schemas import apply_schema
+
+    def build(vertical, dates):
+        rows = []
+        for day in dates:
+            rows.extend(engine.verticals[vertical](day))
+        return apply_schema(pd.DataFrame(rows), vertical)
+
+    return build
@@ -0,0 +1,173 @@
+import asyncio
+import types
+
+import httpx
+import pytest
+from fastapi import FastAPI
+from starlette.requests import Request
+
+import admission
+from admission import (
+    ADMISSION_POLICIES, AdmissionController, ConcurrencyGovernor, MemoryBucketStore, Policy, SQLiteBucketStore,
+)
+from partitions import VERTICAL_BASENAMES
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Frozen admission.time: advance it with clock.now += seconds."""
+    fake = types.SimpleNamespace(now=1000.0)
+    fake.monotonic = fake.time = fake.perf_counter = lambda: fake.now
+    monkeypatch.setattr(admission, "time", fake)
+    return fake
+
+
+@pytest.mark.parametrize("make_store", [
+    lambda tmp_path: MemoryBucketStore(),
+    lambda tmp_path: SQLiteBucketStore(str(tmp_path / "buckets.sqlite")),
+])
+def test_token_bucket_refills_at_its_rate_up_to_the_burst(tmp_path, clock, make_store):
+    store = make_store(tmp_path)
+    for left in (2, 1, 0):
+        allowed, tokens, _ = store.take("c", rate=2.0, burst=3)
+        assert allowed and tokens == pytest.approx(left)
+    allowed, _, wait = store.take("c", rate=2.0, burst=3)
+    assert not allowed and wait == pytest.approx(0.5)
+    assert store.take("other", rate=2.0, burst=3)[0]
+
+    clock.now += 0.5
+    assert store.take("c", rate=2.0, burst=3)[0]
+    assert not store.take("c", rate=2.0, burst=3)[0]
+
+    # An idle bucket fills back up to the burst, not beyond it
+    clock.now += 60
+    assert sum(store.take("c", rate=2.0, burst=3)[0] for _ in range(5)) == 3
+
+
+def test_governor_queues_up_to_its_limit_then_sheds():
+    async def scenario():
+        governor = ConcurrencyGovernor(limit=1, max_queue=1)
+        assert await governor.acquire(1.0) is True
+        queued = asyncio.ensure_future(governor.acquire(1.0))
+        await asyncio.sleep(0)
+        assert len(governor.waiters) == 1
+        assert await governor.acquire(1.0) == "shed"
+
+        governor.release(0.2)
+        assert await queued is True
+        assert governor.active == 1 and not governor.waiters
+        assert await governor.acquire(0.01) == "timeout"
+        governor.release()
+        assert governor.active == 0
+
+    asyncio.run(scenario())
+
+
+def build_app(controller, gate):
+    app = FastAPI()
+    app.middleware("http")(controller)
+
+    @app.get("/api/slow")
+    async def slow():
+        await gate.wait()
+        return {"ok": True}
+
+    return app
+
+
+def test_middleware_sheds_requests_past_the_queue_with_retry_after():
+    policy = Policy("slow", "/api/slow", rate=100.0, burst=100, client_concurrency=10,
+                    concurrency=1, max_queue=1)
+    controller = AdmissionController(policies={"slow": policy}, client_header="X-Forwarded-For")
+
+    async def scenario():
+        gate = asyncio.Event()
+        transport = httpx.ASGITransport(app=build_app(controller, gate))
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            def call(ip):
+                return asyncio.ensure_future(client.get("/api/slow", headers={"X-Forwarded-For": ip}))
+
+            running, queued = call("10.0.0.1"), call("10.0.0.2")
+            while len(controller.governors["slow"].waiters) < 1:
+                await asyncio.sleep(0.01)
+            shed = await call("10.0.0.3")
+            assert shed.status_code == 503
+            assert int(shed.headers["Retry-After"]) >= 1
+
+            gate.set()
+            assert (await running).status_code == 200
+            assert (await queued).status_code == 200
+        assert controller.in_flight() == {("slow",): 0}
+
+    asyncio.run(scenario())
+
+
+def test_one_dashboard_load_is_admitted():
+    controller = AdmissionController(policies=ADMISSION_POLICIES)
+    app = FastAPI()
+    app.middleware("http")(controller)
+    gate = asyncio.Event()
+
+    @app.get("/api/preview/{vertical}")
+    @app.get("/api/predict/{vertical}")
+    async def section(vertical: str):
+        await gate.wait()
+        return {"vertical": vertical}
+
+    async def scenario():
+        transport = httpx.ASGITransport(app=app, client=("203.0.113.7", 50000))
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            # Every ProductSection fetches its preview and prediction together
+            calls = [asyncio.ensure_future(client.get(f"/api/{route}/{vertical}"))
+                     for vertical in VERTICAL_BASENAMES for route in ("preview", "predict")]
+            while sum(controller._client_in_flight.values()) + sum(c.done() for c in calls) < len(calls):
+                await asyncio.sleep(0.01)
+            gate.set()
+            responses = await asyncio.gather(*calls)
+        assert [r.status_code for r in responses] == [200] * len(calls)
+
+    asyncio.run(scenario())
+
+
+def test_each_forwarded_client_gets_its_own_bucket(tmp_path):
+    policy = Policy("slow", "/api/slow", rate=0.001, burst=1, client_concurrency=1,
+                    concurrency=10, max_queue=10)
+    # The SQLite store's takes run in a worker thread
+    controller = AdmissionController(policies={"slow": policy}, client_header="X-Forwarded-For",
+                                     store=SQLiteBucketStore(str(tmp_path / "buckets.sqlite")))
+
+    async def scenario():
+        gate = asyncio.Event()
+        gate.set()
+        transport = httpx.ASGITransport(app=build_app(controller, gate), client=("10.9.9.9", 443))
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            async def get(forwarded):
+                return (await client.get("/api/slow", headers={"X-Forwarded-For": forwarded})).status_code
+
+            assert await get("1.1.1.1") == 200
+            assert await get("2.2.2.2") == 200
+            assert await get("1.1.1.1") == 429
+            # A client-supplied entry left of the proxy's does not buy a fresh bucket
+            assert await get("3.3.3.3, 1.1.1.1") == 429
+
+    asyncio.run(scenario())
+
+
+def test_client_id_reads_the_trusted_hop_from_the_right():
+    scope = {"type": "http", "client": ("10.9.9.9", 443),
+             "headers": [(b"x-forwarded-for", b"6.6.6.6, 1.1.1.1, 172.16.0.1")]}
+    request = Request(scope)
+    assert AdmissionController(policies={}, client_header="X-Forwarded-For").client_id(request) == "172.16.0.1"
+    assert AdmissionController(policies={}, client_header="X-Forwarded-For",
+                               trusted_proxies=2).client_id(request) == "1.1.1.1"
+    assert AdmissionController(policies={}).client_id(request) == "10.9.9.9"
+
+
+def test_proxied_deployments_default_to_the_forwarded_header(monkeypatch):
+    monkeypatch.delenv("RATE_LIMIT_CLIENT_HEADER", raising=False)
+    monkeypatch.delenv("SPACE_ID", raising=False)
+    assert admission._default_client_header() is None
+    monkeypatch.setenv("SPACE_ID", "user/space")
+    assert admission._default_client_header() == "X-Forwarded-For"
+    monkeypatch.setenv("RATE_LIMIT_CLIENT_HEADER", "")
+    assert admission._default_client_header() is None
@@ -0,0 +1,52 @@
+import numpy as np
+import pandas as pd
+
+from ml_engine.backtest import run_backtest
+from ml_engine.pnl_tracker import PnLTracker
+from ml_engine.predictors import EsgPredictor
+
+
+def esg_history(companies, days=40, trend=1.0):
+    """
+    Half the companies make large unverified claims (high greenwashing
+    prediction), half small ones. The greenwashing index of the first half
+    rises by `trend` a day and of the second falls, so a positive trend
+    makes every view right and a negative one every view wrong.
+    """
+    rows = []
+    dates = pd.date_range("2025-01-01", periods=days)
+    for i in range(companies):
+        high = i % 2 == 0
+        for d, date in enumerate(dates):
+            rows.append({
+                "company": f"Company {i:05d}",
+                "date": date.strftime("%Y-%m-%d"),
+                "esg_claims": 30 if high else 8,
+                "verifiable_actions": 0,
+                "greenwashing_index": 50 + (d * trend if high else -d * trend),
+            })
+    return pd.DataFrame(rows)
+
+
+def backtest(history, horizon_days=10):
+    predictor = EsgPredictor("esg", PnLTracker())
+    predictor.fit_reference(history)
+    return run_backtest(predictor, history, horizon_days=horizon_days)
+
+
+def test_many_companies_never_commit_more_than_the_capital():
+    # A thousand positions of 5-10% each would be several times the capital
+    losing = backtest(esg_history(1000, trend=-5.0))
+    assert losing["total_trades"] > 0
+    equity = np.array([point["equity"] for point in losing["equity_curve"]])
+    assert (equity > 0).all()
+    assert losing["roi_pct"] > -100
+
+
+def test_returns_do_not_grow_with_the_number_of_companies():
+    small = backtest(esg_history(500))
+    large = backtest(esg_history(1000))
+    assert large["total_trades"] == 2 * small["total_trades"]
+    assert small["roi_pct"] > 0
+    assert large["roi_pct"] == small["roi_pct"]
+    assert large["final_capital"] == small["final_capital"]
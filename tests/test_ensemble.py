@@ -0,0 +1,40 @@
+import threading
+
+import numpy as np
+
+from ml_engine.ensemble import EnsembleRunner
+
+
+class GatedModel:
+    """Answers 1.0 per row once the gate opens."""
+
+    def __init__(self):
+        self.gate = threading.Event()
+
+    def predict(self, X):
+        self.gate.wait(5)
+        return np.ones(len(X))
+
+
+def test_batch_callers_wait_for_a_member_busy_with_a_timed_out_call():
+    runner = EnsembleRunner(workers=4)
+    model = GatedModel()
+    members = {"score": [("gated", model)]}
+    X = np.zeros((3, 2))
+    fallback = {"score": np.zeros(3)}
+    try:
+        _, report = runner.run("esg", members, X, fallback, timeouts={"score": 0.01})
+        assert report["score"]["fallback"] == "timeout"
+
+        # A request skips the member while its timed-out call is still running
+        _, report = runner.run("esg", members, X, fallback, timeouts={"score": 0.01})
+        assert report["score"]["busy"] == ["gated"]
+
+        # A batch without a deadline waits for it and gets the model's answer
+        threading.Timer(0.05, model.gate.set).start()
+        outputs, report = runner.run("esg", members, X, fallback, timeouts={"score": None})
+        assert report["score"] == {"members": ["gated"], "fallback": None}
+        assert outputs["score"].tolist() == [1.0, 1.0, 1.0]
+    finally:
+        model.gate.set()
+        runner.shutdown()
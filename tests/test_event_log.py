@@ -0,0 +1,61 @@
+from event_log import EventLog
+
+
+def messages(entries):
+    return [entry["message"] for entry in entries]
+
+
+def test_cursor_returns_only_entries_after_it():
+    log = EventLog(size=10)
+    assert log.since() == ([], 0, 0)
+    for i in range(3):
+        log.append("test", f"m{i}")
+
+    entries, cursor, missed = log.since()
+    assert messages(entries) == ["m0", "m1", "m2"]
+    assert (cursor, missed) == (3, 0)
+
+    assert log.since(cursor) == ([], 3, 0)
+    log.append("test", "m3", level="warning", step=4)
+    entries, cursor, missed = log.since(cursor)
+    assert messages(entries) == ["m3"]
+    assert entries[0]["level"] == "warning" and entries[0]["data"] == {"step": 4}
+    assert (cursor, missed) == (4, 0)
+
+
+def test_pages_are_limited_and_resume_from_the_cursor():
+    log = EventLog(size=50)
+    for i in range(25):
+        log.append("test", f"m{i}")
+    entries, cursor, _ = log.since(0, limit=10)
+    assert messages(entries) == [f"m{i}" for i in range(10)]
+    entries, cursor, _ = log.since(cursor, limit=10)
+    assert messages(entries) == [f"m{i}" for i in range(10, 20)]
+    # Without a cursor a client only gets the latest page
+    entries, cursor, _ = log.since(None, limit=10)
+    assert messages(entries) == [f"m{i}" for i in range(15, 25)]
+    assert cursor == 25
+
+
+def test_ring_wraparound_reports_missed_entries():
+    log = EventLog(size=5)
+    for i in range(3):
+        log.append("test", f"m{i}")
+    _, cursor, _ = log.since()
+
+    for i in range(3, 12):
+        log.append("test", f"m{i}")
+    assert len(log) == 5
+    entries, cursor, missed = log.since(cursor)
+    # m3 .. m6 fell off the ring before the client came back
+    assert messages(entries) == [f"m{i}" for i in range(7, 12)]
+    assert [entry["seq"] for entry in entries] == list(range(8, 13))
+    assert (cursor, missed) == (12, 4)
+
+
+def test_cursor_from_before_a_restart_starts_over():
+    log = EventLog(size=5)
+    log.append("test", "fresh")
+    entries, cursor, missed = log.since(500)
+    assert messages(entries) == ["fresh"]
+    assert (cursor, missed) == (1, 0)
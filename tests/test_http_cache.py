@@ -0,0 +1,113 @@
+import asyncio
+from email.utils import formatdate
+
+import httpx
+import pytest
+from fastapi import FastAPI, Request
+
+import http_cache
+
+
+@pytest.fixture
+def client():
+    cache = http_cache.ResponseCache(max_entries=2)
+    state = {"version": 1, "builds": 0}
+    app = FastAPI()
+
+    @app.get("/item")
+    async def item(request: Request):
+        entry = cache.get("/item", state["version"])
+        if entry is None:
+            state["builds"] += 1
+            entry = cache.put("/item", state["version"], {"version": state["version"]}, 1_700_000_000)
+        return http_cache.respond(request, entry, "public, max-age=60")
+
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test"), state
+
+
+def _run(coro):
+    return asyncio.run(coro)
+
+
+def test_if_none_match_returns_304_until_the_data_changes(client):
+    c, state = client
+
+    async def scenario():
+        async with c:
+            first = await c.get("/item")
+            assert first.status_code == 200
+            etag = first.headers["etag"]
+            assert first.headers["cache-control"] == "public, max-age=60"
+
+            again = await c.get("/item", headers={"If-None-Match": etag})
+            assert again.status_code == 304
+            assert again.content == b""
+            assert again.headers["etag"] == etag
+
+            # Weak validators and lists match too
+            weak = await c.get("/item", headers={"If-None-Match": f'"other", W/{etag}'})
+            assert weak.status_code == 304
+
+            state["version"] = 2
+            changed = await c.get("/item", headers={"If-None-Match": etag})
+            assert changed.status_code == 200
+            assert changed.headers["etag"] != etag
+            assert changed.json() == {"version": 2}
+
+    _run(scenario())
+    assert state["builds"] == 2
+
+
+def test_if_modified_since(client):
+    c, _ = client
+
+    async def scenario():
+        async with c:
+            first = await c.get("/item")
+            assert first.headers["last-modified"] == formatdate(1_700_000_000, usegmt=True)
+            same = await c.get("/item", headers={"If-Modified-Since": first.headers["last-modified"]})
+            assert same.status_code == 304
+            older = await c.get("/item", headers={"If-Modified-Since": formatdate(1_600_000_000, usegmt=True)})
+            assert older.status_code == 200
+            garbage = await c.get("/item", headers={"If-Modified-Since": "not a date"})
+            assert garbage.status_code == 200
+
+    _run(scenario())
+
+
+def test_etag_is_derived_from_the_body():
+    cache = http_cache.ResponseCache()
+    a = cache.put("/a", 1, {"x": 1}, 0)
+    b = cache.put("/b", 7, {"x": 1}, 0)
+    c = cache.put("/c", 1, {"x": 2}, 0)
+    assert a.etag == b.etag != c.etag
+
+
+def test_response_cache_is_a_bounded_lru():
+    cache = http_cache.ResponseCache(max_entries=2)
+    cache.put("/a", 1, {}, 0)
+    cache.put("/b", 1, {}, 0)
+    assert cache.get("/a", 1) is not None  # /a is now most recent
+    cache.put("/c", 1, {}, 0)
+    assert cache.get("/b", 1) is None
+    assert cache.get("/a", 1) is not None
+    assert cache.get("/a", 2) is None
+
+
+def test_single_flight_shares_one_computation():
+    flights = http_cache.SingleFlight()
+    calls = []
+
+    async def compute():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return len(calls)
+
+    async def scenario():
+        results = await asyncio.gather(*(flights.do("r", "k", compute) for _ in range(10)))
+        assert results == [1] * 10
+        assert flights.inflight() == {}
+        # A later call computes again; nothing is kept once the flight lands
+        assert await flights.do("r", "k", compute) == 2
+
+    asyncio.run(scenario())
@@ -0,0 +1,96 @@
+import os
+from datetime import datetime
+
+import partitions
+from panel import PanelStore
+from partitions import PartitionStore
+
+
+def test_upsert_writes_only_touched_months(tmp_path, make_rows):
+    store = PartitionStore(str(tmp_path))
+    assert store.version("esg") == 0
+
+    changed = store.upsert("esg", make_rows("esg", [datetime(2025, 1, 30), datetime(2025, 2, 1)]))
+    assert changed == [(2025, 1), (2025, 2)]
+    assert [(p["year"], p["month"]) for p in store.partitions("esg")] == [(2025, 1), (2025, 2)]
+    january = store.fingerprint("esg")["2025-01"]
+
+    changed = store.upsert("esg", make_rows("esg", [datetime(2025, 2, 2)]))
+    assert changed == [(2025, 2)]
+    assert store.fingerprint("esg")["2025-01"] == january
+    assert store.max_date("esg") == "2025-02-02"
+
+
+def test_upsert_replaces_rows_for_the_same_company_and_day(tmp_path, make_rows):
+    store = PartitionStore(str(tmp_path))
+    day = make_rows("esg", [datetime(2025, 3, 5)])
+    store.upsert("esg", day)
+    rows = store.total_rows("esg")
+
+    # Re-ingesting identical rows changes nothing, edited rows replace the old ones
+    assert store.upsert("esg", day) == []
+    edited = day.copy()
+    edited["esg_claims"] = edited["esg_claims"] + 1
+    assert store.upsert("esg", edited) == [(2025, 3)]
+    assert store.total_rows("esg") == rows
+    stored = store.load("esg").set_index("company")["esg_claims"]
+    assert stored.to_dict() == edited.set_index("company")["esg_claims"].to_dict()
+
+
+def test_version_changes_on_every_write(tmp_path, make_rows):
+    store = PartitionStore(str(tmp_path))
+    versions = [store.version("esg")]
+    for day in range(1, 6):
+        store.upsert("esg", make_rows("esg", [datetime(2025, 4, day)]))
+        versions.append(store.version("esg"))
+    assert len(set(versions)) == len(versions)
+
+    # Another instance (the API process) sees the pipeline's writes
+    reader = PartitionStore(str(tmp_path))
+    assert reader.version("esg") == store.version("esg")
+    store.upsert("esg", make_rows("esg", [datetime(2025, 4, 6)]))
+    assert reader.version("esg") == store.version("esg")
+    assert reader.max_date("esg") == "2025-04-06"
+
+
+def test_writes_within_one_clock_tick_get_new_generations(tmp_path, make_rows, monkeypatch):
+    # A coarse clock and filesystem: every save sees the same time and mtime
+    monkeypatch.setattr(partitions.time, "time_ns", lambda: 1_700_000_000_000_000_000)
+    store = PartitionStore(str(tmp_path))
+    reader = PartitionStore(str(tmp_path))
+    index_path = tmp_path / "store" / "esg" / "_index.json"
+    panel = PanelStore(str(tmp_path))
+    panel_reader = PanelStore(str(tmp_path))
+
+    seen, panel_seen = [], []
+    for day in range(1, 4):
+        store.upsert("esg", make_rows("esg", [datetime(2025, 4, day)]))
+        os.utime(index_path, ns=(0, 0))
+        panel.update(store)
+        assert reader.version("esg") == store.version("esg")
+        assert reader.max_date("esg") == f"2025-04-{day:02d}"
+        assert panel_reader.version() == panel.version()
+        seen.append(reader.version("esg"))
+        panel_seen.append(panel_reader.version())
+    assert len(set(seen)) == 3
+    assert len(set(panel_seen)) == 3
+
+
+def test_retention_drops_whole_years_before_the_cutoff(tmp_path, make_rows):
+    store = PartitionStore(str(tmp_path), retention_years=1)
+    store.upsert("esg", make_rows("esg", [datetime(2023, 12, 31), datetime(2024, 1, 1), datetime(2025, 6, 1)]))
+    before = store.version("esg")
+
+    removed = store.apply_retention("esg", now=datetime(2025, 6, 2))
+    assert removed == [(2023, 12)]
+    assert [p["year"] for p in store.partitions("esg")] == [2024, 2025]
+    assert not (tmp_path / "store" / "esg" / "year=2023").joinpath("quarter=4", "month=12.csv").exists()
+    assert store.version("esg") != before
+    assert store.apply_retention("esg", now=datetime(2025, 6, 2)) == []
+
+
+def test_no_retention_by_default(tmp_path, make_rows):
+    store = PartitionStore(str(tmp_path))
+    store.upsert("esg", make_rows("esg", [datetime(2015, 1, 1)]))
+    assert store.apply_retention("esg", now=datetime(2025, 1, 1)) == []
+    assert store.total_rows("esg") > 0
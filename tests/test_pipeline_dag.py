@@ -0,0 +1,99 @@
+import pytest
+
+from pipeline_dag import PipelineDAG
+
+
+def _build(state_path, world, calls, fail=()):
+    """extract -> transform -> load, plus an independent `other` stage."""
+    dag = PipelineDAG(str(state_path))
+
+    def stage(name, value):
+        def fn(deps):
+            calls.append(name)
+            if name in fail:
+                raise RuntimeError(f"{name} broke")
+            world[name] = value(deps)
+            return world[name]
+        return fn
+
+    dag.add("extract", stage("extract", lambda deps: world["source"] * 2),
+            inputs=lambda: world["source"], outputs=lambda: world.get("extract"))
+    dag.add("transform", stage("transform", lambda deps: world["extract"] + 1),
+            after=["extract"], outputs=lambda: world.get("transform"))
+    dag.add("load", stage("load", lambda deps: world["transform"]),
+            after=["transform"], outputs=lambda: world.get("load"))
+    dag.add("other", stage("other", lambda deps: "x"), outputs=lambda: world.get("other"))
+    return dag
+
+
+def test_second_run_with_unchanged_inputs_skips_everything(tmp_path):
+    world, calls = {"source": 1}, []
+    report, results = _build(tmp_path / "state.json", world, calls).run()
+    assert {r["status"] for r in report.values()} == {"ran"}
+    assert results["load"] == 3
+
+    calls.clear()
+    report, results = _build(tmp_path / "state.json", world, calls).run()
+    assert calls == []
+    assert {r["status"] for r in report.values()} == {"skipped"}
+    assert all(result is None for result in results.values())
+
+
+def test_changed_input_reruns_only_its_branch(tmp_path):
+    world, calls = {"source": 1}, []
+    _build(tmp_path / "state.json", world, calls).run()
+
+    world["source"] = 5
+    calls.clear()
+    report, _ = _build(tmp_path / "state.json", world, calls).run()
+    assert sorted(calls) == ["extract", "load", "transform"]
+    assert report["other"]["status"] == "skipped"
+    assert world["load"] == 11
+
+
+def test_stage_reruns_when_its_outputs_were_changed_outside_the_pipeline(tmp_path):
+    world, calls = {"source": 1}, []
+    _build(tmp_path / "state.json", world, calls).run()
+
+    world["load"] = "tampered"
+    calls.clear()
+    report, _ = _build(tmp_path / "state.json", world, calls).run()
+    assert calls == ["load"]
+    assert report["transform"]["status"] == "skipped"
+
+
+def test_failure_blocks_downstream_stages_only(tmp_path):
+    world, calls = {"source": 1}, []
+    completed = []
+    dag = _build(tmp_path / "state.json", world, calls, fail={"transform"})
+    with pytest.raises(RuntimeError, match="transform broke"):
+        dag.run(on_complete=lambda name, status, result: completed.append((name, status)))
+    assert "load" not in calls
+    assert ("other", "ran") in completed
+    assert ("transform", "failed") in completed
+
+    # The failed branch runs again next time; the rest is skipped
+    calls.clear()
+    report, _ = _build(tmp_path / "state.json", world, calls).run()
+    assert sorted(calls) == ["load", "transform"]
+    assert report["extract"]["status"] == "skipped"
+    assert report["other"]["status"] == "skipped"
+
+
+def test_blocking_propagates_through_the_whole_chain():
+    ran = []
+    dag = PipelineDAG()
+    dag.add("a", lambda deps: 1 / 0)
+    dag.add("b", lambda deps: ran.append("b"), after=["a"])
+    dag.add("c", lambda deps: ran.append("c"), after=["b"])
+    statuses = {}
+    with pytest.raises(ZeroDivisionError):
+        dag.run(on_complete=lambda name, status, result: statuses.update({name: status}))
+    assert statuses == {"a": "failed"}
+    assert ran == []
+
+
+def test_unknown_dependency_is_rejected():
+    dag = PipelineDAG()
+    with pytest.raises(ValueError):
+        dag.add("b", lambda deps: None, after=["a"])
@@ -0,0 +1,95 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from ml_engine.pnl_tracker import PnLTracker
+from ml_engine.predictors import (
+    AiTalentPredictor, EsgPredictor, FintechPredictor,
+    RegulatoryPredictor, SupplyChainPredictor,
+)
+
+
+# The per-row heuristics as they were before inference was vectorized
+def fintech_baseline(row):
+    hiring_strength = 1 if row.get('hiring_spike') == 'Active' else 0
+    downloads = row.get('download_velocity', 0)
+    days_to_funding = max(14, 120 - (downloads * 0.5) - (hiring_strength * 30))
+    funding_amount = (downloads * 10000) + (hiring_strength * 5000000)
+    return {
+        'days_to_funding': int(days_to_funding),
+        'funding_amount': round(funding_amount, -5),
+        'round_series': 'Series B' if funding_amount > 20000000 else 'Series A'
+    }
+
+
+def ai_talent_baseline(row):
+    stars = int(row.get('github_stars_7d', 0))
+    papers = int(row.get('arxiv_papers', 0))
+    days_to_release = max(30, 180 - (stars * 0.1) - (papers * 2))
+    perf_leap = min(50, (stars * 0.05) + (papers * 1.5))
+    return {
+        'next_release_days': int(days_to_release),
+        'performance_leap_pct': round(perf_leap, 1),
+        'commercialization_months': int(days_to_release / 30) + 2
+    }
+
+
+def esg_baseline(row):
+    gap = max(0, row.get('esg_claims', 0) - row.get('verifiable_actions', 0))
+    risk_score = min(100, gap * 5)
+    return {
+        'greenwashing_score': int(risk_score),
+        'correction_days': int(max(7, 90 - risk_score)),
+        'fine_probability': 'High' if risk_score > 60 else 'Low'
+    }
+
+
+def regulatory_baseline(row):
+    return {'enforcement_probability': 0.75, 'estimated_fine': 5000000, 'action_timeline_days': 45}
+
+
+def supply_chain_baseline(row):
+    return {'disruption_risk_score': 65, 'recovery_time_days': 14, 'impact_revenue_pct': 3.5}
+
+
+CASES = [
+    ("fintech", FintechPredictor, fintech_baseline),
+    ("ai_talent", AiTalentPredictor, ai_talent_baseline),
+    ("esg", EsgPredictor, esg_baseline),
+    ("regulatory", RegulatoryPredictor, regulatory_baseline),
+    ("supply_chain", SupplyChainPredictor, supply_chain_baseline),
+]
+
+
+@pytest.fixture
+def history(make_rows):
+    start = datetime(2025, 1, 1)
+    days = [start + timedelta(days=i) for i in range(20)]
+
+    def build(vertical):
+        frame = make_rows(vertical, days)
+        if vertical == "fintech":
+            # The generator only emits Yes/No; cover the value the heuristic keys on too
+            frame["hiring_spike"] = frame["hiring_spike"].cat.add_categories(["Active"])
+            frame.loc[frame.index[::3], "hiring_spike"] = "Active"
+        return frame
+
+    return build
+
+
+@pytest.mark.parametrize("vertical, predictor_cls, baseline", CASES)
+def test_vectorized_inference_matches_the_per_row_heuristics(history, vertical, predictor_cls, baseline):
+    frame = history(vertical)
+    predictor = predictor_cls(vertical, PnLTracker())
+    predictor.fit_reference(frame)
+    records = frame.astype(object).to_dict("records")
+    expected = [baseline(row) for row in records]
+
+    outputs, _ = predictor.predict_batch(predictor.featurize_frame(frame))
+    assert [predictor._format_predictions(outputs, i) for i in range(len(frame))] == expected
+
+    outputs, _ = predictor.predict_batch(predictor.featurize(records))
+    assert [predictor._format_predictions(outputs, i) for i in range(len(frame))] == expected
+
+    for row, want in zip(records[:10], expected):
+        assert predictor.predict(row)["predictions"] == want
@@ -0,0 +1,140 @@
+import os
+import threading
+from datetime import datetime
+
+from partitions import PartitionStore
+from product_manager import ChunkStore, DataProductManager
+from schemas import to_export
+
+
+def renderer(data, calls=None):
+    def render(path):
+        if calls is not None:
+            calls.append(path)
+        with open(path, "wb") as f:
+            f.write(data)
+    return render
+
+
+def test_fetch_renders_once_and_pins_until_released(tmp_path):
+    store = ChunkStore(str(tmp_path), max_bytes=1000)
+    calls = []
+    assert store.fetch("a", renderer(b"x" * 10, calls)) == (10, True)
+    assert store.fetch("a", renderer(b"x" * 10, calls)) == (10, False)
+    assert len(calls) == 1
+    assert store.snapshot()["pinned"] == 1
+
+    store.release(["a"])
+    assert store.snapshot()["pinned"] == 1  # still held by the second fetch
+    store.release(["a"])
+    assert store.snapshot()["pinned"] == 0
+    assert os.listdir(tmp_path) == ["a.csv"]
+
+
+def test_eviction_drops_least_recently_used_unpinned_chunks(tmp_path):
+    store = ChunkStore(str(tmp_path), max_bytes=25)
+    for chunk_id in "abc":
+        store.fetch(chunk_id, renderer(b"x" * 10))
+    # Over budget, but every chunk is still being served
+    assert store.size() == 30
+    assert sorted(os.listdir(tmp_path)) == ["a.csv", "b.csv", "c.csv"]
+
+    store.release(["b", "c"])
+    assert sorted(os.listdir(tmp_path)) == ["a.csv", "c.csv"]
+    assert store.size() == 20
+
+    store.release(["a"])
+    store.fetch("c", renderer(b""))  # c becomes most recently used
+    store.fetch("d", renderer(b"x" * 10))
+    assert sorted(os.listdir(tmp_path)) == ["c.csv", "d.csv"]
+    assert store.size() == 20
+
+
+def test_failed_render_hands_the_lock_to_waiting_fetches(tmp_path):
+    store = ChunkStore(str(tmp_path), max_bytes=1000)
+    started, fail = threading.Event(), threading.Event()
+
+    def failing(path):
+        started.set()
+        fail.wait(5)
+        raise OSError("disk full")
+
+    errors, results = [], []
+
+    def fetch(render):
+        try:
+            results.append(store.fetch("a", render))
+        except OSError as e:
+            errors.append(e)
+
+    first = threading.Thread(target=fetch, args=(failing,))
+    first.start()
+    started.wait(5)
+    calls = []
+    waiters = [threading.Thread(target=fetch, args=(renderer(b"x" * 10, calls),)) for _ in range(3)]
+    for thread in waiters:
+        thread.start()
+    fail.set()
+    for thread in [first, *waiters]:
+        thread.join(5)
+
+    assert len(errors) == 1
+    assert sorted(results) == [(10, False), (10, False), (10, True)]
+    assert len(calls) == 1
+    assert store.size() == 10
+    assert not store._render_locks
+
+    # Re-inserting a chunk replaces its size rather than adding to it
+    store._insert("a", 12)
+    assert store.size() == 12
+
+
+def test_sweep_keeps_live_and_pinned_chunks(tmp_path):
+    store = ChunkStore(str(tmp_path), max_bytes=1000)
+    for chunk_id in "abc":
+        store.fetch(chunk_id, renderer(b"x"))
+    store.release(["a", "b"])
+    assert store.sweep(live={"a"}) == 1
+    assert sorted(os.listdir(tmp_path)) == ["a.csv", "c.csv"]
+
+
+def test_restart_picks_up_stored_chunks_and_drops_partial_renders(tmp_path):
+    store = ChunkStore(str(tmp_path), max_bytes=1000)
+    store.fetch("a", renderer(b"x" * 7))
+    (tmp_path / "b.csv.123.tmp").write_bytes(b"partial")
+
+    reopened = ChunkStore(str(tmp_path), max_bytes=1000)
+    assert reopened.size() == 7
+    assert os.listdir(tmp_path) == ["a.csv"]
+    calls = []
+    assert reopened.fetch("a", renderer(b"", calls)) == (7, False)
+    assert not calls
+
+
+def test_products_share_month_chunks_and_stream_the_export(tmp_path, make_rows):
+    partitions = PartitionStore(str(tmp_path))
+    days = [datetime(2025, month, day) for month in (1, 2, 4) for day in (1, 2)]
+    partitions.upsert("esg", make_rows("esg", days))
+    manager = DataProductManager(str(tmp_path), store=partitions)
+
+    bundle = manager.materialize(manager.resolve("esg_sentiment_tracker_full.csv"))
+    body = b"".join(bundle)
+    assert body == to_export(partitions.load("esg"), "esg").to_csv(index=False).encode()
+    assert bundle.size == len(body)
+    assert manager.cache.snapshot()["pinned"] == 0
+
+    # The quarter's header and months are already stored
+    quarter = manager.materialize(manager.resolve("esg_sentiment_tracker_2025_q1.csv"))
+    quarter.close()
+    stats = manager.cache.snapshot()["products"]
+    assert stats["esg_sentiment_tracker_2025_q1.csv"]["renders"] == 0
+    assert stats["esg_sentiment_tracker_full.csv"]["renders"] == 4
+    assert manager.cache.snapshot()["chunks"] == 4
+
+    # A rewritten month renders one new chunk and the old one is swept
+    partitions.upsert("esg", make_rows("esg", [datetime(2025, 2, 3)]))
+    again = manager.materialize(manager.resolve("esg_sentiment_tracker_full.csv"))
+    body = b"".join(again)
+    assert body == to_export(partitions.load("esg"), "esg").to_csv(index=False).encode()
+    assert manager.cache.snapshot()["products"]["esg_sentiment_tracker_full.csv"]["renders"] == 5
+    assert set(os.path.splitext(name)[0] for name in os.listdir(tmp_path / "chunks")) == manager.live_chunks()
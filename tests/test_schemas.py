@@ -0,0 +1,38 @@
+import json
+from datetime import datetime
+
+import numpy as np
+
+from http_cache import ResponseCache
+from schemas import apply_schema, to_export, to_records
+
+
+def test_to_records_turns_missing_values_into_none(make_rows):
+    rows = make_rows("esg", [datetime(2025, 1, 1)])
+    # A legacy file with an unparseable integer and an empty category
+    legacy = to_export(rows, "esg")
+    legacy["esg_claims"] = legacy["esg_claims"].astype(str)
+    legacy.loc[0, "esg_claims"] = "n/a"
+    legacy.loc[1, "regulatory_risk"] = None
+    df = apply_schema(legacy, "esg")
+    assert df["esg_claims"].dtype == np.float32
+
+    records = to_records(df)
+    assert records[0]["esg_claims"] is None
+    assert records[1]["regulatory_risk"] is None
+    assert records[1]["esg_claims"] == int(rows.loc[1, "esg_claims"])
+    assert records[0]["date"] == "2025-01-01"
+
+    # Starlette's JSON encoder refuses NaN; the API caches these records as JSON
+    ResponseCache().put("/api/preview/esg", 1, {"history": records}, 0)
+    json.dumps(records, allow_nan=False)
+
+
+def test_to_records_keeps_float32_values_short(make_rows):
+    df = make_rows("supply_chain", [datetime(2025, 1, 1)])
+    float_col = next(c for c in df.columns if df[c].dtype == np.float32)
+    df.loc[0, float_col] = np.float32(4.2)
+    df.loc[1, float_col] = np.inf
+    records = to_records(df)
+    assert records[0][float_col] == 4.2
+    assert records[1][float_col] is None
@@ -0,0 +1,67 @@
+import json
+import os
+
+import pytest
+
+import update_data
+from partitions import PartitionStore
+from update_data import PremiumDataEngine, UniverseMismatch
+
+
+@pytest.fixture
+def data_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(update_data, "DATA_DIR", str(tmp_path))
+    return tmp_path
+
+
+def latest_companies(store, vertical):
+    return store.load(vertical, start=store.max_date(vertical))["company"].nunique()
+
+
+def test_other_scale_on_an_existing_store_fails_loudly(data_dir):
+    PremiumDataEngine().run_pipeline(verticals=["esg"])
+    store = PartitionStore(str(data_dir))
+    assert store.universe("esg")["companies"] == 5
+    fingerprint = store.fingerprint("esg")
+
+    with pytest.raises(UniverseMismatch, match="companies 5 -> 8"):
+        PremiumDataEngine(companies=8).run_pipeline(verticals=["esg"])
+    assert store.fingerprint("esg") == fingerprint
+
+    # The same settings as the stored history still update it
+    report = PremiumDataEngine().run_pipeline(verticals=["esg"])["stages"]
+    assert report["ingest:esg"]["status"] == "skipped"
+
+
+def test_rebuild_regenerates_history_for_the_new_universe(data_dir):
+    PremiumDataEngine().run_pipeline(verticals=["esg"])
+    PremiumDataEngine(companies=8).run_pipeline(verticals=["esg"], rebuild=True)
+
+    store = PartitionStore(str(data_dir))
+    assert store.universe("esg") == PremiumDataEngine(companies=8).universe("esg")
+    assert latest_companies(store, "esg") == 8
+    assert store.load("esg")["company"].nunique() == 8
+    with open(os.path.join(data_dir, "drift", "esg.json")) as f:
+        drift = json.load(f)
+    assert next(iter(drift["columns"].values()))["count"] == store.total_rows("esg")
+
+    report = PremiumDataEngine(companies=8).run_pipeline(verticals=["esg"])["stages"]
+    assert report["ingest:esg"]["status"] == "skipped"
+
+
+def test_stores_without_recorded_settings_are_checked_by_company_count(data_dir):
+    PremiumDataEngine().run_pipeline(verticals=["esg"])
+    store = PartitionStore(str(data_dir))
+    index_path = os.path.join(data_dir, "store", "esg", "_index.json")
+    with open(index_path) as f:
+        index = json.load(f)
+    del index["universe"]
+    with open(index_path, "w") as f:
+        json.dump(index, f)
+    # Runs from before the settings were recorded left other ingest inputs behind
+    os.remove(os.path.join(data_dir, "pipeline_state.json"))
+
+    with pytest.raises(UniverseMismatch):
+        PremiumDataEngine(companies=8).run_pipeline(verticals=["esg"])
+    PremiumDataEngine().run_pipeline(verticals=["esg"])
+    assert store.universe("esg") == PremiumDataEngine().universe("esg")
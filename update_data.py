@@ -1,12 +1,25 @@
 import os
+import calendar
 import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
 import logging
-import random
+import json
 from faker import Faker
 from google_play_scraper import app as play_app
 import concurrent.futures
+import metrics
+from profiling import span
+from seeding import ROOT_SEED, day_stream, daily_draw, yearly_draws, content_hash
+from partitions import PartitionStore, VERTICAL_BASENAMES
+from schemas import apply_schema, to_export
+from streaming import publish
+from event_log import log_event
+from pipeline_dag import PipelineDAG, file_state
+from product_manager import DataProductManager
+from panel import PanelStore
+from drift import DriftMonitor
+from data_access import DataAccess
 
 # Configure logging
 logging.basicConfig(
@@ -17,11 +30,84 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 fake = Faker()
+fake.seed_instance(ROOT_SEED)
 DATA_DIR = os.getenv("DATA_DIR", "data")
 os.makedirs(DATA_DIR, exist_ok=True)
 
+# Fintech "smart money" signal: chance per day that accumulation starts, and
+# how many days the alpha window stays open afterwards.
+FINTECH_SIGNAL_PROB = 0.02
+FINTECH_SIGNAL_DAYS = 14
+
+# Pipeline DAG stages run at once (threads); PIPELINE_WORKERS sizes the backfill process pool
+PIPELINE_CONCURRENCY = int(os.getenv("PIPELINE_CONCURRENCY", "4"))
+
+# The companies each vertical covers by default
+COMPANIES = {
+    "fintech": ["Revolut", "Chime", "N26", "Monzo", "SoFi"],
+    "ai_talent": ["OpenAI", "Anthropic", "StabilityAI", "Cohere", "Hugging Face"],
+    "esg": ["Tesla", "ExxonMobil", "Unilever", "BlackRock", "Patagonia"],
+    "regulatory": ["Meta", "Coinbase", "Amazon", "Pfizer", "Goldman Sachs"],
+    "supply_chain": ["Apple", "Ford", "Nike", "Toyota", "Samsung"]
+}
+# Play Store packages of the fintech apps
+FINTECH_PACKAGES = {
+    "Revolut": "com.revolut.revolut",
+    "Chime": "com.chime.mobile",
+    "N26": "de.number26.android",
+    "Monzo": "co.uk.getmondo",
+    "SoFi": "com.sofi.mobile"
+}
+
+# Scale mode: companies per vertical (synthetic ones are added after the
+# named five; 0 = the named five only) and years of history to backfill
+SCALE_COMPANIES = int(os.getenv("SCALE_COMPANIES", "0"))
+SCALE_YEARS = int(os.getenv("SCALE_YEARS", "1"))
+# Companies generated together in a backfill, so a block's yearly_draws()
+# stay within the seeding cache (a few entries per company)
+COMPANY_BLOCK = 512
+
+
+def company_universe(vertical, size=0, seed=ROOT_SEED):
+    """
+    The vertical's companies: the named five, followed by synthetic Faker
+    companies up to `size`. Names are seeded by (seed, vertical), so every
+    process builds the same universe, and have no commas so they can be
+    passed in comma-separated query parameters.
+    """
+    names = list(COMPANIES[vertical])
+    if size <= len(names):
+        return names
+    faker = Faker()
+    faker.seed_instance(f"{seed}:{vertical}")
+    seen = set(names)
+    while len(names) < size:
+        name = faker.company().replace(",", "")
+        if name in seen:
+            name = f"{name} {len(names)}"
+            if name in seen:
+                continue
+        seen.add(name)
+        names.append(name)
+    return names
+
+
+def _generate_chunk(seed, key, dates, companies=None):
+    """Process-pool entry point: generate rows for a slice of dates (and of companies)."""
+    engine = PremiumDataEngine(seed=seed, companies=0 if companies else None)
+    generator = engine.verticals[key]
+    rows = []
+    for d in dates:
+        rows.extend(generator(d, companies))
+    return rows
+
+
+class UniverseMismatch(ValueError):
+    """The stored history was generated with other settings than the pipeline was run with."""
+
+
 class PremiumDataEngine:
-    def __init__(self):
+    def __init__(self, seed=None, companies=None, years=None):
         self.verticals = {
             "fintech": self.generate_fintech_data,
             "ai_talent": self.generate_ai_talent_data,
@@ -29,8 +115,21 @@ class PremiumDataEngine:
             "regulatory": self.generate_regulatory_data,
             "supply_chain": self.generate_supply_chain_data
         }
-        # State tracking for continuity
-        self.fintech_state = {} 
+        # Every row is derived from (seed, vertical, company, date), so any
+        # day can be regenerated on its own and the output is reproducible.
+        self.seed = ROOT_SEED if seed is None else seed
+        # Scale mode (see SCALE_COMPANIES / SCALE_YEARS)
+        self.scale = SCALE_COMPANIES if companies is None else companies
+        self.years = years or SCALE_YEARS
+        self.companies = {key: company_universe(key, self.scale, self.seed) for key in self.verticals}
+
+    def universe(self, key):
+        """The settings a vertical's history is generated with, recorded in the partition store."""
+        return {"seed": self.seed, "companies": len(self.companies[key]), "years": self.years}
+
+    def _rng(self, vertical, company, date_obj):
+        """Per-vertical, per-company, per-date random stream."""
+        return day_stream(vertical, company, date_obj, root_seed=self.seed)
 
     def generate_date_range(self, days_back=365):
         """Generate a list of dates for backfill."""
@@ -38,8 +137,75 @@ class PremiumDataEngine:
         start_date = end_date - timedelta(days=days_back)
         return pd.date_range(start=start_date, end=end_date).tolist()
 
+    def generate_history(self, key, dates, workers=None):
+        """
+        Generate rows for `dates`. Days are independent, so long backfills
+        can be fanned out over a process pool (PIPELINE_WORKERS) and still
+        produce exactly the same rows as a serial run. Large universes are
+        generated COMPANY_BLOCK companies at a time.
+        """
+        companies = self.companies[key]
+        blocks = [companies[i:i + COMPANY_BLOCK] for i in range(0, len(companies), COMPANY_BLOCK)]
+        workers = workers or int(os.getenv("PIPELINE_WORKERS", "1"))
+        if workers <= 1 or len(dates) * len(blocks) < 2 * workers:
+            rows = []
+            for block in blocks:
+                rows.extend(_generate_chunk(self.seed, key, dates, block))
+            return rows
+
+        chunk_size = -(-len(dates) // max(1, workers // len(blocks)))
+        chunks = [dates[i:i + chunk_size] for i in range(0, len(dates), chunk_size)]
+        tasks = [(block, chunk) for block in blocks for chunk in chunks]
+        rows = []
+        with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as pool:
+            for chunk_rows in pool.map(_generate_chunk, [self.seed] * len(tasks), [key] * len(tasks),
+                                       [chunk for _, chunk in tasks], [block for block, _ in tasks]):
+                rows.extend(chunk_rows)
+        return rows
+
+    def _fintech_signal_phase(self, name, date_obj):
+        """
+        Days remaining in the alpha window on `date_obj` (0 = quiet).
+        A signal that started `k` days ago has phase FINTECH_SIGNAL_DAYS - k;
+        the most recent onset wins if windows overlap.
+        """
+        day = date_obj.date()
+        idx = day.timetuple().tm_yday - 1
+        window = yearly_draws(self.seed, "fintech", name, "signal", day.year)[max(0, idx - FINTECH_SIGNAL_DAYS + 1):idx + 1]
+        if len(window) < FINTECH_SIGNAL_DAYS:
+            # Window reaches back into last year's draws
+            prev_year_days = 366 if calendar.isleap(day.year - 1) else 365
+            prev = yearly_draws(self.seed, "fintech", name, "signal", day.year - 1)
+            window = np.concatenate([prev[prev_year_days - (FINTECH_SIGNAL_DAYS - len(window)):prev_year_days], window])
+        onsets = np.flatnonzero(window < FINTECH_SIGNAL_PROB)
+        if len(onsets) == 0:
+            return 0
+        return FINTECH_SIGNAL_DAYS - (len(window) - 1 - int(onsets[-1]))
+
+    def _fintech_velocity(self, name, date_obj, phase):
+        """Download velocity for a day, reproducible so yesterday's value can be recomputed."""
+        base_velocity = 75
+        growth_factor = 1.02
+        days_passed = (date_obj - datetime(2025, 1, 1)).days
+        exponential_boost = base_velocity * (growth_factor ** max(0, days_passed/30))
+        velocity_boost = 50 * ((FINTECH_SIGNAL_DAYS - phase) / FINTECH_SIGNAL_DAYS) if phase > 0 else 0
+        noise = daily_draw(self.seed, "fintech", name, "velocity", date_obj, kind="normal")
+        return int(exponential_boost + velocity_boost + 10 * noise)
+
+    def _fintech_sentiment(self, name, date_obj):
+        """
+        Slow-moving review sentiment in [3.5, 4.9]: linear interpolation
+        between monthly anchors, replacing the old day-to-day random walk.
+        """
+        month_start = datetime(date_obj.year, date_obj.month, 1)
+        next_month = (month_start + timedelta(days=32)).replace(day=1)
+        anchor = 3.5 + 1.4 * daily_draw(self.seed, "fintech", name, "sentiment", month_start)
+        next_anchor = 3.5 + 1.4 * daily_draw(self.seed, "fintech", name, "sentiment", next_month)
+        frac = (date_obj - month_start).days / (next_month - month_start).days
+        return anchor + (next_anchor - anchor) * frac
+
     # --- 1. FINTECH GROWTH INTELLIGENCE ---
-    def generate_fintech_data(self, date_obj):
+    def generate_fintech_data(self, date_obj, companies=None):
         """
         Product 1: Fintech Growth Intelligence
         Columns: company, date, download_velocity, review_sentiment, hiring_spike, 
@@ -51,82 +217,53 @@ class PremiumDataEngine:
                  competitor_funding_gap, investor_engagement_score, api_traffic_growth,
                  feature_release_velocity, tech_stack_modernization
         """
-        companies = {
-            "Revolut": "com.revolut.revolut",
-            "Chime": "com.chime.mobile",
-            "N26": "de.number26.android",
-            "Monzo": "co.uk.getmondo",
-            "SoFi": "com.sofi.mobile"
-        }
-        
+        companies = companies or self.companies["fintech"]
+
         data = []
-        for name, pkg in companies.items():
-            # Initialize state if needed
-            if name not in self.fintech_state:
-                self.fintech_state[name] = {
-                    "signal_phase": 0, # 0 = Quiet, >0 = Active Signal
-                    "base_velocity": 75,
-                    "sentiment_trend": 4.2,
-                    "prev_downloads": 75
-                }
-            
-            state = self.fintech_state[name]
+        for name in companies:
+            rng = self._rng("fintech", name, date_obj)
             
             # 1. Determine Signal State (The "Smart Money" Logic)
-            hiring_spike = "No"
-            if state["signal_phase"] > 0:
-                state["signal_phase"] -= 1
-                if state["signal_phase"] == 12: # Start of signal
-                    hiring_spike = "Yes"
-            else:
-                if random.random() < 0.02:
-                    state["signal_phase"] = 14
-                    hiring_spike = "Yes"
+            signal_phase = self._fintech_signal_phase(name, date_obj)
+            hiring_spike = "Yes" if signal_phase in (FINTECH_SIGNAL_DAYS, FINTECH_SIGNAL_DAYS - 2) else "No"
 
             # 2. Calculate Metrics
-            growth_factor = 1.02 
-            days_passed = (date_obj - datetime(2025, 1, 1)).days
-            exponential_boost = state["base_velocity"] * (growth_factor ** max(0, days_passed/30))
-            
-            if state["signal_phase"] > 0:
-                signal_maturity = (14 - state["signal_phase"]) / 14
-                velocity_boost = 50 * signal_maturity
-                smart_money_score = int(85 + (10 * (1 - signal_maturity)) + random.uniform(-2, 2))
-                insight = f"Accumulation detected: {state['signal_phase']} days remaining in Alpha Window"
+            if signal_phase > 0:
+                signal_maturity = (FINTECH_SIGNAL_DAYS - signal_phase) / FINTECH_SIGNAL_DAYS
+                smart_money_score = int(85 + (10 * (1 - signal_maturity)) + rng.uniform(-2, 2))
+                insight = f"Accumulation detected: {signal_phase} days remaining in Alpha Window"
             else:
-                velocity_boost = 0
-                smart_money_score = int(random.normalvariate(50, 10))
+                smart_money_score = int(rng.normal(50, 10))
                 insight = "Stable accumulation - no institutional anomalies"
 
-            download_velocity = int(np.random.normal(exponential_boost + velocity_boost, 10))
+            download_velocity = self._fintech_velocity(name, date_obj, signal_phase)
             
-            # Calculate Acceleration
-            download_acceleration = download_velocity - state["prev_downloads"]
-            state["prev_downloads"] = download_velocity
+            # Calculate Acceleration against yesterday's (recomputed) velocity
+            yesterday = date_obj - timedelta(days=1)
+            prev_downloads = self._fintech_velocity(name, yesterday, self._fintech_signal_phase(name, yesterday))
+            download_acceleration = download_velocity - prev_downloads
             
             # Sentiment drift
-            state["sentiment_trend"] += random.uniform(-0.05, 0.05)
-            state["sentiment_trend"] = max(3.5, min(4.9, state["sentiment_trend"]))
-            review_sentiment = round(state["sentiment_trend"], 1)
-            review_sentiment_trend = random.uniform(-0.1, 0.1) # Slope
+            review_sentiment = round(self._fintech_sentiment(name, date_obj), 1)
+            review_sentiment_trend = rng.uniform(-0.1, 0.1) # Slope
 
-            feature_lead = random.randint(60, 95)
+            feature_lead = int(rng.integers(60, 96))
             adoption_velocity = int((download_velocity * 0.6) + (feature_lead * 0.4))
             churn_risk = max(1, min(10, int((5.0 - review_sentiment) * 10)))
             funding_signal = "Strong" if hiring_spike == "Yes" else "Moderate" if adoption_velocity > 100 else "Weak"
-            cac_proxy = random.randint(35, 85) # Changed to int for ML
-            alpha_window_days = state["signal_phase"] if state["signal_phase"] > 0 else 0
+            cac_proxy = int(rng.integers(35, 86)) # Changed to int for ML
+            alpha_window_days = signal_phase
 
             # NEW ML FEATURES
             engineer_hiring_spike = 1 if hiring_spike == "Yes" else 0
-            executive_departure_score = random.randint(0, 100)
-            recruiting_intensity = random.uniform(0.5, 5.0)
-            burn_rate_proxy = random.uniform(1.0, 10.0) # $M/month
-            competitor_funding_gap = random.randint(0, 365)
-            investor_engagement_score = random.randint(0, 100)
-            api_traffic_growth = random.uniform(-10, 50)
-            feature_release_velocity = random.randint(1, 10)
-            tech_stack_modernization = random.choice([0, 1])
+            executive_departure_score = int(rng.integers(0, 101))
+            recruiting_intensity = rng.uniform(0.5, 5.0)
+            burn_rate_proxy = rng.uniform(1.0, 10.0) # $M/month
+            competitor_funding_gap = int(rng.integers(0, 366))
+            investor_engagement_score = int(rng.integers(0, 101))
+            api_traffic_growth = rng.uniform(-10, 50)
+            feature_release_velocity = int(rng.integers(1, 11))
+            tech_stack_modernization = int(rng.integers(0, 2))
 
             data.append({
                 "company": name,
@@ -158,7 +295,7 @@ class PremiumDataEngine:
         return data
 
     # --- 2. AI TALENT & CAPITAL PREDICTION ---
-    def generate_ai_talent_data(self, date_obj):
+    def generate_ai_talent_data(self, date_obj, companies=None):
         """
         Product 2: AI Talent & Capital Prediction
         Columns: company, date, github_stars_7d, arxiv_papers, citations, patents_filed, 
@@ -167,29 +304,31 @@ class PremiumDataEngine:
                  # ML FEATURES
                  performance_leap_magnitude, commercialization_timeline
         """
-        companies = ["OpenAI", "Anthropic", "StabilityAI", "Cohere", "Hugging Face"]
+        companies = companies or self.companies["ai_talent"]
         
         data = []
         for co in companies:
+            rng = self._rng("ai_talent", co, date_obj)
+            
             # Exponential Interest Curve
             days_passed = (date_obj - datetime(2025, 1, 1)).days
             interest_compound = 1.015 ** max(0, days_passed/7) # Weekly compounding
             
             base_stars = 200
-            github_stars = f"+{int(np.random.exponential(base_stars * interest_compound))}"
-            arxiv = np.random.poisson(2 * (1 + days_passed/365)) # Linear growth for papers
-            citations = int(np.random.exponential(50))
-            patents = np.random.poisson(0.5)
-            investor_engagement = random.choice(["High", "Medium", "Low"])
+            github_stars = int(rng.exponential(base_stars * interest_compound))
+            arxiv = int(rng.poisson(max(0, 2 * (1 + days_passed/365)))) # Linear growth for papers
+            citations = int(rng.exponential(50))
+            patents = int(rng.poisson(0.5))
+            investor_engagement = ["High", "Medium", "Low"][rng.integers(3)]
             
             # Proprietary Metrics
-            tech_momentum = min(100, int((arxiv * 10) + (citations * 0.5) + (int(github_stars.replace('+',''))/10)))
-            talent_score = random.randint(60, 99)
-            funding_prob = f"{min(99, int(tech_momentum * 0.8 + talent_score * 0.1))}%"
+            tech_momentum = min(100, int((arxiv * 10) + (citations * 0.5) + (github_stars/10)))
+            talent_score = int(rng.integers(60, 100))
+            funding_prob = min(99, int(tech_momentum * 0.8 + talent_score * 0.1))
             
             # New Profit Metrics
-            innovation_delay_days = random.choice([0, 0, 0, 30, 60, 90, 180])
-            benchmark_inflation_pct = random.randint(0, 50)
+            innovation_delay_days = [0, 0, 0, 30, 60, 90, 180][rng.integers(7)]
+            benchmark_inflation_pct = int(rng.integers(0, 51))
             flight_status = "On Time" if innovation_delay_days == 0 else "Delayed"
             if tech_momentum > 90:
                 flight_status = "Accelerating"
@@ -202,8 +341,8 @@ class PremiumDataEngine:
                 insight = "Steady technical output, organic growth phase"
 
             # ML Features
-            performance_leap_magnitude = random.uniform(10.0, 50.0) # % improvement
-            commercialization_timeline = random.randint(3, 18) # months
+            performance_leap_magnitude = rng.uniform(10.0, 50.0) # % improvement
+            commercialization_timeline = int(rng.integers(3, 19)) # months
 
             data.append({
                 "company": co,
@@ -227,7 +366,7 @@ class PremiumDataEngine:
         return data
 
     # --- 3. ESG IMPACT & GREENWASHING DETECTOR ---
-    def generate_esg_data(self, date_obj):
+    def generate_esg_data(self, date_obj, companies=None):
         """
         Product 3: ESG Impact & Greenwashing Detector
         Columns: company, date, esg_claims, verifiable_actions, greenwashing_index, 
@@ -237,18 +376,19 @@ class PremiumDataEngine:
                  audit_gap_size, supplier_esg_score, employee_whistleblower_count,
                  carbon_credit_validity_score
         """
-        companies = ["Tesla", "ExxonMobil", "Unilever", "BlackRock", "Patagonia"]
+        companies = companies or self.companies["esg"]
         
         data = []
         for co in companies:
-            claims = random.randint(10, 50)
-            verified = int(claims * random.uniform(0.2, 0.9))
+            rng = self._rng("esg", co, date_obj)
+            claims = int(rng.integers(10, 51))
+            verified = int(claims * rng.uniform(0.2, 0.9))
             
             # Proprietary Metrics
             greenwashing_index = int((1 - (verified/claims)) * 100)
             reg_risk = "High" if greenwashing_index > 60 else "Medium" if greenwashing_index > 30 else "Low"
-            stakeholder_score = random.randint(40, 95)
-            impact_verified = f"{int((verified/claims)*100)}%"
+            stakeholder_score = int(rng.integers(40, 96))
+            impact_verified = int((verified/claims)*100)
             
             # New Profit Metrics
             claims_psi = 100
@@ -264,9 +404,9 @@ class PremiumDataEngine:
 
             # ML Features
             audit_gap_size = claims - verified
-            supplier_esg_score = random.randint(0, 100)
-            employee_whistleblower_count = random.randint(0, 5)
-            carbon_credit_validity_score = random.randint(0, 100)
+            supplier_esg_score = int(rng.integers(0, 101))
+            employee_whistleblower_count = int(rng.integers(0, 6))
+            carbon_credit_validity_score = int(rng.integers(0, 101))
 
             data.append({
                 "company": co,
@@ -290,7 +430,7 @@ class PremiumDataEngine:
         return data
 
     # --- 4. REGULATORY COMPLIANCE PREDICTION ---
-    def generate_regulatory_data(self, date_obj):
+    def generate_regulatory_data(self, date_obj, companies=None):
         """
         Product 4: Regulatory Compliance Prediction
         Columns: company, date, enforcement_probability, compliance_gap, fines_estimate, 
@@ -299,20 +439,21 @@ class PremiumDataEngine:
                  # ML FEATURES
                  action_timeline_days
         """
-        companies = ["Meta", "Coinbase", "Amazon", "Pfizer", "Goldman Sachs"]
+        companies = companies or self.companies["regulatory"]
         
         data = []
         for co in companies:
-            enf_prob = random.randint(10, 90)
+            rng = self._rng("regulatory", co, date_obj)
+            enf_prob = int(rng.integers(10, 91))
             gap = "Large" if enf_prob > 70 else "Medium" if enf_prob > 40 else "Small"
-            fines = f"${random.randint(10, 5000)}M"
-            remediation = f"${random.randint(5, 1000)}M"
+            fines = int(rng.integers(10, 5001)) # $M
+            remediation = int(rng.integers(5, 1001)) # $M
             whistleblower = "High" if enf_prob > 60 else "Low"
-            foresight = random.randint(20, 90)
+            foresight = int(rng.integers(20, 91))
             
             # New Profit Metrics
             enforcement_probability_pct = enf_prob
-            fine_impact_usd = random.randint(10, 5000) * 1000000
+            fine_impact_usd = int(rng.integers(10, 5001)) * 1000000
             
             if enf_prob > 75:
                 insight = "High risk of antitrust action - compliance gaps significant"
@@ -322,12 +463,12 @@ class PremiumDataEngine:
                 insight = "Moderate risk - improving compliance but scrutiny remains"
 
             # ML Features
-            action_timeline_days = random.randint(30, 180)
+            action_timeline_days = int(rng.integers(30, 181))
 
             data.append({
                 "company": co,
                 "date": date_obj.strftime("%Y-%m-%d"),
-                "enforcement_probability": f"{enf_prob}%",
+                "enforcement_probability": enf_prob,
                 "compliance_gap": gap,
                 "fines_estimate": fines,
                 "remediation_cost": remediation,
@@ -342,7 +483,7 @@ class PremiumDataEngine:
         return data
 
     # --- 5. SUPPLY CHAIN RESILIENCE ---
-    def generate_supply_chain_data(self, date_obj):
+    def generate_supply_chain_data(self, date_obj, companies=None):
         """
         Product 5: Supply Chain Resilience
         Columns: company, date, disruption_risk, recovery_days, single_point_failure, 
@@ -351,19 +492,20 @@ class PremiumDataEngine:
                  # ML FEATURES
                  impact_revenue_pct
         """
-        companies = ["Apple", "Ford", "Nike", "Toyota", "Samsung"]
+        companies = companies or self.companies["supply_chain"]
         
         data = []
         for co in companies:
-            risk = random.randint(10, 80)
+            rng = self._rng("supply_chain", co, date_obj)
+            risk = int(rng.integers(10, 81))
             recovery = int(risk * 0.6)
             failure_pt = "High" if risk > 60 else "Medium" if risk > 30 else "Low"
-            inflation = f"{round(random.uniform(1.0, 15.0), 1)}%"
+            inflation = round(rng.uniform(1.0, 15.0), 1) # %
             resilience = 100 - risk
             
             # New Profit Metrics
             disruption_probability = risk
-            days_to_impact = random.randint(5, 60)
+            days_to_impact = int(rng.integers(5, 61))
             
             if risk > 60:
                 insight = "High battery/chip supply risk - alternative suppliers needed urgently"
@@ -373,7 +515,7 @@ class PremiumDataEngine:
                 insight = "Stable supply chain with moderate inflationary pressure"
 
             # ML Features
-            impact_revenue_pct = random.uniform(0.5, 5.0)
+            impact_revenue_pct = rng.uniform(0.5, 5.0)
 
             data.append({
                 "company": co,
@@ -391,96 +533,265 @@ class PremiumDataEngine:
             })
         return data
 
-    def run_pipeline(self):
-        """Run the full data pipeline (Backfill + Update)."""
+    def run_pipeline(self, verticals=None, workers=None, rebuild=False):
+        """
+        Run the data pipeline (Backfill + Update) as a DAG, optionally for a
+        subset of verticals:
+
+            ingest:{v} -> legacy:{v} -> status
+            ingest:{v} -> drift:{v} --> status
+            ingest:*   -> panel -----> status
+            prune:{v} ---------------> status
+
+        Catalog products (bundle/yearly/quarterly) are not written here; they
+        are rendered from the partition store on first download (see
+        DataProductManager.materialize). prune:{v} deletes the product files
+        earlier versions generated up front. `panel` re-joins the months of
+        the cross-vertical panel whose source partitions changed. drift:{v}
+        folds the vertical's new rows into its drift statistics (drift.py);
+        open alerts are written to status.json.
+
+        Stages whose inputs and outputs are unchanged since the last run are
+        skipped (see pipeline_dag.py) and independent stages run concurrently.
+
+        ingest:{v} raises UniverseMismatch when the stored history was
+        generated for another company universe, seed or number of years;
+        with `rebuild` it deletes that history and backfills it again.
+        """
         logger.info("Starting Premium Data Engine Pipeline...")
-        
-        # Define file paths
-        files = {
-            "fintech": "fintech_growth_digest.csv",
-            "ai_talent": "ai_talent_heatmap.csv",
-            "esg": "esg_sentiment_tracker.csv",
-            "regulatory": "regulatory_risk_index.csv",
-            "supply_chain": "supply_chain_risk.csv"
-        }
-        
-        total_added_bytes = 0
-        details = {}
-        
-        for key, generator in self.verticals.items():
-            base_filename = files[key].replace('.csv', '')
-            
-            # 1. Generate or Load Full Dataset
-            full_df = pd.DataFrame()
-            
-            # Check if we have existing data to append to
-            # We'll look for the Yearly file as the "master"
-            yearly_path = os.path.join(DATA_DIR, f"{base_filename}_2025_yearly.csv")
-            
-            if not os.path.exists(yearly_path):
-                logger.info(f"Backfilling {key} (365 days)...")
-                dates = self.generate_date_range(365)
-                all_data = []
-                for d in dates:
-                    all_data.extend(generator(d))
-                full_df = pd.DataFrame(all_data)
+        unknown = set(verticals or ()) - set(self.verticals)
+        if unknown:
+            raise ValueError(f"Unknown verticals: {sorted(unknown)}")
+        selected = [key for key in self.verticals if verticals is None or key in verticals]
+
+        store = PartitionStore(DATA_DIR)
+        # Stages reading the same slice at once (legacy, drift) share one read
+        reader = DataAccess(store)
+        products = DataProductManager(DATA_DIR, store=store)
+        self._load_content_hashes()
+        today = datetime.now()
+        dag = PipelineDAG(os.path.join(DATA_DIR, "pipeline_state.json"))
+        drift = DriftMonitor(DATA_DIR)
+
+        for key in selected:
+            base_filename = VERTICAL_BASENAMES[key]
+            legacy_path = os.path.join(DATA_DIR, f"{base_filename}.csv")
+            ingest = dag.add(
+                f"ingest:{key}", lambda deps, key=key: self._ingest(store, key, today, rebuild),
+                inputs=lambda key=key: {"date": today.strftime("%Y-%m-%d"), "retention_years": store.retention_years,
+                                        **self.universe(key)},
+                outputs=lambda key=key: store.fingerprint(key)
+            )
+            dag.add(
+                f"legacy:{key}", lambda deps, key=key, ingest=ingest: self._write_legacy(reader, key, deps[ingest]),
+                after=[ingest],
+                outputs=lambda path=legacy_path: file_state([path])
+            )
+            dag.add(
+                f"drift:{key}",
+                lambda deps, key=key, ingest=ingest: drift.update(
+                    reader, key, reset=bool(deps[ingest] and deps[ingest]["rebuilt"])),
+                after=[ingest],
+                inputs=lambda key=key: store.fingerprint(key),
+                outputs=lambda key=key: drift.max_date(key)
+            )
+            dag.add(
+                f"prune:{key}", lambda deps, key=key: products.remove_eager_files(key),
+                outputs=lambda key=key: file_state(products.eager_files(key))
+            )
+        panel = PanelStore(DATA_DIR)
+        dag.add(
+            "panel", lambda deps: panel.update(store),
+            after=[f"ingest:{key}" for key in selected],
+            inputs=lambda: {v: store.fingerprint(v) for v in VERTICAL_BASENAMES},
+            outputs=panel.fingerprint
+        )
+        dag.add("status", lambda deps: self.finalize_status(drift=drift.alerts()), after=list(dag.stages))
+
+        # Per-vertical progress once all four of its stages are done
+        ingested = {}
+        remaining = {key: 4 for key in selected}
+
+        def on_complete(name, status, result):
+            kind, _, key = name.partition(":")
+            if not key:
+                return
+            if kind == "ingest":
+                ingested[key] = result
+            remaining[key] -= 1
+            if remaining[key]:
+                return
+            done = sum(1 for left in remaining.values() if left == 0)
+            result = ingested.get(key) or {}
+            metrics.PIPELINE_ROWS.set(store.total_rows(key), vertical=key)
+            new_rows = int(len(result.get("new_df", ())))
+            log_event("pipeline", f"{key}: {new_rows} new rows, {store.total_rows(key)} total.",
+                      vertical=key, new_rows=new_rows, max_date=store.max_date(key))
+            publish("pipeline", {
+                "vertical": key,
+                "stage": "updated",
+                "new_rows": new_rows,
+                "changed_partitions": len(result.get("changed", ())),
+                "total_rows": store.total_rows(key),
+                "max_date": store.max_date(key),
+                "progress": int(done / len(selected) * 100)
+            }, key=key)
+
+        publish("pipeline", {"stage": "started", "progress": 0}, key="run")
+        log_event("pipeline", f"Pipeline started for {', '.join(selected)}.")
+        try:
+            report, results = dag.run(workers=workers or PIPELINE_CONCURRENCY, on_complete=on_complete)
+        except Exception as e:
+            log_event("pipeline", f"Pipeline failed: {e}", level="error")
+            raise
+        finally:
+            self._save_content_hashes()
+        skipped = sorted(name for name, info in report.items() if info["status"] == "skipped")
+        logger.info(f"Pipeline finished: {len(report) - len(skipped)} stages ran, {len(skipped)} skipped")
+        log_event("pipeline", f"Pipeline finished: {len(report) - len(skipped)} stages ran, {len(skipped)} skipped.",
+                  ran=len(report) - len(skipped), skipped=len(skipped))
+
+        status = dict(results["status"], stages=report)
+        publish("pipeline", {"stage": "complete", "progress": 100, "last_update": status["last_update"]}, key="run")
+        return status
+
+    def _ingest(self, store, key, today, rebuild=False):
+        """
+        Generate (or import) the vertical's new rows and merge them into the
+        partition store. History generated with other settings than
+        universe(key) is regenerated with `rebuild` (see _universe_changed).
+        """
+        base_filename = VERTICAL_BASENAMES[key]
+        legacy_path = os.path.join(DATA_DIR, f"{base_filename}.csv")
+
+        # The partition store is the master; only today's rows are
+        # generated once history exists.
+        rebuilt = False
+        new_df = None
+        if store.partitions(key):
+            if self._universe_changed(key, store.universe(key),
+                                      lambda: store.load(key, start=store.max_date(key)), rebuild):
+                store.clear(key)
+                rebuilt = True
+        elif os.path.exists(legacy_path):
+            # One-time migration of the flat legacy file into partitions
+            logger.info(f"Importing existing {key} history into partition store...")
+            with span("pipeline", metrics.PIPELINE_STAGE_SECONDS, vertical=key, stage="load"), \
+                    metrics.CSV_PARSE_SECONDS.time(source="pipeline"):
+                new_df = apply_schema(pd.read_csv(legacy_path, float_precision="round_trip"), key)
+            if self._universe_changed(key, None, lambda: new_df[new_df["date"] == new_df["date"].max()], rebuild):
+                new_df = None
+                rebuilt = True
+
+        rebuild_legacy = new_df is not None or not store.partitions(key)
+        if new_df is None and not store.partitions(key):
+            logger.info(f"Backfilling {key} ({365 * self.years} days, {len(self.companies[key])} companies)...")
+            with span("pipeline", metrics.PIPELINE_STAGE_SECONDS, vertical=key, stage="generate"):
+                dates = self.generate_date_range(365 * self.years)
+                new_df = apply_schema(pd.DataFrame(self.generate_history(key, dates)), key)
+        elif new_df is None:
+            logger.info(f"Updating {key} (Daily)...")
+            if store.has_date(key, today):
+                new_df = pd.DataFrame()
             else:
-                logger.info(f"Updating {key} (Daily)...")
-                # Load existing
-                full_df = pd.read_csv(yearly_path)
-                
-                # Generate today's data
-                today = datetime.now()
-                today_str = today.strftime("%Y-%m-%d")
-                
-                # Check if today exists
-                if today_str not in full_df['date'].values:
-                    today_data = generator(today)
-                    new_row = pd.DataFrame(today_data)
-                    full_df = pd.concat([full_df, new_row], ignore_index=True)
-            
-            # 2. Save Split Files
-            # Ensure 'date' is datetime
-            full_df['date'] = pd.to_datetime(full_df['date'])
-            
-            # Save Yearly (2025)
-            df_2025 = full_df[full_df['date'].dt.year == 2025]
-            if not df_2025.empty:
-                df_2025.to_csv(yearly_path, index=False)
-                details[f"{base_filename}_2025_yearly.csv"] = os.path.getsize(yearly_path)
-            
-            # Save Quarterlys
-            for q in [1, 2, 3, 4]:
-                df_q = df_2025[df_2025['date'].dt.quarter == q]
-                if not df_q.empty:
-                    q_path = os.path.join(DATA_DIR, f"{base_filename}_2025_q{q}.csv")
-                    df_q.to_csv(q_path, index=False)
-                    details[f"{base_filename}_2025_q{q}.csv"] = os.path.getsize(q_path)
-
-            # Save "Latest" for Preview API (Legacy support)
-            # We'll just overwrite the original filename so API doesn't break immediately
-            legacy_path = os.path.join(DATA_DIR, files[key])
-            full_df.to_csv(legacy_path, index=False)
-
-        return self.finalize_status()
-
-    def finalize_status(self):
+                with span("pipeline", metrics.PIPELINE_STAGE_SECONDS, vertical=key, stage="generate"):
+                    new_df = apply_schema(pd.DataFrame(self.verticals[key](today)), key)
+
+        # Merge new rows into the touched month partitions
+        with span("pipeline", metrics.PIPELINE_STAGE_SECONDS, vertical=key, stage="split"):
+            changed = store.upsert(key, new_df)
+            removed = store.apply_retention(key)
+        store.set_universe(key, self.universe(key))
+        return {"new_df": new_df, "changed": changed, "removed": removed,
+                "rebuild_legacy": rebuild_legacy, "rebuilt": rebuilt}
+
+    def _universe_changed(self, key, stored, latest_rows, rebuild):
+        """
+        Whether the vertical's stored history has to be regenerated because
+        it was generated with other settings (`stored`, see universe()). A
+        mismatch raises UniverseMismatch unless `rebuild` is set, so scale
+        options never silently do nothing on an existing DATA_DIR. History
+        from before the settings were recorded (`stored` is None) is checked
+        by the number of companies on its latest day (`latest_rows()`).
+        """
+        current = self.universe(key)
+        if stored is None:
+            stored = {"companies": int(latest_rows()["company"].nunique())}
+        differences = {field: (stored[field], value) for field, value in current.items()
+                       if field in stored and stored[field] != value}
+        if not differences:
+            return False
+        described = ", ".join(f"{field} {old} -> {new}" for field, (old, new) in sorted(differences.items()))
+        if not rebuild:
+            raise UniverseMismatch(
+                f"{key} history in {DATA_DIR} was generated with other settings ({described}); "
+                f"run with the stored settings, or with --rebuild to regenerate it"
+            )
+        logger.warning(f"Regenerating {key} history: {described}")
+        log_event("pipeline", f"{key}: regenerating history ({described}).", level="warning",
+                  vertical=key, changed={field: new for field, (_, new) in differences.items()})
+        return True
+
+    def _write_legacy(self, reader, key, ingest):
+        """
+        Save "Latest" for Preview API (Legacy support).
+        Appending keeps the daily cost flat; a full rewrite only happens on
+        first build, when retention drops history, or when the file no
+        longer matches what the last run wrote.
+        """
+        legacy_path = os.path.join(DATA_DIR, f"{VERTICAL_BASENAMES[key]}.csv")
+        with span("pipeline", metrics.PIPELINE_STAGE_SECONDS, vertical=key, stage="legacy"):
+            if ingest is None or ingest["rebuild_legacy"] or ingest["removed"] or not os.path.exists(legacy_path):
+                self._write_if_changed(reader.load(key), legacy_path, key)
+            elif not ingest["new_df"].empty:
+                to_export(ingest["new_df"], key).to_csv(legacy_path, mode='a', header=False, index=False)
+                self.content_hashes.pop(os.path.basename(legacy_path), None)
+
+    def _load_content_hashes(self):
+        path = os.path.join(DATA_DIR, "content_hashes.json")
+        self.content_hashes = {}
+        if os.path.exists(path):
+            with open(path) as f:
+                self.content_hashes = json.load(f)
+
+    def _save_content_hashes(self):
+        with open(os.path.join(DATA_DIR, "content_hashes.json"), "w") as f:
+            json.dump(self.content_hashes, f, indent=2, sort_keys=True)
+
+    def _write_if_changed(self, df, path, vertical):
+        """
+        Export typed `df` to `path` (with display formatting) unless the file
+        already holds identical content. Generation is deterministic, so
+        untouched partitions hash the same every run and are skipped.
+        Returns True if the file was written.
+        """
+        name = os.path.basename(path)
+        digest = content_hash(df)
+        if self.content_hashes.get(name) == digest and os.path.exists(path):
+            metrics.record_cache("pipeline_partitions", hit=True)
+            return False
+        to_export(df, vertical).to_csv(path, index=False)
+        self.content_hashes[name] = digest
+        metrics.record_cache("pipeline_partitions", hit=False)
+        return True
+
+    def finalize_status(self, drift=None):
         # Calculate total size of data folder
         total_size = sum(os.path.getsize(os.path.join(DATA_DIR, f)) for f in os.listdir(DATA_DIR) if f.endswith('.csv'))
         
         # Save Status
-        import json
         status = {
             "last_update": datetime.now().strftime("%Y-%m-%d %H:%M:%S UTC"),
             "total_data_size_bytes": total_size,
-            "status": "Premium Data Pipeline Active"
+            "status": "Premium Data Pipeline Active",
+            "drift_alerts": drift or {}
         }
         with open(os.path.join(DATA_DIR, "status.json"), "w") as f:
             json.dump(status, f)
         return status
 
-def update_dataset():
-    engine = PremiumDataEngine()
+def update_dataset(verticals=None, workers=None, companies=None, years=None, rebuild=False):
+    engine = PremiumDataEngine(companies=companies, years=years)
     
     # Measure sizes before
     before_sizes = {}
@@ -488,7 +799,7 @@ def update_dataset():
         if f.endswith(".csv"):
             before_sizes[f] = os.path.getsize(os.path.join(DATA_DIR, f))
             
-    engine.run_pipeline()
+    result = engine.run_pipeline(verticals=verticals, workers=workers, rebuild=rebuild)
     
     # Measure sizes after
     total_added = 0
@@ -503,17 +814,31 @@ def update_dataset():
                 details[f] = diff
                 
     # Update status with delta
-    import json
     status_path = os.path.join(DATA_DIR, "status.json")
     if os.path.exists(status_path):
         with open(status_path, 'r') as f:
             st = json.load(f)
         st['total_added_bytes'] = total_added
         st['details'] = details
+        st['stages'] = {
+            outcome: sum(1 for info in result["stages"].values() if info["status"] == outcome)
+            for outcome in ("ran", "skipped", "failed", "blocked")
+        }
         with open(status_path, 'w') as f:
             json.dump(st, f)
             
     return total_added
 
 if __name__ == "__main__":
-    update_dataset()
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Run the Premium Data Engine pipeline")
+    parser.add_argument("--verticals", help="Comma-separated subset, e.g. fintech,esg (default: all)")
+    parser.add_argument("--workers", type=int, help="Concurrent pipeline stages (default: PIPELINE_CONCURRENCY)")
+    parser.add_argument("--companies", type=int, help="Companies per vertical, scale mode (default: SCALE_COMPANIES)")
+    parser.add_argument("--years", type=int, help="Years of history to backfill (default: SCALE_YEARS)")
+    parser.add_argument("--rebuild", action="store_true",
+                        help="Regenerate verticals whose stored history used other --companies/--years")
+    args = parser.parse_args()
+    update_dataset(verticals=args.verticals.split(",") if args.verticals else None, workers=args.workers,
+                   companies=args.companies, years=args.years, rebuild=args.rebuild)